@@ -0,0 +1,174 @@
+'''
+Check of the local HTTP API against localhost. Run from the program directory, e.g. "python api_check.py".
+
+The check generates a database, starts api_server.ApiServer on a free port, and requests each endpoint the way
+another program would: records, totals, and reports, bad requests, and If-None-Match before and after another
+connection changes the database. It prints each check and exits with 1 if any failed.
+'''
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+
+
+def start_server(server):
+    """
+    Runs a server's event loop in a background thread and returns the port it listens on
+    :param api_server.ApiServer server: the server
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    ports = []
+
+    async def serve():
+        asyncio_server = await server.start('127.0.0.1', 0)
+        ports.append(asyncio_server.sockets[0].getsockname()[1])
+        started.set()
+        await asyncio_server.serve_forever()
+
+    threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True).start()
+    if not started.wait(10):
+        raise OSError('The server did not start')
+    return ports[0]
+
+
+def run_checks(database_file, port):
+    """
+    Requests each endpoint and returns a list of (description, passed) pairs
+    :param str database_file: the database the server reads; one record's notes are changed
+    :param int port: the port the server listens on
+    """
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def get(target, headers=None, method='GET'):
+        conn.request(method, target, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response, response.read()
+
+    results = []
+
+    status, response, body = get('/records?start=2025-01-01&end=2025-12-31')
+    records = json.loads(body) if status == 200 else []
+    etag = response.getheader('ETag')
+    results.append(('records in a date range', status == 200 and len(records) > 0
+                    and all(record['date'].startswith('2025') for record in records)))
+    results.append(('ETag on a record list', etag is not None))
+    results.append(('amounts and counts as numbers', len(records) > 0
+                    and all(isinstance(record['total_deposit'], float) and isinstance(record['bills_20'], int)
+                            for record in records)))
+
+    id = records[0]['id'] if records else 1
+    status, response, body = get('/records/' + str(id))
+    results.append(('record by id', status == 200 and json.loads(body)['id'] == id))
+    results.append(('missing record is 404', get('/records/999999')[0] == 404))
+
+    status, response, body = get('/totals?period=quarter&columns=spec1')
+    totals = json.loads(body) if status == 200 else []
+    results.append(('quarterly totals', len(totals) > 0 and 'spec1' in totals[0]))
+    results.append(('totals rounded to the cent', len(totals) > 0 and all(
+        round(row[key], 2) == row[key] for row in totals for key in row if isinstance(row[key], float))))
+    results.append(('unknown period is 400', get('/totals?period=decade')[0] == 400))
+    results.append(('unknown column is 400', get('/totals?columns=notes')[0] == 400))
+    results.append(('bad date is 400', get('/records?start=2025-13-01')[0] == 400))
+
+    status, response, body = get('/reports/' + str(id) + '.pdf')
+    results.append(('record report', status == 200 and response.getheader('Content-Type') == 'application/pdf'
+                    and body.startswith(b'%PDF-')))
+    status, response, body = get('/reports.pdf?start=2025-01-01&end=2025-03-31')
+    results.append(('date range report', status == 200 and body.startswith(b'%PDF-')))
+
+    status, response, body = get('/records?start=2025-01-01&end=2025-12-31', method='HEAD')
+    results.append(('HEAD has no body', status == 200 and body == b''))
+    results.append(('POST is 405', get('/records', method='POST')[0] == 405))
+
+    target = '/records?start=2025-01-01&end=2025-12-31'
+    results.append(('matching If-None-Match is 304', get(target, {'If-None-Match': etag})[0] == 304))
+    results.append(('weak If-None-Match is 304', get(target, {'If-None-Match': 'W/' + etag})[0] == 304))
+    results.append(('unknown path with a current ETag is 404', get('/nothing', {'If-None-Match': etag})[0] == 404))
+
+    writer = sqlite3.connect(database_file)
+    writer.execute('UPDATE weekly_giving SET notes = ? WHERE id = ?', ('changed by api_check', id))
+    writer.commit()
+    writer.close()
+
+    status, response, body = get(target, {'If-None-Match': etag})
+    results.append(('a change elsewhere gives a new ETag', status == 200 and response.getheader('ETag') != etag))
+    status, response, body = get('/records/' + str(id))
+    results.append(('a change elsewhere is served', status == 200
+                    and json.loads(body)['notes'] == 'changed by api_check'))
+
+    conn.close()
+    return results
+
+
+def run_concurrently(port, clients):
+    """
+    Requests different totals from several clients at once and returns True if every request succeeded
+    :param int port: the port the server listens on
+    :param int clients: the number of clients
+    """
+    statuses = []
+
+    def request_totals(client):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        for i in range(10):
+            conn.request('GET', '/totals?period=week&start=2024-01-0' + str(i % 9 + 1) + '&client=' + str(client))
+            response = conn.getresponse()
+            response.read()
+            statuses.append(response.status)
+        conn.close()
+
+    threads = [threading.Thread(target=request_totals, args=(client,)) for client in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses == [200] * clients * 10
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Weekly Giving check of the local HTTP API')
+    parser.add_argument('--database', help='database to copy and serve instead of a generated one')
+    args = parser.parse_args(argv)
+
+    from api_server import ApiServer
+    from sample_data import generate_database
+
+    temp_dir = tempfile.mkdtemp()
+    server = None
+    try:
+        database_file = os.path.join(temp_dir, 'weekly_giving.db')
+        if args.database:
+            shutil.copy(args.database, database_file)
+        else:
+            generate_database(database_file, 2)
+
+        server = ApiServer(database_file, 'API Check Church')
+        port = start_server(server)
+        results = run_checks(database_file, port)
+        results.append(('concurrent requests', run_concurrently(port, 8)))
+        pool = server.database.pool
+        results.append(('no more connections than the pool size', pool.opened <= pool.size))
+    finally:
+        if server:
+            server.close()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    for description, passed in results:
+        print(('ok    ' if passed else 'FAIL  ') + description)
+    failed = len([passed for description, passed in results if not passed])
+    print(str(len(results) - failed) + ' of ' + str(len(results)) + ' checks passed')
+    if failed > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,454 @@
+import asyncio
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlsplit
+from urllib.request import pathname2url
+
+from database import BILL_COLUMNS, COIN_COLUMNS, PERIOD_COLUMNS, PERIOD_EXPRESSIONS, VERSION_COLUMN, GivingDatabase, \
+    TimedConnection, parse_amount
+
+STATUS_TEXT = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error'
+}
+
+# columns sent as they are stored; the rest are counts or amounts
+TEXT_COLUMNS = ['id', 'date', 'prepared_by', 'notes', VERSION_COLUMN]
+COUNT_COLUMNS = BILL_COLUMNS + COIN_COLUMNS + ['quantity_of_checks']
+
+
+class HttpError(Exception):
+    """
+    Raised by a request handler to send an error response
+    """
+    def __init__(self, status, message):
+        """
+        :param int status: the HTTP status code
+        :param str message: the error message sent to the client
+        """
+        super().__init__(message)
+        self.status = status
+
+
+class PooledConnection(TimedConnection):
+    """
+    Read-only connection that goes back to its ConnectionPool when closed instead of closing, so that GivingDatabase's
+    methods, which connect and close around each query, reuse the pool's connections
+    """
+    pool = None
+
+    def close(self):
+        self.rollback()
+        self.pool.release(self)
+
+
+class ConnectionPool:
+    """
+    Class keeping up to size read-only connections to a database file for the server's worker threads. A thread
+    waits for a connection when all of them are in use, which also limits how many queries run at once.
+    """
+    def __init__(self, database_file, size=4, timeout=10.0):
+        """
+        :param str database_file: path to the SQLite database file
+        :param int size: optional: the most connections to open
+        :param float timeout: optional: the seconds to wait for another program's lock to clear
+        """
+        self.uri = 'file:' + pathname2url(os.path.abspath(database_file)) + '?mode=ro'
+        self.size = size
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def acquire(self):
+        """
+        Returns an idle connection, opening a new one if fewer than size are open
+        """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        # several worker threads acquire at once, so only one at a time may decide to open another connection
+        with self.lock:
+            open_new = self.opened < self.size
+            if open_new:
+                self.opened += 1
+        if open_new:
+            conn = sqlite3.connect(
+                self.uri, uri=True, timeout=self.timeout, factory=PooledConnection, check_same_thread=False)
+            conn.pool = self
+            return conn
+        return self.idle.get()
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool
+        :param PooledConnection conn: the connection
+        """
+        if self.closed:
+            sqlite3.Connection.close(conn)
+        else:
+            self.idle.put(conn)
+
+    def close_all(self):
+        """
+        Closes the idle connections; those in use are closed when they are released
+        """
+        self.closed = True
+        while not self.idle.empty():
+            sqlite3.Connection.close(self.idle.get_nowait())
+
+
+class PooledDatabase(GivingDatabase):
+    """
+    GivingDatabase reading through a ConnectionPool. Only reading works, since the connections are read-only.
+    """
+    def __init__(self, database_file, pool_size=4, table_name='weekly_giving'):
+        """
+        :param str database_file: path to the SQLite database file
+        :param int pool_size: optional: the most connections to open
+        :param str table_name: optional: name of the table holding the records
+        """
+        super().__init__(database_file, table_name)
+        self.pool = ConnectionPool(database_file, pool_size, self.busy_timeout)
+
+    def connect(self):
+        return self.pool.acquire()
+
+
+def parse_date(query, name):
+    """
+    Returns a YYYY-MM-DD query parameter, or None if it wasn't given
+    :param dict query: the parsed query string
+    :param str name: the parameter's name
+    """
+    if name not in query:
+        return None
+    try:
+        return datetime.strptime(query[name][-1], '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise HttpError(400, name + ' must be a date as YYYY-MM-DD')
+
+
+def get_api_record(record):
+    """
+    Returns a record with its counts as integers and its amounts as numbers rounded to the cent, rather than the
+    display text they are stored as, e.g. 1463.27 for '1,463.27'. Blank values are 0, as they are in the program,
+    and values that aren't numbers are None.
+    :param dict record: the record as returned by GivingDatabase.get_record
+    """
+    values = {}
+    for column in record:
+        value = record[column]
+        if column in TEXT_COLUMNS:
+            values[column] = value
+            continue
+        try:
+            amount = parse_amount(value) if str(value or '').strip() else 0.0
+        except ValueError:
+            values[column] = None
+            continue
+        values[column] = int(amount) if column in COUNT_COLUMNS else round(amount, 2)
+    return values
+
+
+def round_totals(rows):
+    """
+    Rounds the sums in period totals to the cent, since adding up floats leaves values such as 357.7500000000001
+    :param list rows: the totals, as returned by GivingDatabase.get_period_totals
+    """
+    return [{key: round(row[key], 2) if isinstance(row[key], float) else row[key] for key in row} for row in rows]
+
+
+class ApiServer:
+    """
+    Class serving the records as read-only JSON and PDF over HTTP with nothing but asyncio, so that other programs,
+    such as a finance system, can fetch the totals themselves, e.g. "python cli.py serve --port 8080". The endpoints
+    are:
+
+    - /records?start=YYYY-MM-DD&end=YYYY-MM-DD: every record in the date range, or all of them
+    - /records/<id>: one record
+    - /totals?period=month&start=...&end=...&columns=spec1,spec2: the summed totals of each week, month, quarter, or
+      year, with the sums of any other amount columns given
+    - /reports/<id>.pdf and /reports.pdf?start=...&end=...: the printed reports of one record or a date range
+
+    Records and totals give their counts as integers and their amounts as numbers rounded to the cent.
+
+    Queries run in worker threads on a pool of read-only connections. Every response carries an ETag made from the
+    database's data version, which changes whenever the database is written to, so a client sending If-None-Match
+    gets 304 Not Modified until something changes, and recent responses are kept so that repeating a request while
+    nothing has changed costs nothing.
+    """
+    max_cached_responses = 32
+    max_header_bytes = 16384
+    idle_timeout = 30.0
+
+    def __init__(self, database_file, name='', spec_designations=None, pool_size=4, log=None):
+        """
+        :param str database_file: path to the SQLite database file
+        :param str name: optional: the church name shown on reports
+        :param dict spec_designations: optional: the special designation names shown on reports
+        :param int pool_size: optional: the most database connections to open
+        :param function log: optional: called with a line of text for each request
+        """
+        self.database = PooledDatabase(database_file, pool_size)
+        self.name = name
+        self.spec_designations = spec_designations or {'spec' + str(i): '' for i in range(1, 8)}
+        self.log = log
+        self.responses = OrderedDict()
+        self.server = None
+
+        # data_version only changes for commits by other connections, so it is read on a connection of its own. The
+        # start time is part of each ETag because the count starts over with every connection.
+        self.version_conn = sqlite3.connect(self.database.pool.uri, uri=True, timeout=0, check_same_thread=False)
+        self.instance = format(time.time_ns(), 'x')
+
+        self.routes = [
+            (re.compile('^/records$'), self.get_records, 'application/json'),
+            (re.compile('^/records/(\\d+)$'), self.get_record, 'application/json'),
+            (re.compile('^/totals$'), self.get_totals, 'application/json'),
+            (re.compile('^/reports/(\\d+)\\.pdf$'), self.get_record_report, 'application/pdf'),
+            (re.compile('^/reports\\.pdf$'), self.get_range_report, 'application/pdf')
+        ]
+
+    def get_etag(self):
+        """
+        Returns the ETag for the database as it is now, or None if its data version couldn't be read
+        """
+        try:
+            data_version = self.version_conn.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error:
+            return None
+        return '"' + self.instance + '-' + str(data_version) + '"'
+
+    def get_records(self, query):
+        records = self.database.get_records(parse_date(query, 'start'), parse_date(query, 'end'))
+        return [get_api_record(record) for record in records]
+
+    def get_record(self, query, id):
+        return get_api_record(self.get_stored_record(id))
+
+    def get_stored_record(self, id):
+        record = self.database.get_record(int(id))
+        if record is None:
+            raise HttpError(404, 'No record with id ' + id)
+        return record
+
+    def get_totals(self, query):
+        period = query.get('period', ['month'])[-1]
+        if period not in PERIOD_EXPRESSIONS:
+            raise HttpError(400, 'period must be one of ' + ', '.join(PERIOD_EXPRESSIONS))
+
+        columns = list(PERIOD_COLUMNS)
+        if 'columns' in query:
+            column_names = self.database.get_column_names()
+            for column in ','.join(query['columns']).split(','):
+                if column not in column_names or column in ('id', 'date', 'prepared_by', 'notes'):
+                    raise HttpError(400, 'Unknown amount column: ' + column)
+                if column not in columns:
+                    columns.append(column)
+
+        return round_totals(
+            self.database.get_period_totals(period, parse_date(query, 'start'), parse_date(query, 'end'), columns))
+
+    def get_record_report(self, query, id):
+        from batch_report import BatchReport
+        from report import get_report_values
+
+        record = self.get_stored_record(id)
+        return BatchReport(self.database, self.name, self.spec_designations).build([get_report_values(record)])
+
+    def get_range_report(self, query):
+        from batch_report import BatchReport
+
+        batch_report = BatchReport(self.database, self.name, self.spec_designations, self.log)
+        records = batch_report.get_report_records(parse_date(query, 'start'), parse_date(query, 'end'))
+        if len(records) == 0:
+            raise HttpError(404, 'No records in the date range')
+        return batch_report.build(records)
+
+    def handle(self, target):
+        """
+        Runs the handler for a request target in a worker thread. Returns the status, content type, and body.
+        :param str target: the request's path and query string
+        """
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        query = parse_qs(url.query)
+
+        if path == '/':
+            endpoints = ['/records', '/records/<id>', '/totals', '/reports/<id>.pdf', '/reports.pdf']
+            return 200, 'application/json', json.dumps({'endpoints': endpoints}).encode()
+
+        for pattern, handler, content_type in self.routes:
+            match = pattern.match(path)
+            if match:
+                result = handler(query, *match.groups())
+                if content_type == 'application/json':
+                    result = json.dumps(result).encode()
+                return 200, content_type, result
+        raise HttpError(404, 'Not found: ' + path)
+
+    async def respond(self, method, target, headers):
+        """
+        Returns the status, headers, and body of the response to a request, from the cache if the database hasn't
+        changed since it was made
+        :param str method: the request method
+        :param str target: the request's path and query string
+        :param dict headers: the request headers, keyed in lower case
+        """
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD', 'Content-Type': 'application/json'}, b'{"error": "Read only"}'
+
+        etag = self.get_etag()
+        key = (etag, target)
+        if etag and key in self.responses:
+            self.responses.move_to_end(key)
+            status, content_type, body = self.responses[key]
+        else:
+            try:
+                status, content_type, body = await asyncio.get_running_loop().run_in_executor(None, self.handle, target)
+            except HttpError as ex:
+                status, content_type, body = ex.status, 'application/json', json.dumps({'error': str(ex)}).encode()
+            except Exception as ex:
+                # e.g. a record that can't be made into a report; the client gets an error rather than a dropped
+                # connection, and the server keeps going
+                if self.log:
+                    self.log('Error from ApiServer.respond: ' + target + ': ' + repr(ex))
+                status, content_type, body = 500, 'application/json', json.dumps({'error': str(ex)}).encode()
+
+            if etag and status == 200:
+                self.responses[key] = (status, content_type, body)
+                while len(self.responses) > self.max_cached_responses:
+                    self.responses.popitem(last=False)
+
+        if etag and status == 200:
+            # only a response that would succeed can be not modified; errors are always sent in full
+            match_tags = [tag.strip().removeprefix('W/') for tag in headers.get('if-none-match', '').split(',')]
+            if etag in match_tags or '*' in match_tags:
+                return 304, {'ETag': etag}, b''
+
+        response_headers = {'Content-Type': content_type, 'Cache-Control': 'no-cache'}
+        if etag and status == 200:
+            response_headers['ETag'] = etag
+        return status, response_headers, body
+
+    async def read_request(self, reader):
+        """
+        Reads a request's line and headers. Returns the method, target, version, and headers keyed in lower case, or
+        None if the client closed the connection or sent nothing for idle_timeout seconds.
+        :param asyncio.StreamReader reader: the connection's reader
+        """
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.idle_timeout)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, 'The request headers are too large')
+
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise HttpError(400, 'Malformed request line')
+
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return parts[0], parts[1], parts[2], headers
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers requests on one connection, keeping it open between them unless the client asks otherwise
+        :param asyncio.StreamReader reader: the connection's reader
+        :param asyncio.StreamWriter writer: the connection's writer
+        """
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as ex:
+                    body = json.dumps({'error': str(ex)}).encode()
+                    self.write_response(writer, ex.status, {'Content-Type': 'application/json'}, body, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers = request
+                start = time.perf_counter()
+                status, response_headers, body = await self.respond(method, target, headers)
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                self.write_response(writer, status, response_headers, b'' if method == 'HEAD' else body, keep_alive,
+                                    len(body))
+                await writer.drain()
+
+                if self.log:
+                    self.log(method + ' ' + target + ' ' + str(status) + ' '
+                             + '{:.1f}'.format((time.perf_counter() - start) * 1000) + ' ms')
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def write_response(self, writer, status, headers, body, keep_alive, content_length=None):
+        """
+        Writes a response's status line, headers, and body
+        :param asyncio.StreamWriter writer: the connection's writer
+        :param int status: the HTTP status code
+        :param dict headers: the response headers
+        :param bytes body: the body, empty for HEAD requests
+        :param bool keep_alive: whether the connection stays open
+        :param int content_length: optional: the length to report, when it differs from the body's as it does for HEAD
+        """
+        lines = ['HTTP/1.1 ' + str(status) + ' ' + STATUS_TEXT[status]]
+        for name in headers:
+            lines.append(name + ': ' + headers[name])
+        if status != 304:
+            lines.append('Content-Length: ' + str(len(body) if content_length is None else content_length))
+        lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """
+        Starts listening. Returns the asyncio server, whose sockets give the port if 0 was asked for.
+        :param str host: optional: the address to listen on; only this computer can connect to the default
+        :param int port: optional: the port to listen on, or 0 for any free port
+        """
+        self.server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=self.max_header_bytes)
+        return self.server
+
+    async def serve_forever(self, host='127.0.0.1', port=8080):
+        """
+        Starts listening and answers requests until canceled
+        :param str host: optional: the address to listen on
+        :param int port: optional: the port to listen on
+        """
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """
+        Closes the database connections
+        """
+        self.database.pool.close_all()
+        self.version_conn.close()
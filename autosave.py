@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from os.path import exists
+
+from PyQt6.QtCore import QObject, QRunnable, QTimer
+
+
+class Autosave(QObject):
+    """
+    Class to keep a small recovery journal of the current record's unsaved changes. Changes are written on a debounce
+    timer by a JournalWriter in the thread pool so that data entry is never blocked. The journal is removed once the
+    changes are saved or discarded, so finding one at startup means the program did not close cleanly.
+    """
+    debounce_ms = 3000
+
+    def __init__(self, main):
+        """
+        :param Main main: the Main instance
+        """
+        super().__init__()
+        self.main = main
+        self.journal_file = self.main.file_locations['program_data_dir'] + '/recovery.json'
+        self.lock = threading.Lock()
+        self.generation = 0
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.debounce_ms)
+        self.timer.timeout.connect(self.write_journal)
+
+    def schedule(self):
+        """
+        Method to be called whenever the user edits the record. Restarts the debounce timer if autosave is enabled.
+        """
+        if self.main.autosave_enabled:
+            self.timer.start()
+
+    def write_journal(self):
+        """
+        Method to gather the current record's changed values and hand them to a JournalWriter
+        """
+        dirty_columns = self.main.gui.get_dirty_columns()
+        if len(dirty_columns) == 0:
+            self.clear_journal()
+            return
+
+        values = self.main.gui.get_record_values()
+        journal = {
+            'id': self.main.gui.id_num_label.text(),
+            'database_file': self.main.file_locations['database_file'],
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'values': {column: values[column] for column in dirty_columns}
+        }
+        self.main.thread_pool.start(JournalWriter(self, journal, self.generation))
+
+    def clear_journal(self):
+        """
+        Method to stop any pending write and remove the journal file
+        """
+        self.timer.stop()
+        with self.lock:
+            self.generation += 1
+            if exists(self.journal_file):
+                try:
+                    os.remove(self.journal_file)
+                except OSError as err:
+                    self.main.write_log('Error from Autosave.clear_journal: ' + str(err))
+
+    def read_journal(self):
+        """
+        Method to read a journal left behind by a previous session. Returns None if there isn't one, or if it belongs
+        to a different database file.
+        """
+        if not exists(self.journal_file):
+            return None
+
+        try:
+            with open(self.journal_file, 'r') as file:
+                journal = json.loads(file.read())
+        except (OSError, ValueError) as err:
+            self.main.write_log('Error from Autosave.read_journal: ' + str(err))
+            return None
+
+        if journal.get('database_file') != self.main.file_locations['database_file']:
+            self.main.write_log('Ignoring recovery journal for ' + str(journal.get('database_file')))
+            return None
+
+        return journal
+
+
+class JournalWriter(QRunnable):
+    """
+    Implements QRunnable to write the recovery journal off of the gui thread
+    """
+    def __init__(self, autosave, journal, generation):
+        """
+        :param Autosave autosave: the Autosave instance
+        :param dict journal: the journal contents
+        :param int generation: the Autosave generation when the write was requested
+        """
+        super().__init__()
+        self.autosave = autosave
+        self.journal = journal
+        self.generation = generation
+
+    def run(self):
+        temp_file = self.autosave.journal_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as file:
+                file.write(json.dumps(self.journal))
+
+            with self.autosave.lock:
+                # the changes were saved or discarded while this was being written
+                if self.generation != self.autosave.generation:
+                    os.remove(temp_file)
+                    return
+                os.replace(temp_file, self.autosave.journal_file)
+        except OSError:
+            logging.exception('')
@@ -0,0 +1,110 @@
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from report import ReportBuilder, get_report_values
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:
+    PdfReader = None
+    PdfWriter = None
+
+
+def build_chunk(name, spec_designations, records):
+    """
+    Builds the report pages for a group of records. Runs in a worker process, so it must stay at module level.
+    :param str name: the church name
+    :param dict spec_designations: the special designation names
+    :param list records: the records' report values
+    """
+    return ReportBuilder(name, spec_designations).build(records)
+
+
+class BatchReport:
+    """
+    Class to create one multi-page PDF holding the printed report of every record in a date range. The pages are
+    built straight from the database rather than from the gui. Large batches are split into chunks that are rendered
+    in parallel in a process pool and then merged with pypdf; without pypdf, or for small batches where starting the
+    pool would take longer than the work, the pages are built in this process. The workers are spawned rather than
+    forked, since the gui and the api server have other threads running whose locks a forked copy could inherit held.
+    """
+    chunk_size = 50
+
+    def __init__(self, database, name, spec_designations, log=None):
+        """
+        :param database.GivingDatabase database: the records database
+        :param str name: the church name
+        :param dict spec_designations: the special designation names
+        :param function log: optional: called with a line of text when a large batch can't be built in parallel
+        """
+        self.database = database
+        self.name = name
+        self.spec_designations = spec_designations
+        self.log = log
+
+    def get_report_records(self, start, end):
+        """
+        Returns the report values of every record from start to end, ordered by date
+        :param str start: the earliest date to include, as YYYY-MM-DD
+        :param str end: the latest date to include, as YYYY-MM-DD
+        """
+        return [get_report_values(record) for record in self.database.get_records(start, end)]
+
+    def build(self, records, progress=None):
+        """
+        Builds one report page for each record and returns the PDF's bytes
+        :param list records: the records' report values, as returned by get_report_records
+        :param function progress: optional: called with the number of pages done and the total number of pages
+        """
+        chunks = []
+        for i in range(0, len(records), self.chunk_size):
+            chunks.append(records[i:i + self.chunk_size])
+
+        if len(chunks) > 1 and PdfWriter is None and self.log:
+            self.log('pypdf is not installed, so the ' + str(len(records)) + ' reports are built in one process')
+        if len(chunks) == 1 or PdfWriter is None:
+            pdf_bytes = ReportBuilder(self.name, self.spec_designations).build(records)
+            if progress:
+                progress(len(records), len(records))
+            return pdf_bytes
+
+        results = [None] * len(chunks)
+        pages_done = 0
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {}
+            for i in range(len(chunks)):
+                future = executor.submit(build_chunk, self.name, self.spec_designations, chunks[i])
+                futures[future] = i
+
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                pages_done += len(chunks[index])
+                if progress:
+                    progress(pages_done, len(records))
+
+        writer = PdfWriter()
+        for result in results:
+            writer.append(PdfReader(io.BytesIO(result)))
+        pdf_buffer = io.BytesIO()
+        writer.write(pdf_buffer)
+        return pdf_buffer.getvalue()
+
+    def write(self, start, end, file_name, progress=None):
+        """
+        Builds the reports for every record from start to end and writes them to a PDF file. Returns the number of
+        pages written.
+        :param str start: the earliest date to include, as YYYY-MM-DD
+        :param str end: the latest date to include, as YYYY-MM-DD
+        :param str file_name: the PDF file to write
+        :param function progress: optional: called with the number of pages done and the total number of pages
+        """
+        records = self.get_report_records(start, end)
+        if len(records) == 0:
+            return 0
+
+        pdf_bytes = self.build(records, progress)
+        with open(file_name, 'wb') as file:
+            file.write(pdf_bytes)
+        return len(records)
@@ -0,0 +1,363 @@
+'''
+Timing benchmarks for Weekly Giving. Run from the program directory, e.g. "python benchmark.py report".
+
+"python benchmark.py suite" times the core database and gui operations against a generated database, with the gui
+running on Qt's offscreen platform, and compares the timings with a JSON baseline:
+
+    python benchmark.py suite --save-baseline benchmark_baseline.json
+    python benchmark.py suite --baseline benchmark_baseline.json
+
+The second command exits with 1 if any timing is slower than the baseline by more than the tolerance.
+'''
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+
+def time_per_call(function, count):
+    """
+    Calls a function the given number of times and returns the average time per call in milliseconds
+    :param function function: the function to time
+    :param int count: the number of calls
+    """
+    start = time.perf_counter()
+    for i in range(count):
+        function()
+    return (time.perf_counter() - start) / count * 1000
+
+
+def sample_report_values():
+    """
+    Returns the display values of a fully filled-in record for report benchmarks
+    """
+    values = {
+        'id': '123',
+        'date': '2025-04-20',
+        'prepared_by': 'Treasurer',
+        'bills_100': '4', 'bills_50': '3', 'bills_20': '25', 'bills_10': '14', 'bills_5': '22', 'bills_1': '61',
+        'coins_100': '2', 'coins_25': '13', 'coins_10': '9', 'coins_5': '4', 'coins_1': '31',
+        'notes': 'Easter offering; see special designations',
+        'quantity_of_checks': '30',
+        'total_designated_offerings': '350.00',
+        'bills_total': '1,871.00',
+        'coins_total': '6.76',
+        'checks_total': '3,075.00',
+        'total_deposit': '5,302.76'
+    }
+    for i in range(1, 8):
+        values['spec' + str(i)] = '50.00'
+    for i in range(30):
+        values['checks_' + str(i)] = '{:,.2f}'.format(25 + i * 5)
+    return values
+
+
+def benchmark_report(count):
+    """
+    Compares the time to build one report the way make_pdf used to (registering fonts and drawing every label for
+    each report) with report.ReportBuilder, for single reports and for a multi-page document
+    :param int count: the number of reports to time
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    import report
+    from report import ReportBuilder
+
+    designations = {'spec' + str(i): 'Designation ' + str(i) for i in range(1, 8)}
+    values = sample_report_values()
+    builder = ReportBuilder('Benchmark Church', designations)
+
+    def legacy_report():
+        for font_name in report.FONTS:
+            pdfmetrics.registerFont(TTFont(font_name, report.FONT_DIR + '/' + report.FONTS[font_name]))
+        pdf_buffer = io.BytesIO()
+        canvas = pdf_canvas.Canvas(pdf_buffer, pagesize=letter)
+        builder.draw_template(canvas)
+        builder.draw_values(canvas, values)
+        canvas.save()
+        return pdf_buffer.getvalue()
+
+    results = {
+        'report_legacy_ms': time_per_call(legacy_report, count),
+        'report_single_ms': time_per_call(lambda: ReportBuilder('Benchmark Church', designations).build([values]), count),
+        'report_batch_page_ms': time_per_call(lambda: builder.build([values] * count), 1) / count
+    }
+    return results
+
+
+def time_once(function):
+    """
+    Calls a function once and returns the time it took in milliseconds
+    :param function function: the function to time
+    """
+    return time_per_call(function, 1)
+
+
+def benchmark_database(database_file, count):
+    """
+    Times the Qt-free database queries used to load records, graph, and back up
+    :param str database_file: the database to use; it is not changed
+    :param int count: the number of records to load for the per-record timing
+    """
+    from database import GivingDatabase
+
+    database = GivingDatabase(database_file)
+    ids = database.get_ids()
+    step = max(len(ids) // count, 1)
+    sample_ids = ids[::step][:count]
+
+    backup_dir = tempfile.mkdtemp()
+    try:
+        backup_database = GivingDatabase(os.path.join(backup_dir, 'weekly_giving.db'))
+        shutil.copy(database_file, backup_database.database_file)
+        results = {
+            'db_get_record_ms': time_once(lambda: [database.get_record(id) for id in sample_ids]) / len(sample_ids),
+            'db_get_records_all_ms': time_once(database.get_records),
+            'db_get_deposits_all_ms': time_once(lambda: database.get_deposits(details=True)),
+            'db_period_totals_month_ms': time_once(lambda: database.get_period_totals('month')),
+            'db_backup_ms': time_once(backup_database.backup)
+        }
+    finally:
+        shutil.rmtree(backup_dir, ignore_errors=True)
+    return results
+
+
+def start_gui(database_file, data_dir):
+    """
+    Starts the program with a config file in a temporary home directory pointing at the database, and returns the Main
+    instance once its first record is showing
+    :param str database_file: the database to open
+    :param str data_dir: the temporary home directory
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ['HOME'] = data_dir
+    os.environ['USERPROFILE'] = data_dir
+
+    from PyQt6.QtWidgets import QApplication
+    from database import get_program_data_dir
+
+    os.makedirs(get_program_data_dir())
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'default_config.json')) as file:
+        config_json = json.loads(file.read())
+    config_json['fileLoc'] = database_file
+    config_json['autosave'] = False
+    with open(get_program_data_dir() + '/config.json', 'w') as file:
+        file.write(json.dumps(config_json))
+
+    import main as main_module
+    app = QApplication.instance() or QApplication(sys.argv)
+    # the loading box closes before the main window opens, which would otherwise end the program
+    app.setQuitOnLastWindowClosed(False)
+    main = main_module.Main()
+    # keep the application alive for as long as the Main instance
+    main.app = app
+
+    timeout = time.time() + 60
+    while main.gui is None or main.current_id_index is None:
+        if time.time() > timeout:
+            raise TimeoutError('The program did not start within a minute')
+        app.processEvents()
+        time.sleep(0.01)
+    app.processEvents()
+    return main
+
+
+def benchmark_gui(database_file, count):
+    """
+    Times loading, navigating, recalculating, saving, printing, graphing, and backing up records in the running
+    program, against a copy of the database
+    :param str database_file: the database to copy
+    :param int count: the number of times to repeat the quicker operations
+    """
+    data_dir = tempfile.mkdtemp()
+    try:
+        database_copy = os.path.join(data_dir, 'weekly_giving.db')
+        shutil.copy(database_file, database_copy)
+        main = start_gui(database_copy, data_dir)
+        return run_gui_benchmarks(main, count)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def run_gui_benchmarks(main, count):
+    """
+    Runs the gui timings once the program has started
+    :param Main main: the Main instance
+    :param int count: the number of times to repeat the quicker operations
+    """
+    import main as main_module
+    from PyQt6.QtWidgets import QApplication
+
+    gui = main.gui
+    results = {}
+
+    def settle():
+        # let the totals calculated in the background for each loaded record reach the gui, as they would between
+        # the user's clicks
+        main.thread_pool.waitForDone()
+        QApplication.processEvents()
+
+    def load():
+        main.get_by_id(main.ids[main.current_id_index])
+        QApplication.processEvents()
+
+    main.get_first_rec()
+    settle()
+    results['get_by_id_ms'] = time_per_call(load, count)
+    settle()
+
+    # the 1,000 records following the first, or as many as there are
+    steps = min(1000, len(main.ids) - 1)
+
+    def navigate():
+        main.get_first_rec()
+        for i in range(steps):
+            main.get_next_rec()
+            QApplication.processEvents()
+        settle()
+    results['navigate_' + str(steps) + '_records_ms'] = time_once(navigate)
+
+    all_values = [line_edit.text() for line_edit in gui.bill_fields + gui.coin_fields + gui.special_fields
+                  + gui.check_fields]
+    recalc = main_module.Recalc(all_values, gui)
+    results['recalc_run_ms'] = time_per_call(recalc.run, count)
+
+    # save_rec shows its confirmation for a second, which isn't part of the work being timed
+    sleep = main_module.time.sleep
+    main_module.time.sleep = lambda seconds: None
+    try:
+        def save():
+            prepared_by = gui.fields['prepared_by']
+            prepared_by.setText(prepared_by.text() + '.' if len(prepared_by.text()) < 40 else '')
+            gui.on_change()
+            main.save_rec()
+        results['save_rec_ms'] = time_per_call(save, count)
+    finally:
+        main_module.time.sleep = sleep
+    settle()
+
+    def make_pdf_uncached():
+        main.report_cache.clear()
+        gui.release_pdf()
+        gui.make_pdf()
+    results['make_pdf_uncached_ms'] = time_per_call(make_pdf_uncached, count)
+    results['make_pdf_cached_ms'] = time_per_call(gui.make_pdf, count)
+
+    # graph_by_date's dialog waits for the user, so the graphs are built the way its GraphBuilder builds them, after
+    # matplotlib has been imported so that its import time isn't counted against the first graph
+    import graph_this
+    data_stamp = main.database.get_data_stamp()
+    for name, key in [('graph_line_all_ms', (None, None, None, 'line', False, data_stamp)),
+                      ('graph_bar_all_ms', (None, None, None, 'bar', False, data_stamp)),
+                      ('graph_month_stacked_ms', (None, None, 'month', 'bar', True, data_stamp))]:
+        results[name] = time_once(main_module.GraphBuilder(main, key).run)
+
+    results['do_backup_ms'] = time_once(main.do_backup)
+    settle()
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Prints each timing next to its baseline and returns the names of those slower than the baseline by more than the
+    tolerance. Differences under a millisecond aren't counted, since they are mostly noise.
+    :param dict results: the timings in milliseconds, keyed by name
+    :param dict baseline: the baseline timings, keyed by name
+    :param float tolerance: the allowed slowdown, e.g. 0.25 for 25%
+    """
+    regressions = []
+    print('benchmark'.ljust(30) + 'baseline'.rjust(12) + 'current'.rjust(12) + 'change'.rjust(10))
+    for name in results:
+        if name not in baseline:
+            print(name.ljust(30) + 'new'.rjust(12) + '{:12.3f}'.format(results[name]))
+            continue
+
+        change = (results[name] - baseline[name]) / baseline[name] if baseline[name] > 0 else 0.0
+        regressed = change > tolerance and results[name] - baseline[name] >= 1.0
+        if regressed:
+            regressions.append(name)
+        print(name.ljust(30) + '{:12.3f}'.format(baseline[name]) + '{:12.3f}'.format(results[name])
+              + '{:+9.1%}'.format(change) + (' SLOWER' if regressed else ''))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Weekly Giving benchmarks')
+    parser.add_argument('benchmark', choices=['report', 'suite'])
+    parser.add_argument('--count', type=int, default=None,
+                        help='number of iterations to time (100 for report, 20 for suite)')
+    parser.add_argument('--database', help='database to use for the suite instead of a generated one')
+    parser.add_argument('--years', type=int, default=20, help='years of records to generate for the suite (20)')
+    parser.add_argument('--specials', type=int, default=6, help='special offerings per year to generate (6)')
+    parser.add_argument('--checks', type=int, default=15, help='average checks per Sunday to generate (15)')
+    parser.add_argument('--no-gui', action='store_true', help='only time the database queries')
+    parser.add_argument('--baseline', help='JSON baseline to compare the suite\'s timings with')
+    parser.add_argument('--save-baseline', help='JSON file to save the suite\'s timings to as a new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='slowdown against the baseline counted as a regression (0.25)')
+    args = parser.parse_args(argv)
+
+    if args.benchmark == 'report':
+        results = benchmark_report(args.count or 100)
+        for name in results:
+            print(name.ljust(30) + '{:10.3f}'.format(results[name]))
+        return 0
+
+    from sample_data import generate_database
+
+    count = args.count or 20
+    generated_dir = None
+    database_file = args.database
+    settings = {'database': database_file}
+    if not database_file:
+        generated_dir = tempfile.mkdtemp()
+        database_file = os.path.join(generated_dir, 'weekly_giving.db')
+        records = generate_database(database_file, args.years, args.specials, args.checks)
+        settings = {'years': args.years, 'specials': args.specials, 'checks': args.checks, 'records': records}
+
+    try:
+        results = benchmark_database(database_file, count)
+        if not args.no_gui:
+            results.update(benchmark_gui(database_file, count))
+    finally:
+        if generated_dir:
+            shutil.rmtree(generated_dir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.loads(file.read())
+        if baseline.get('settings') != settings:
+            print('Warning: the baseline was recorded with ' + str(baseline.get('settings')))
+        regressions = compare_to_baseline(results, baseline['results'], args.tolerance)
+    else:
+        for name in results:
+            print(name.ljust(30) + '{:10.3f}'.format(results[name]))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            file.write(json.dumps({
+                'settings': settings,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'count': count,
+                'results': results
+            }, indent=2))
+
+    if len(regressions) > 0:
+        print(str(len(regressions)) + ' benchmarks are slower than the baseline: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
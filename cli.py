@@ -0,0 +1,343 @@
+'''
+@author Jeremy G. Wilson
+
+Copyright 2025 Jeremy G. Wilson
+
+The files contained herein are all part of the Weekly Giving program (v.1.5.4)
+
+Weekly Giving is free software: you can redistribute it and/or
+modify it under the terms of the GNU General Public License (GNU GPL)
+published by the Free Software Foundation, either version 3 of the
+License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from database import GivingDatabase, TOTAL_COLUMNS, calculate_totals, get_program_data_dir, \
+    get_record_values_in_order, load_config, parse_amount, parse_flag, retry_when_locked
+
+
+class CommandLine:
+    """
+    Class providing the command-line interface to the records database. It uses no Qt so that it starts quickly and
+    can be run from scripts and scheduled tasks, e.g. "python cli.py export --start 2025-01-01 -o giving.csv"
+    """
+    def __init__(self, database_file=None, config_file=None):
+        """
+        :param str database_file: optional: the database to use instead of the one named in the config file
+        :param str config_file: optional: the config file to use instead of the one in the program data directory
+        """
+        if not config_file:
+            config_file = get_program_data_dir() + '/config.json'
+
+        self.config_json = {}
+        if os.path.exists(config_file):
+            self.config_json = load_config(config_file)
+
+        if not database_file:
+            database_file = self.config_json.get('fileLoc')
+        if not database_file or not os.path.exists(database_file):
+            raise FileNotFoundError('Database file not found: ' + str(database_file))
+
+        self.include_special_in_total = parse_flag(self.config_json.get('includeSpecial', True))
+        self.name = self.config_json.get('name', '')
+        self.spec_designations = self.config_json.get(
+            'specialDesignations', {'spec' + str(i): '' for i in range(1, 8)}
+        )
+        self.database = GivingDatabase(database_file)
+
+    def report(self, start=None, end=None, output=sys.stdout):
+        """
+        Writes a table of each record's totals in the date range, followed by the range's totals
+        """
+        records = self.database.get_records(start, end)
+        columns = ['id', 'date', 'prepared_by'] + TOTAL_COLUMNS[1:]
+        widths = [6, 10, 20, 14, 14, 14, 14, 14]
+        headings = ['ID', 'Date', 'Prepared By', 'Designated', 'Bills', 'Coins', 'Checks', 'Deposit']
+
+        output.write(' '.join(headings[i].ljust(widths[i]) for i in range(len(headings))) + '\n')
+
+        sums = [0.0] * 5
+        for record in records:
+            line = []
+            for i in range(len(columns)):
+                value = str(record.get(columns[i]) or '')
+                if i >= 3:
+                    try:
+                        sums[i - 3] += parse_amount(value)
+                    except ValueError:
+                        pass
+                    line.append(value.rjust(widths[i]))
+                else:
+                    line.append(value[:widths[i]].ljust(widths[i]))
+            output.write(' '.join(line) + '\n')
+
+        output.write(
+            ('Total (' + str(len(records)) + ' records)').ljust(38) + ' '
+            + ' '.join('{:,.2f}'.format(sums[i]).rjust(14) for i in range(len(sums))) + '\n'
+        )
+        return 0
+
+    def export(self, start=None, end=None, file_format='csv', output=sys.stdout):
+        """
+        Writes every column of each record in the date range as CSV or JSON
+        """
+        records = self.database.get_records(start, end)
+        if file_format == 'json':
+            output.write(json.dumps(records, indent=2) + '\n')
+        else:
+            writer = csv.DictWriter(output, fieldnames=self.database.get_column_names())
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+        return 0
+
+    def import_records(self, file_name):
+        """
+        Reads records from a CSV or JSON file as written by export. Records whose id already exists are updated and
+        the rest are inserted, all in one transaction that waits for other programs' saves to finish.
+        """
+        with open(file_name, 'r', newline='') as file:
+            if file_name.lower().endswith('.json'):
+                records = json.loads(file.read())
+            else:
+                records = list(csv.DictReader(file))
+
+        column_names = self.database.get_column_names()
+
+        def import_all():
+            conn = self.database.connect()
+            try:
+                # take the write lock for the whole import, and read the ids under it, so that no one else's save
+                # can come between deciding to update or insert a record and doing it
+                conn.execute('BEGIN IMMEDIATE')
+                existing_ids = set(row[0] for row in conn.execute('SELECT id FROM ' + self.database.table_name))
+                updated = 0
+                inserted = 0
+                for record in records:
+                    values = {column: record[column] for column in record if column in column_names}
+                    if 'id' not in values or values['id'] in ('', None):
+                        continue
+
+                    id = int(values.pop('id'))
+                    if id in existing_ids:
+                        # counts up the record's version, so a program with it open is told of the conflict on save
+                        self.database.update_record(id, values, conn)
+                        updated += 1
+                    else:
+                        values['id'] = id
+                        self.database.insert_record(values, conn)
+                        existing_ids.add(id)
+                        inserted += 1
+                conn.commit()
+                return updated, inserted
+            finally:
+                conn.close()
+
+        updated, inserted = retry_when_locked(import_all)
+        print('Updated ' + str(updated) + ' and inserted ' + str(inserted) + ' records')
+        return 0
+
+    def pdf(self, file_name, start=None, end=None):
+        """
+        Writes the printed report of each record in the date range to one PDF file
+        """
+        from batch_report import BatchReport
+
+        batch_report = BatchReport(
+            self.database, self.name, self.spec_designations, lambda text: print(text, file=sys.stderr))
+        pages = batch_report.write(start, end, file_name)
+        print(str(pages) + ' reports written to ' + file_name)
+        return 0
+
+    def graphs(self, directory, formats=None, charts_file=None, today=None):
+        """
+        Saves the configured charts, or those in a JSON charts file, as PNG, SVG, or PDF files in a directory
+        """
+        from graph_export import GraphExport
+
+        charts = self.config_json.get('graphExports')
+        if charts_file:
+            with open(charts_file, 'r') as file:
+                charts = json.loads(file.read())
+        if today:
+            today = datetime.strptime(today, '%Y-%m-%d').date()
+
+        files = GraphExport(self.database, self.spec_designations, charts).export(directory, formats, today)
+        for file_name in files:
+            print(file_name)
+        print(str(len(files)) + ' files written to ' + directory)
+        return 0
+
+    def backup(self):
+        """
+        Writes a backup copy of the database next to it
+        """
+        print(self.database.backup())
+        return 0
+
+    def maintain(self, budget=60.0, tasks=None):
+        """
+        Runs the database maintenance tasks that are due, or the given tasks, and prints what they did and how much
+        space could still be reclaimed. Returns 1 if the integrity check found problems.
+        """
+        from maintenance import DatabaseMaintenance, format_report
+
+        maintenance = DatabaseMaintenance(self.database, get_program_data_dir() + '/maintenance.json')
+        report = maintenance.run(budget, tasks)
+        if not report['results']:
+            print('No maintenance was due')
+        for line in format_report(report):
+            print(line)
+
+        for task, outcome, seconds in report['results']:
+            if task == 'quick_check' and outcome.startswith('problems'):
+                return 1
+        return 0
+
+    def serve(self, host='127.0.0.1', port=8080):
+        """
+        Answers read-only HTTP requests for records, totals, and reports until interrupted with Ctrl+C
+        """
+        import asyncio
+        from api_server import ApiServer
+
+        server = ApiServer(self.database.database_file, self.name, self.spec_designations, log=print)
+        print('Serving ' + self.database.database_file + ' at http://' + host + ':' + str(port) + '/')
+        try:
+            asyncio.run(server.serve_forever(host, port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return 0
+
+    def audit(self, start=None, end=None):
+        """
+        Recalculates each record's totals from its bills, coins, special designations, and checks and reports any
+        that differ from the stored totals. Returns 1 if any differ.
+        """
+        mismatches = 0
+        records = self.database.get_records(start, end)
+        for record in records:
+            totals, errors = calculate_totals(get_record_values_in_order(record))
+            if self.include_special_in_total:
+                deposit = totals[0] + totals[1] + totals[2] + totals[3]
+            else:
+                deposit = totals[0] + totals[1] + totals[3]
+
+            expected = {
+                'bills_total': totals[0],
+                'coins_total': totals[1],
+                'total_designated_offerings': totals[2],
+                'checks_total': totals[3],
+                'total_deposit': deposit
+            }
+
+            problems = list(errors)
+            for column in expected:
+                try:
+                    stored = parse_amount(record.get(column) or '0')
+                except ValueError:
+                    problems.append(column + ' is not a number: ' + str(record.get(column)))
+                    continue
+                if abs(stored - expected[column]) >= 0.005:
+                    problems.append(
+                        column + ' is ' + '{:,.2f}'.format(stored) + ', expected ' + '{:,.2f}'.format(expected[column])
+                    )
+
+            if len(problems) > 0:
+                mismatches += 1
+                print('Record ' + str(record['id']) + ' (' + str(record['date']) + '): ' + '; '.join(problems))
+
+        print(str(len(records)) + ' records checked, ' + str(mismatches) + ' with problems')
+        if mismatches > 0:
+            return 1
+        return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='weekly-giving-cli', description='Weekly Giving command-line interface')
+    parser.add_argument('--database', help='database file to use instead of the one in the config file')
+    parser.add_argument('--config', help='config file to use instead of the one in the program data directory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help='print the totals of each record in a date range')
+    export_parser = subparsers.add_parser('export', help='write records in a date range as CSV or JSON')
+    audit_parser = subparsers.add_parser('audit', help='check stored totals against the recorded amounts')
+    pdf_parser = subparsers.add_parser('pdf', help='write the printed reports of a date range to one PDF file')
+    for date_parser in [report_parser, export_parser, audit_parser, pdf_parser]:
+        date_parser.add_argument('--start', help='earliest date to include, as YYYY-MM-DD')
+        date_parser.add_argument('--end', help='latest date to include, as YYYY-MM-DD')
+
+    export_parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    export_parser.add_argument('-o', '--output', help='file to write to instead of standard output')
+    pdf_parser.add_argument('-o', '--output', required=True, help='PDF file to write')
+
+    graphs_parser = subparsers.add_parser('graphs', help='save charts of recent giving as PNG, SVG, or PDF files')
+    graphs_parser.add_argument('-o', '--output', required=True, help='directory to write the charts to')
+    graphs_parser.add_argument('--format', nargs='+', choices=['png', 'svg', 'pdf'], help='formats to write (all)')
+    graphs_parser.add_argument('--charts', help='JSON file listing the charts to draw instead of the configured ones')
+    graphs_parser.add_argument('--date', help='last day to include, as YYYY-MM-DD (today)')
+
+    import_parser = subparsers.add_parser('import', help='update or insert records from a CSV or JSON export')
+    import_parser.add_argument('file')
+
+    subparsers.add_parser('backup', help='write a backup copy of the database')
+
+    maintain_parser = subparsers.add_parser('maintain', help='check, optimize, and compact the database')
+    maintain_parser.add_argument('--budget', type=float, default=60.0, help='most seconds to spend (60)')
+    maintain_parser.add_argument('--tasks', nargs='+', choices=['quick_check', 'optimize', 'analyze', 'vacuum'],
+                                 help='tasks to run whether or not they are due')
+
+    serve_parser = subparsers.add_parser('serve', help='answer read-only HTTP requests for records and reports')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='address to listen on (127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8080, help='port to listen on (8080)')
+
+    args = parser.parse_args(argv)
+
+    try:
+        command_line = CommandLine(args.database, args.config)
+
+        if args.command == 'report':
+            return command_line.report(args.start, args.end)
+        elif args.command == 'export':
+            if args.output:
+                with open(args.output, 'w', newline='') as file:
+                    return command_line.export(args.start, args.end, args.format, file)
+            return command_line.export(args.start, args.end, args.format)
+        elif args.command == 'import':
+            return command_line.import_records(args.file)
+        elif args.command == 'backup':
+            return command_line.backup()
+        elif args.command == 'maintain':
+            return command_line.maintain(args.budget, args.tasks)
+        elif args.command == 'audit':
+            return command_line.audit(args.start, args.end)
+        elif args.command == 'pdf':
+            return command_line.pdf(args.output, args.start, args.end)
+        elif args.command == 'graphs':
+            return command_line.graphs(args.output, args.format, args.charts, args.date)
+        elif args.command == 'serve':
+            return command_line.serve(args.host, args.port)
+    except (OSError, ValueError, sqlite3.Error) as err:
+        print('Error: ' + str(err), file=sys.stderr)
+        return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('../resources', 'resources/'), ('../README.md', '.'), ('../README.html', '.')],
-    hiddenimports=[],
+    hiddenimports=['pypdf'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
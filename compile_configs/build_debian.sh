@@ -59,6 +59,15 @@ cd /usr/local/$PROGRAMNAME
 EOF
 chmod +x $PROGRAMNAME.$VERSION/usr/bin/$PROGRAMNAME
 
+cat > $PROGRAMNAME.$VERSION/usr/bin/$PROGRAMNAME-cli <<EOF
+#!/bin/bash
+exec /usr/local/$PROGRAMNAME/$VENV/bin/python3 /usr/local/$PROGRAMNAME/cli.py "\$@"
+EOF
+chmod +x $PROGRAMNAME.$VERSION/usr/bin/$PROGRAMNAME-cli
+
+echo Installing Python Packages
+../$VENV/bin/python3 -m pip install --quiet -r ../requirements.txt || exit 1
+
 echo Copying Program Data
 cp ../*.py $PROGRAMNAME.$VERSION/usr/local/$PROGRAMNAME
 cp ../README.* $PROGRAMNAME.$VERSION/usr/local/$PROGRAMNAME
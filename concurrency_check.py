@@ -0,0 +1,94 @@
+'''
+Check that saves from two programs sharing one database never overwrite each other. Run from the program directory,
+e.g. "python concurrency_check.py --count 200".
+
+Two processes, like two workstations, each load the same record, add one to a count in it, and save it with the
+version they loaded, trying again whenever the save reports a conflict. With no lost updates the count ends at twice
+--count. The check exits with 1 if it doesn't.
+'''
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def increment(database_file, count, conflicts):
+    """
+    Loads a record, adds one to its bills_1 count, and saves it with the version it was loaded at, count times
+    :param str database_file: the shared database
+    :param int count: the number of increments
+    :param multiprocessing.Queue conflicts: gets the number of conflicting saves that had to be tried again
+    """
+    from database import GivingDatabase, RecordConflictError, VERSION_COLUMN
+
+    database = GivingDatabase(database_file)
+    retries = 0
+    for i in range(count):
+        while True:
+            record = database.get_record(1)
+            value = int(record['bills_1']) + 1
+            # give the other process time to read the same version between this read and write
+            time.sleep(0.001)
+            try:
+                database.update_record(1, {'bills_1': str(value)}, expected_version=record[VERSION_COLUMN])
+                break
+            except RecordConflictError:
+                retries += 1
+    conflicts.put(retries)
+
+
+def run_check(database_file, count, processes=2):
+    """
+    Runs processes increment loops at once against the database and returns the final count and the number of
+    conflicts that were retried
+    :param str database_file: the database to use; record 1's bills_1 is overwritten
+    :param int count: the increments each process makes
+    :param int processes: optional: the number of processes
+    """
+    from database import GivingDatabase
+
+    database = GivingDatabase(database_file)
+    database.add_version_column()
+    database.update_record(1, {'bills_1': '0'})
+
+    conflicts = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=increment, args=(database_file, count, conflicts))
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    retries = sum(conflicts.get() for worker in workers)
+    for worker in workers:
+        worker.join()
+    return int(database.get_record(1)['bills_1']), retries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Weekly Giving check for lost updates between two programs')
+    parser.add_argument('--count', type=int, default=200, help='increments each process makes (200)')
+    parser.add_argument('--processes', type=int, default=2, help='processes saving at once (2)')
+    args = parser.parse_args(argv)
+
+    from sample_data import generate_database
+
+    generated_dir = tempfile.mkdtemp()
+    try:
+        database_file = os.path.join(generated_dir, 'weekly_giving.db')
+        generate_database(database_file, 1)
+        final, retries = run_check(database_file, args.count, args.processes)
+    finally:
+        shutil.rmtree(generated_dir, ignore_errors=True)
+
+    expected = args.count * args.processes
+    print('Final count ' + str(final) + ' of ' + str(expected) + ', ' + str(retries) + ' conflicting saves retried')
+    if final != expected:
+        print(str(expected - final) + ' updates were lost')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,609 @@
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from metrics import metrics
+
+BILL_COLUMNS = ['bills_100', 'bills_50', 'bills_20', 'bills_10', 'bills_5', 'bills_1']
+BILL_VALUES = [100, 50, 20, 10, 5, 1]
+COIN_COLUMNS = ['coins_100', 'coins_25', 'coins_10', 'coins_5', 'coins_1']
+COIN_VALUES = [1.0, 0.25, 0.10, 0.05, 0.01]
+TOTAL_COLUMNS = [
+    'quantity_of_checks',
+    'total_designated_offerings',
+    'bills_total',
+    'coins_total',
+    'checks_total',
+    'total_deposit'
+]
+
+# SQL expressions giving the first day of the period each record's date falls in. Weeks are labeled by the Sunday that
+# ends them, so a midweek special offering is counted with the following Sunday.
+PERIOD_EXPRESSIONS = {
+    'week': "date(date, 'weekday 0')",
+    'month': "strftime('%Y-%m-01', date)",
+    'quarter': "strftime('%Y-', date) || printf('%02d', (CAST(strftime('%m', date) AS INTEGER) - 1) / 3 * 3 + 1) "
+               "|| '-01'",
+    'year': "strftime('%Y-01-01', date)"
+}
+PERIOD_COLUMNS = ['bills_total', 'coins_total', 'checks_total', 'total_designated_offerings', 'total_deposit']
+
+# each record's version, counted up by every update so that a save can tell if someone else saved the record first
+VERSION_COLUMN = 'version'
+
+
+def get_program_data_dir():
+    """
+    Returns the directory where the config file, log file, and default database are kept
+    """
+    if 'linux' in sys.platform:
+        return os.path.expanduser('~') + '/.WeeklyGiving'
+    else:
+        return os.path.expanduser('~/AppData/Roaming') + '/WeeklyGiving'
+
+
+def load_config(config_file):
+    """
+    Reads the configuration file and returns it as a dictionary
+    :param str config_file: path to the config.json file
+    """
+    with open(config_file, 'r') as file:
+        return json.loads(file.read())
+
+
+def parse_flag(value):
+    """
+    Converts a true/false setting from the config file to a bool. Older config files store them as the strings
+    "True" and "False", and the string "False" would otherwise count as true.
+    :param value: the setting's value
+    """
+    return str(value).strip().lower() == 'true'
+
+
+def parse_amount(text):
+    """
+    Converts a stored or displayed amount such as '$1,234.50' to a float. Raises ValueError if it isn't a number.
+    :param str text: the amount
+    """
+    return float(str(text).replace('$', '').replace(',', '').strip())
+
+
+def encode_notes(notes):
+    """
+    Replaces quotation marks in a record's notes with the placeholders used when storing them
+    :param str notes: the notes as entered
+    """
+    notes = notes.replace('"', '<apost>')
+    notes = notes.replace('\'', '<quot>')
+    return notes
+
+
+def decode_notes(notes):
+    """
+    Replaces the placeholders in a record's stored notes with quotation marks
+    :param str notes: the notes as stored
+    """
+    notes = notes.replace('<apost>', '\'')
+    notes = notes.replace('<quot>', '\"')
+    return notes
+
+
+def get_amount_sql(column):
+    """
+    Returns an SQL expression converting a stored amount such as '$1,234.50' to a number, treating empty values as zero
+    :param str column: the column holding the amount
+    """
+    return "CAST(REPLACE(REPLACE(COALESCE(" + column + ", ''), '$', ''), ',', '') AS REAL)"
+
+
+def get_create_table_sql(table_name='weekly_giving', num_checks=30):
+    """
+    Returns the SQL statement that creates the records table, with every amount stored as text
+    :param str table_name: optional: the table's name
+    :param int num_checks: optional: the number of check columns
+    """
+    columns = ['date', 'prepared_by'] + BILL_COLUMNS + COIN_COLUMNS + ['spec' + str(i) for i in range(1, 8)]
+    columns += ['checks_' + str(i) for i in range(num_checks)] + ['notes'] + TOTAL_COLUMNS
+    return ('CREATE TABLE "' + table_name + '" ("id" INTEGER, '
+            + ''.join('"' + column + '" TEXT, ' for column in columns) + 'PRIMARY KEY("id" AUTOINCREMENT))')
+
+
+def retry_when_locked(function, attempts=3, delay=0.5):
+    """
+    Calls a function that writes to the database, calling it again after a pause if the database is still locked by
+    another program once the connection's busy timeout has run out. Returns what the function returns.
+    :param function function: the function, which must do all of its work in its own transaction
+    :param int attempts: optional: the most times to call the function
+    :param float delay: optional: the pause before the first retry in seconds, doubled before each one after it
+    """
+    for attempt in range(attempts):
+        try:
+            return function()
+        except sqlite3.OperationalError as ex:
+            if attempt == attempts - 1 or ('locked' not in str(ex) and 'busy' not in str(ex)):
+                raise
+            time.sleep(delay * 2 ** attempt)
+
+
+class RecordConflictError(Exception):
+    """
+    Raised when a record being saved was changed or deleted by someone else after it was loaded
+    """
+    def __init__(self, id, current):
+        """
+        :param int id: ID number of the record
+        :param dict current: the record as it is now, or None if it was deleted
+        """
+        super().__init__('Record ' + str(id) + ' was ' + ('changed' if current else 'deleted') + ' by someone else')
+        self.id = id
+        self.current = current
+
+
+def calculate_totals(all_values):
+    """
+    Calculates the bills, coins, special designation, and check totals and the number of checks from the values of a
+    record's fields. Returns the list of totals and a list of any values that could not be read as amounts.
+    :param list all_values: the bills, coins, special designation, and check values, in that order
+    """
+    bills_tot = 0.0
+    coins_tot = 0.0
+    special_tot = 0.0
+    checks_tot = 0.0
+    num_checks = 0
+    errors = []
+
+    for i in range(0, 6):
+        if len(all_values[i]) > 0:
+            try:
+                bills_tot += float(all_values[i]) * BILL_VALUES[i]
+            except ValueError:
+                pass
+
+    for i in range(6, 11):
+        if len(all_values[i]) > 0:
+            try:
+                coins_tot += float(all_values[i]) * COIN_VALUES[i - 6]
+            except ValueError:
+                pass
+
+    for i in range(11, 18):
+        if len(all_values[i]) > 0:
+            try:
+                special_tot += float(all_values[i].replace(',', ''))
+            except ValueError as ex:
+                errors.append(str(ex))
+
+    for i in range(18, len(all_values)):
+        if len(all_values[i]) > 0:
+            try:
+                checks_tot += float(all_values[i].replace(',', ''))
+                num_checks += 1
+            except ValueError as ex:
+                errors.append(str(ex))
+
+    return [bills_tot, coins_tot, special_tot, checks_tot, num_checks], errors
+
+
+def get_record_values_in_order(record):
+    """
+    Returns a record's bills, coins, special designation, and check values in the order expected by calculate_totals
+    :param dict record: a record as returned by GivingDatabase.get_record
+    """
+    values = []
+    for column in BILL_COLUMNS + COIN_COLUMNS:
+        values.append(str(record.get(column) or ''))
+
+    for i in range(1, 8):
+        values.append(str(record.get('spec' + str(i)) or ''))
+
+    check_columns = [column for column in record if column.startswith('checks_') and column[7:].isdigit()]
+    check_columns.sort(key=lambda column: int(column.split('_')[1]))
+    for column in check_columns:
+        value = str(record[column] or '')
+        # unused check fields are stored as zero but are left empty in the gui
+        try:
+            if parse_amount(value) == 0:
+                value = ''
+        except ValueError:
+            pass
+        values.append(value)
+
+    return values
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Connection recording the time each statement takes to run in the database_query_seconds metric, labeled by the
+    statement's first keyword
+    """
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            statement = sql.split(None, 1)[0].lower() if sql.strip() else 'other'
+            metrics.observe('database_query_seconds', time.perf_counter() - start, {'statement': statement})
+
+
+class GivingDatabase:
+    """
+    Class providing access to the weekly giving records without any dependence on Qt, shared by the gui and the
+    command-line interface. The database file may be shared by several people at once, e.g. on a network drive, so
+    each connection waits up to busy_timeout seconds for another's lock to clear and writes are retried if it doesn't.
+    The rollback journal is kept rather than WAL, which doesn't work on network file systems.
+    """
+    busy_timeout = 10.0
+
+    def __init__(self, database_file, table_name='weekly_giving'):
+        """
+        :param str database_file: path to the SQLite database file
+        :param str table_name: name of the table holding the records
+        """
+        self.database_file = database_file
+        self.table_name = table_name
+        self.versioned = None
+
+    def connect(self):
+        return sqlite3.connect(self.database_file, timeout=self.busy_timeout, factory=TimedConnection)
+
+    def get_data_stamp(self):
+        """
+        Returns the database file's modification time and size, which change whenever a record is saved, so that
+        anything built from the records can tell when it is out of date
+        """
+        stat = os.stat(self.database_file)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get_column_names(self):
+        """
+        Returns the names of the table's columns in table order
+        """
+        conn = self.connect()
+        result = conn.execute('PRAGMA table_info(' + self.table_name + ')').fetchall()
+        conn.close()
+        return [row[1] for row in result]
+
+    def get_ids(self):
+        """
+        Returns a list of all id numbers in the table
+        """
+        conn = self.connect()
+        result = conn.execute('SELECT ID FROM ' + self.table_name).fetchall()
+        conn.close()
+        return [row[0] for row in result]
+
+    def get_dates(self):
+        """
+        Returns a list of (date, id) tuples for every record in the table
+        """
+        conn = self.connect()
+        result = conn.execute('SELECT Date, ID FROM ' + self.table_name).fetchall()
+        conn.close()
+        return result
+
+    def get_record_versions(self):
+        """
+        Returns a list of (id, date, version) tuples for every record in id order, the version being None if the table
+        has no version column
+        """
+        version = VERSION_COLUMN if self.has_version_column() else 'NULL'
+        conn = self.connect()
+        result = conn.execute('SELECT id, date, ' + version + ' FROM ' + self.table_name + ' ORDER BY id').fetchall()
+        conn.close()
+        return result
+
+    def create_date_index(self):
+        """
+        Adds an index on the date column, if there isn't one already, so that date ranges and period totals don't
+        have to scan the whole table
+        """
+        conn = self.connect()
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS ' + self.table_name + '_date ON ' + self.table_name + ' (date)')
+        conn.commit()
+        conn.close()
+
+    def add_version_column(self):
+        """
+        Adds the version column used to detect conflicting saves, if there isn't one already. Existing records start
+        at version 0.
+        """
+        if self.has_version_column():
+            return
+
+        def add_column():
+            conn = self.connect()
+            try:
+                conn.execute('ALTER TABLE ' + self.table_name + ' ADD COLUMN ' + VERSION_COLUMN
+                             + ' INTEGER NOT NULL DEFAULT 0')
+                conn.commit()
+            except sqlite3.OperationalError as ex:
+                # someone else added it first
+                if 'duplicate column' not in str(ex):
+                    raise
+            finally:
+                conn.close()
+
+        retry_when_locked(add_column)
+        self.versioned = True
+
+    def has_version_column(self):
+        """
+        Returns True if the table has the version column. A column is never removed, so once found it isn't looked
+        for again.
+        """
+        if not self.versioned:
+            self.versioned = VERSION_COLUMN in self.get_column_names()
+        return self.versioned
+
+    def get_deposits(self, start=None, end=None, details=False):
+        """
+        Returns a list of (date, total deposit) tuples ordered by date, optionally limited to a date range
+        :param str start: optional: the earliest date to include, as YYYY-MM-DD
+        :param str end: optional: the latest date to include, as YYYY-MM-DD
+        :param bool details: optional: whether to add who prepared each record and its notes to the tuples
+        """
+        sql = 'SELECT date, total_deposit FROM ' + self.table_name
+        if details:
+            sql = 'SELECT date, total_deposit, prepared_by, notes FROM ' + self.table_name
+        sql, parameters = self.add_date_range(sql, start, end)
+        sql += ' ORDER BY date'
+
+        conn = self.connect()
+        result = conn.execute(sql, parameters).fetchall()
+        conn.close()
+        return result
+
+    def get_period_totals(self, period, start=None, end=None, columns=PERIOD_COLUMNS):
+        """
+        Returns the sums of each record's totals for each week, month, quarter, or year, ordered by period. Each row
+        is a dictionary holding the period's first day as YYYY-MM-DD, the number of records, and the sums of the
+        columns.
+        :param str period: 'week', 'month', 'quarter', or 'year'
+        :param str start: optional: the earliest date to include, as YYYY-MM-DD
+        :param str end: optional: the latest date to include, as YYYY-MM-DD
+        :param list columns: optional: the amount columns to sum, PERIOD_COLUMNS if not given
+        """
+        period_expression = PERIOD_EXPRESSIONS[period]
+        sums = ', '.join('SUM(' + get_amount_sql(column) + ')' for column in columns)
+        sql = 'SELECT ' + period_expression + ' AS period, COUNT(*), ' + sums + ' FROM ' + self.table_name
+        sql, parameters = self.add_date_range(sql, start, end)
+        sql += ' GROUP BY period ORDER BY period'
+
+        conn = self.connect()
+        result = conn.execute(sql, parameters).fetchall()
+        conn.close()
+
+        rows = []
+        for row in result:
+            values = {'period': row[0], 'count': row[1]}
+            for i in range(len(columns)):
+                values[columns[i]] = row[i + 2] or 0.0
+            rows.append(values)
+        return rows
+
+    def add_date_range(self, sql, start=None, end=None):
+        """
+        Adds a WHERE clause limiting a query to a date range. Returns the query and its parameters.
+        :param str sql: the query, without a WHERE clause
+        :param str start: optional: the earliest date to include, as YYYY-MM-DD
+        :param str end: optional: the latest date to include, as YYYY-MM-DD
+        """
+        conditions = []
+        parameters = []
+        if start:
+            conditions.append('date >= ?')
+            parameters.append(start)
+        if end:
+            conditions.append('date <= ?')
+            parameters.append(end)
+        if len(conditions) > 0:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return sql, parameters
+
+    def get_record(self, id, conn=None):
+        """
+        Returns a dictionary of the given record's values keyed by column name, or None if there is no such record
+        :param int id: ID number of the record
+        :param sqlite3.Connection conn: optional: an open connection to use; it will not be closed
+        """
+        close = conn is None
+        if close:
+            conn = self.connect()
+        ex = conn.execute('SELECT * FROM ' + self.table_name + ' WHERE id = ?', (int(id),))
+        column_names = [description[0] for description in ex.description]
+        result = ex.fetchone()
+        if close:
+            conn.close()
+
+        if result is None:
+            return None
+        return {column_names[i]: result[i] for i in range(len(column_names))}
+
+    def get_records(self, start=None, end=None):
+        """
+        Returns a list of record dictionaries ordered by date, optionally limited to a date range
+        :param str start: optional: the earliest date to include, as YYYY-MM-DD
+        :param str end: optional: the latest date to include, as YYYY-MM-DD
+        """
+        sql = 'SELECT * FROM ' + self.table_name
+        sql, parameters = self.add_date_range(sql, start, end)
+        sql += ' ORDER BY date, id'
+
+        conn = self.connect()
+        ex = conn.execute(sql, parameters)
+        column_names = [description[0] for description in ex.description]
+        records = []
+        for row in ex.fetchall():
+            records.append({column_names[i]: row[i] for i in range(len(column_names))})
+        conn.close()
+        return records
+
+    def update_record(self, id, values, conn=None, expected_version=None):
+        """
+        Updates the given columns of a record and counts up its version. Returns the record's new version, or None if
+        the table has no version column.
+        :param int id: ID number of the record
+        :param dict values: new values keyed by column name; a version among them is ignored
+        :param sqlite3.Connection conn: optional: an open connection to use; it will not be committed or closed
+        :param int expected_version: optional: the version the record had when it was loaded. If someone else has
+            saved or deleted the record since, nothing is written and RecordConflictError is raised.
+        """
+        values = {column: values[column] for column in values if column != VERSION_COLUMN}
+        if len(values) == 0:
+            return None
+
+        assignments = []
+        parameters = []
+        for column in values:
+            assignments.append(column + ' = ?')
+            parameters.append(values[column])
+        versioned = self.has_version_column()
+        if versioned:
+            assignments.append(VERSION_COLUMN + ' = ' + VERSION_COLUMN + ' + 1')
+        parameters.append(int(id))
+
+        sql = 'UPDATE ' + self.table_name + ' SET ' + ', '.join(assignments) + ' WHERE id = ?'
+        if versioned and expected_version is not None:
+            sql += ' AND ' + VERSION_COLUMN + ' = ?'
+            parameters.append(int(expected_version))
+
+        def update(conn):
+            if conn.execute(sql, parameters).rowcount == 0 and versioned and expected_version is not None:
+                raise RecordConflictError(id, self.get_record(id, conn))
+            if versioned:
+                return conn.execute(
+                    'SELECT ' + VERSION_COLUMN + ' FROM ' + self.table_name + ' WHERE id = ?', (int(id),)).fetchone()[0]
+            return None
+
+        if conn:
+            return update(conn)
+
+        def update_and_commit():
+            conn = self.connect()
+            try:
+                # take the write lock before reading anything so two savers can't both read the same version
+                conn.execute('BEGIN IMMEDIATE')
+                version = update(conn)
+                conn.commit()
+                return version
+            finally:
+                conn.close()
+
+        return retry_when_locked(update_and_commit)
+
+    def insert_record(self, values, conn=None):
+        """
+        Inserts a new record. Columns not given are filled with '0', except for prepared_by and notes, which are left
+        empty.
+        :param dict values: values keyed by column name; must include id
+        :param sqlite3.Connection conn: optional: an open connection to use; it will not be committed or closed
+        """
+        column_names = self.get_column_names()
+        row = []
+        for column in column_names:
+            if column == VERSION_COLUMN:
+                row.append(0)
+            elif column in values:
+                row.append(values[column])
+            elif column in ['prepared_by', 'notes']:
+                row.append('')
+            else:
+                row.append('0')
+
+        sql = 'INSERT INTO ' + self.table_name + ' VALUES (' + ', '.join(['?'] * len(row)) + ')'
+        if conn:
+            conn.execute(sql, row)
+        else:
+            def insert():
+                conn = self.connect()
+                try:
+                    conn.execute(sql, row)
+                    conn.commit()
+                finally:
+                    conn.close()
+
+            retry_when_locked(insert)
+
+    def insert_blank_record(self, id, date):
+        """
+        Inserts an empty record with the given id number and date
+        :param int id: ID number of the new record
+        :param str date: the record's date, as YYYY-MM-DD
+        """
+        self.insert_record({'id': id, 'date': date})
+
+    def delete_record(self, id):
+        """
+        Removes a record from the table
+        :param int id: ID number of the record
+        """
+        def delete():
+            conn = self.connect()
+            try:
+                conn.execute('DELETE FROM ' + self.table_name + ' WHERE ID = ?', (int(id),))
+                conn.commit()
+            finally:
+                conn.close()
+
+        retry_when_locked(delete)
+
+    def get_space_usage(self):
+        """
+        Returns the database file's size, the space in it that VACUUM would give back, and how fragmented its tables
+        are, as a dictionary of 'file_size' and 'free_bytes' in bytes and 'free_fraction' and 'fragmentation' between
+        0 and 1. Fragmentation is the share of pages that don't follow the page before them, measured with the dbstat
+        table when SQLite has it and reported as None when it doesn't.
+        """
+        conn = self.connect()
+        try:
+            page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+            fragmentation = None
+            try:
+                pages = conn.execute(
+                    'SELECT name, pageno FROM dbstat WHERE name = ? ORDER BY path', (self.table_name,)
+                ).fetchall()
+                out_of_order = sum(1 for i in range(1, len(pages)) if pages[i][1] != pages[i - 1][1] + 1)
+                fragmentation = out_of_order / max(len(pages) - 1, 1)
+            except sqlite3.OperationalError:
+                # SQLite was built without the dbstat table
+                pass
+        finally:
+            conn.close()
+
+        return {
+            'file_size': page_size * page_count,
+            'free_bytes': page_size * free_pages,
+            'free_fraction': free_pages / page_count if page_count else 0.0,
+            'fragmentation': fragmentation
+        }
+
+    def backup(self, max_backups=5):
+        """
+        Writes a backup file to the database's directory, appending the current date and time to the file name.
+        Removes the oldest backup file if there are already max_backups or more. Returns the new backup's path.
+        :param int max_backups: optional: the number of backup files to keep
+        """
+        database_dir = os.path.dirname(os.path.abspath(self.database_file))
+        database_name = os.path.basename(self.database_file)
+
+        backup_files = []
+        for file in os.listdir(database_dir):
+            if file.startswith(database_name + '.backup.'):
+                backup_files.append(os.path.join(database_dir, file))
+        backup_files.sort(key=os.path.getmtime)
+
+        while len(backup_files) >= max_backups:
+            os.remove(backup_files.pop(0))
+
+        now = datetime.now().strftime('%m-%d-%Y_%H-%M-%S')
+        new_backup_file = os.path.join(database_dir, database_name + '.backup.' + now)
+        shutil.copy(self.database_file, new_backup_file)
+        return new_backup_file
@@ -0,0 +1,112 @@
+import sqlite3
+
+from PyQt6.QtCore import QObject, QTimer
+
+from database import VERSION_COLUMN
+
+
+class DatabaseWatcher(QObject):
+    """
+    Class to notice when someone else, e.g. at another workstation, changes the database, and bring the navigation
+    lists and the current record up to date. A timer polls PRAGMA data_version, which changes whenever another
+    connection commits and costs next to nothing to read. Only on a change is the list of record ids, dates, and
+    versions read and compared with what is shown. The current record is reloaded only if the user has no unsaved
+    edits to it; if they do, their edits are kept and saving them will ask how to settle the conflict.
+    """
+    poll_ms = 2000
+
+    def __init__(self, main):
+        """
+        :param Main main: the Main instance
+        """
+        super().__init__()
+        self.main = main
+        # a connection of its own, kept open since data_version is only meaningful within one connection. It doesn't
+        # wait for locks, so a poll that finds the database busy is just skipped.
+        self.conn = sqlite3.connect(main.database.database_file, timeout=0)
+        self.data_version = self.get_data_version()
+
+        self.timer = QTimer()
+        self.timer.setInterval(self.poll_ms)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start()
+
+    def get_data_version(self):
+        """
+        Returns the database's data version, or None if it couldn't be read
+        """
+        try:
+            return self.conn.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def poll(self):
+        """
+        Refreshes the records shown if the database has changed since the last poll
+        """
+        data_version = self.get_data_version()
+        if data_version is None or data_version == self.data_version:
+            return
+
+        try:
+            self.refresh()
+            self.data_version = data_version
+        except sqlite3.Error as err:
+            # tried again at the next poll
+            self.main.write_log('Error from DatabaseWatcher.poll: ' + str(err))
+
+    def refresh(self):
+        """
+        Updates the navigation lists with records added, deleted, or redated elsewhere, then reloads the current record
+        if it was changed or moves to a neighbouring one if it was deleted, unless the user has unsaved edits
+        """
+        rows = self.main.database.get_record_versions()
+        ids = [row[0] for row in rows]
+        versions = {row[0]: row[2] for row in rows}
+
+        self.main.ids = ids
+        self.main.gui.update_combo_boxes([(row[0], row[1]) for row in rows])
+
+        if len(self.main.gui.id_num_label.text()) == 0:
+            # no record was shown because there were none
+            if len(ids) > 0:
+                self.main.get_last_rec()
+            return
+
+        current_id = int(self.main.gui.id_num_label.text())
+        dirty = len(self.main.gui.get_dirty_columns()) > 0
+
+        if current_id not in versions:
+            if dirty:
+                self.main.write_log('Record ' + str(current_id) + ' was deleted elsewhere; keeping unsaved edits')
+            elif len(ids) > 0:
+                self.main.write_log('Record ' + str(current_id) + ' was deleted elsewhere')
+                # show the record that took its place
+                next_ids = [id for id in ids if id > current_id]
+                self.main.get_by_id(next_ids[0] if next_ids else ids[-1])
+            return
+
+        self.main.current_id_index = ids.index(current_id)
+        self.main.gui.prev_rec_button.setEnabled(self.main.current_id_index > 0)
+        self.main.gui.next_rec_button.setEnabled(self.main.current_id_index < len(ids) - 1)
+
+        # without a version column any change might be to this record
+        version = versions[current_id]
+        if version is not None and version == self.main.loaded_version:
+            return
+
+        if dirty:
+            self.main.write_log('Record ' + str(current_id) + ' was changed elsewhere; keeping unsaved edits')
+            return
+
+        record = self.main.database.get_record(current_id)
+        self.main.gui.fill_values(record)
+        self.main.loaded_version = record.get(VERSION_COLUMN)
+        self.main.gui.save_button.setEnabled(False)
+
+    def close(self):
+        """
+        Stops polling and closes the connection
+        """
+        self.timer.stop()
+        self.conn.close()
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QDialog, QVBoxLayout, QTableWidget, QHeaderView, QHBoxLayout, QPushButton, QCheckBox, \
+    QLabel, QFileDialog, QTableWidgetItem
+
+from metrics import DESCRIPTIONS, metrics
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    Class implementing QDialog to show the counters and latencies in metrics.metrics, so that the user can see how
+    long the program's operations take on their machine and save the numbers to send with a bug report
+    """
+    columns = ['Metric', 'Labels', 'Count', 'Average ms', 'Median ms', '95% ms', 'Longest ms', 'Total ms']
+
+    def __init__(self, main):
+        """
+        :param Main main: the Main instance
+        """
+        super().__init__(main.gui)
+        self.main = main
+
+        self.setWindowTitle('Diagnostics')
+        self.resize(900, 500)
+        layout = QVBoxLayout(self)
+
+        self.since_label = QLabel()
+        layout.addWidget(self.since_label)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setFont(main.gui.standard_font)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        self.save_on_exit_checkbox = QCheckBox('Save these numbers to a file when the program closes')
+        self.save_on_exit_checkbox.setChecked(main.save_metrics_enabled)
+        self.save_on_exit_checkbox.toggled.connect(main.set_save_metrics)
+        layout.addWidget(self.save_on_exit_checkbox)
+
+        button_layout = QHBoxLayout()
+        layout.addLayout(button_layout)
+
+        refresh_button = QPushButton('Refresh')
+        refresh_button.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_button)
+
+        reset_button = QPushButton('Reset')
+        reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(reset_button)
+
+        save_button = QPushButton('Save As...')
+        save_button.clicked.connect(self.save)
+        button_layout.addWidget(save_button)
+        button_layout.addStretch()
+
+        close_button = QPushButton('Close')
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(close_button)
+
+    def refresh(self):
+        """
+        Method to fill the table with the current metrics
+        """
+        self.since_label.setText('Recorded since ' + metrics.started.strftime('%Y-%m-%d %H:%M:%S'))
+        rows = metrics.get_rows()
+
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i in range(len(rows)):
+            row = rows[i]
+            values = [row['name'], row['labels'], str(row['count'])]
+            if 'total' in row:
+                values += ['{:.1f}'.format(row[key] * 1000) for key in ['average', 'median', 'p95', 'longest', 'total']]
+            else:
+                values += [''] * 5
+
+            for j in range(len(values)):
+                item = QTableWidgetItem(values[j])
+                if j > 1:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                if j == 0 and row['name'] in DESCRIPTIONS:
+                    item.setToolTip(DESCRIPTIONS[row['name']])
+                self.table.setItem(i, j, item)
+        self.table.resizeColumnsToContents()
+        self.table.setUpdatesEnabled(True)
+
+    def reset(self):
+        """
+        Method to clear the metrics so that an operation can be measured on its own
+        """
+        metrics.clear()
+        self.refresh()
+
+    def save(self):
+        """
+        Method to save the metrics to a file of the user's choosing in the OpenMetrics text format
+        """
+        file_name = QFileDialog.getSaveFileName(
+            self,
+            'Save Metrics',
+            self.main.file_locations['program_data_dir'] + '/metrics_' + datetime.now().strftime('%Y-%m-%d') + '.txt',
+            'Text Files (*.txt)'
+        )[0]
+        if not file_name:
+            return
+
+        try:
+            metrics.write(file_name)
+        except OSError as err:
+            self.main.write_log('*Error from DiagnosticsDialog.save: ' + str(err))
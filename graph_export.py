@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+
+from database import PERIOD_COLUMNS
+
+FORMATS = ['png', 'svg', 'pdf']
+
+
+def get_file_stem(name):
+    """
+    Turns a chart's name into a file name without an extension, e.g. 'Monthly Giving' becomes 'monthly-giving'
+    :param str name: the chart's name
+    """
+    return re.sub('[^a-z0-9]+', '-', name.lower()).strip('-') or 'chart'
+
+
+def render_chart(chart, data, file_names):
+    """
+    Builds a chart's figure and saves it to each of its files, whose extensions give the formats. Runs in a worker
+    process, so it must stay at module level.
+    :param dict chart: the chart's settings, as described in GraphExport
+    :param list data: the chart's rows or (date, amount) pairs, as returned by GraphExport.get_chart_data
+    :param list file_names: the files to write
+    """
+    from graph_this import PeriodGraph, YearToDateGraph
+
+    if chart['kind'] == 'ytd':
+        figure = YearToDateGraph(data, chart['today']).build_figure()
+    else:
+        graph = PeriodGraph(data, chart['period'], chart['column'], chart['name'], chart['name'])
+        figure = graph.build_figure(chart.get('graph_type', 'bar'), chart.get('stacked', False))
+
+    figure.set_size_inches(11, 8.5)
+    for file_name in file_names:
+        figure.savefig(file_name, dpi=150)
+    return file_names
+
+
+class GraphExport:
+    """
+    Class to save a set of charts to PNG, SVG, or PDF files in one run without showing them, e.g. for a newsletter.
+    Each chart is a dictionary holding its 'name' and 'kind':
+
+    - 'period': totals of a 'column' (total_deposit if not given) by 'period' (month if not given) over the last
+      'months' months (12 if not given), drawn as a 'graph_type' of 'bar' (the default) or 'line', optionally
+      'stacked' to show bills, coins, checks, and designated offerings
+    - 'ytd': the running total of the year so far against the year before
+
+    Without a configured set, the charts are monthly giving, the monthly giving to each named special designation,
+    and the year to date. The data is read here and the charts are drawn in parallel in a process pool.
+    """
+    def __init__(self, database, spec_designations, charts=None):
+        """
+        :param database.GivingDatabase database: the records database
+        :param dict spec_designations: the special designation names
+        :param list charts: optional: the charts to export, instead of the default set
+        """
+        self.database = database
+        self.spec_designations = spec_designations
+        self.charts = charts or self.get_default_charts()
+
+    def get_default_charts(self):
+        """
+        Returns monthly giving, monthly giving to each special designation that has a name, and the year to date
+        """
+        charts = [{'name': 'Monthly Giving', 'kind': 'period', 'period': 'month', 'months': 12}]
+        for i in range(1, 8):
+            designation = self.spec_designations.get('spec' + str(i), '').strip()
+            if len(designation) > 0:
+                charts.append({'name': designation, 'kind': 'period', 'period': 'month', 'months': 12,
+                               'column': 'spec' + str(i)})
+        charts.append({'name': 'Year to Date', 'kind': 'ytd'})
+        return charts
+
+    def get_chart_data(self, chart, today):
+        """
+        Reads a chart's data from the database. Returns the period totals or (date, amount) pairs, or an empty list if
+        there is nothing to draw.
+        :param dict chart: the chart's settings
+        :param datetime.date today: the last day to include
+        """
+        if chart['kind'] == 'ytd':
+            start = date(today.year - 1, 1, 1)
+            return self.database.get_deposits(start.isoformat(), today.isoformat())
+
+        # start at the first day of the month months - 1 months ago, so the current month is the last of them
+        months = chart.get('months', 12)
+        month_index = today.year * 12 + today.month - months
+        start = date(month_index // 12, month_index % 12 + 1, 1)
+        columns = PERIOD_COLUMNS
+        if chart['column'] not in columns:
+            columns = PERIOD_COLUMNS + [chart['column']]
+        rows = self.database.get_period_totals(chart['period'], start.isoformat(), today.isoformat(), columns)
+        # a fund nobody gave to in the range isn't worth a chart
+        if not any(row[chart['column']] for row in rows):
+            return []
+        return rows
+
+    def check_charts(self):
+        """
+        Fills in each chart's defaults and raises ValueError for a chart that can't be drawn, or for two charts that
+        would be saved to the same file, so that a mistake in a configured set is reported before any work is done.
+        The charts are copied first, leaving the configured ones as they were.
+        """
+        column_names = self.database.get_column_names()
+        checked = []
+        stems = {}
+        for chart in self.charts:
+            if 'name' not in chart or chart.get('kind') not in ('period', 'ytd'):
+                raise ValueError('Each chart needs a name and a kind of "period" or "ytd": ' + str(chart))
+            chart = dict(chart)
+            if chart['kind'] == 'period':
+                chart.setdefault('period', 'month')
+                chart.setdefault('column', 'total_deposit')
+                if chart['period'] not in ('week', 'month', 'quarter', 'year'):
+                    raise ValueError('Unknown period for chart "' + chart['name'] + '": ' + str(chart['period']))
+                if chart['column'] not in column_names:
+                    raise ValueError('Unknown column for chart "' + chart['name'] + '": ' + str(chart['column']))
+
+            stem = get_file_stem(chart['name'])
+            if stem in stems:
+                raise ValueError('Charts "' + stems[stem] + '" and "' + chart['name'] + '" would be saved to the same '
+                                 'file; give them different names')
+            stems[stem] = chart['name']
+            checked.append(chart)
+        self.charts = checked
+
+    def export(self, directory, formats=None, today=None, progress=None):
+        """
+        Saves each chart that has data to the directory in each format. Returns the files written.
+        :param str directory: the directory to write to
+        :param list formats: optional: any of 'png', 'svg', and 'pdf', all of them if not given
+        :param datetime.date today: optional: the last day to include, the current date if not given
+        :param function progress: optional: called with the number of charts done and the total number of charts
+        """
+        if not formats:
+            formats = FORMATS
+        if not today:
+            today = date.today()
+        for file_format in formats:
+            if file_format not in FORMATS:
+                raise ValueError('Unknown graph format: ' + file_format)
+        self.check_charts()
+        os.makedirs(directory, exist_ok=True)
+
+        jobs = []
+        for chart in self.charts:
+            data = self.get_chart_data(chart, today)
+            if len(data) > 0:
+                chart = dict(chart, today=today.isoformat())
+                stem = os.path.join(directory, get_file_stem(chart['name']))
+                jobs.append((chart, data, [stem + '.' + file_format for file_format in formats]))
+
+        files = []
+        if len(jobs) == 0:
+            return files
+
+        charts_done = 0
+        # spawned rather than forked, since the gui exports from a thread pool worker and forking a process with other
+        # threads running can leave the copy holding their locks
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(len(jobs), os.cpu_count() or 1), mp_context=context) as executor:
+            futures = [executor.submit(render_chart, *job) for job in jobs]
+            for future in as_completed(futures):
+                files += future.result()
+                charts_done += 1
+                if progress:
+                    progress(charts_done, len(jobs))
+        return sorted(files)
@@ -1,96 +1,454 @@
-import datetime
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+import numpy as np
 
-import matplotlib.pyplot as plot
+from database import decode_notes
+
+
+def downsample(x, y, threshold):
+    """
+    Chooses which points of a series to draw using the largest-triangle-three-buckets algorithm, which keeps the
+    series' shape, including single-week peaks like Easter and Christmas, with far fewer points. Returns the indexes
+    of the points to keep.
+    :param numpy.ndarray x: the x values, in ascending order
+    :param numpy.ndarray y: the y values
+    :param int threshold: the number of points to keep
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    # the first and last points are always kept, and every bucket in between contributes the point that makes the
+    # largest triangle with the point kept from the previous bucket and the average of the next bucket
+    bucket_size = (length - 2) / (threshold - 2)
+    indexes = np.zeros(threshold, dtype=int)
+    previous = 0
+    for i in range(threshold - 2):
+        average_start = int((i + 1) * bucket_size) + 1
+        average_end = min(int((i + 2) * bucket_size) + 1, length)
+        average_x = x[average_start:average_end].mean()
+        average_y = y[average_start:average_end].mean()
+
+        range_start = int(i * bucket_size) + 1
+        range_end = int((i + 1) * bucket_size) + 1
+        areas = np.abs(
+            (x[previous] - average_x) * (y[range_start:range_end] - y[previous])
+            - (x[previous] - x[range_start:range_end]) * (average_y - y[previous])
+        )
+        previous = range_start + int(areas.argmax())
+        indexes[i + 1] = previous
+
+    indexes[threshold - 1] = length - 1
+    return indexes
+
+
+class Crosshair:
+    """
+    Class to follow the mouse over a graph with a crosshair and a tooltip describing the nearest point. Only the
+    crosshair and tooltip are redrawn as the mouse moves: the rest of the graph is saved after each full draw and
+    copied back underneath them (blitting), so hovering costs the same however many points the graph has.
+    """
+    def __init__(self, ax, x, y, get_text):
+        """
+        :param matplotlib.axes.Axes ax: the axes
+        :param numpy.ndarray x: the points' x values as matplotlib date numbers, in ascending order
+        :param numpy.ndarray y: the points' y values
+        :param function get_text: called with a point's index to get its tooltip text
+        """
+        self.ax = ax
+        self.x = x
+        self.y = y
+        self.get_text = get_text
+        self.background = None
+        self.canvas = None
+
+        self.vertical = ax.axvline(x[0], color='gray', linewidth=0.8, animated=True, visible=False)
+        self.horizontal = ax.axhline(y[0], color='gray', linewidth=0.8, animated=True, visible=False)
+        self.marker = ax.plot(x[:1], y[:1], marker='o', markersize=8, markerfacecolor='none', color='black',
+                              animated=True, visible=False)[0]
+        self.tooltip = ax.annotate(
+            '', xy=(x[0], y[0]), xytext=(12, 12), textcoords='offset points', size=8, animated=True, visible=False,
+            bbox={'boxstyle': 'round', 'facecolor': 'lightyellow', 'alpha': 0.9})
+        self.artists = [self.vertical, self.horizontal, self.marker, self.tooltip]
+
+        ax.figure.canvas.mpl_connect('draw_event', self.on_draw)
+        ax.figure.canvas.mpl_connect('motion_notify_event', self.on_move)
+        ax.figure.canvas.mpl_connect('axes_leave_event', lambda event: self.hide())
+
+    def on_draw(self, event):
+        """
+        Saves the newly drawn graph to restore underneath the crosshair
+        :param matplotlib.backend_bases.DrawEvent event: the draw event
+        """
+        canvas = event.canvas
+        if not getattr(canvas, 'supports_blit', False):
+            return
+        self.canvas = canvas
+        self.background = canvas.copy_from_bbox(canvas.figure.bbox)
+        self.draw_artists()
+
+    def on_move(self, event):
+        """
+        Moves the crosshair and tooltip to the point nearest the mouse
+        :param matplotlib.backend_bases.MouseEvent event: the mouse event
+        """
+        # the graph is redrawn anyway while it is being dragged
+        if self.background is None or event.inaxes is not self.ax or event.button:
+            return
+
+        index = int(np.searchsorted(self.x, event.xdata))
+        if index == len(self.x) or (index > 0 and event.xdata - self.x[index - 1] < self.x[index] - event.xdata):
+            index -= 1
+        x = self.x[index]
+        y = self.y[index]
+
+        self.vertical.set_xdata([x, x])
+        self.horizontal.set_ydata([y, y])
+        self.marker.set_data([x], [y])
+        self.tooltip.xy = (x, y)
+        self.tooltip.set_text(self.get_text(index))
+        # keep the tooltip inside the axes by putting it on the side of the point closer to the middle
+        x_min, x_max = self.ax.get_xlim()
+        y_min, y_max = self.ax.get_ylim()
+        right = x > (x_min + x_max) / 2
+        top = y > (y_min + y_max) / 2
+        self.tooltip.set_position((-12 if right else 12, -12 if top else 12))
+        self.tooltip.set_horizontalalignment('right' if right else 'left')
+        self.tooltip.set_verticalalignment('top' if top else 'bottom')
+        for artist in self.artists:
+            artist.set_visible(True)
+        self.blit()
+
+    def hide(self):
+        if self.background is None or not self.tooltip.get_visible():
+            return
+        for artist in self.artists:
+            artist.set_visible(False)
+        self.blit()
+
+    def blit(self):
+        """
+        Restores the saved graph and draws the crosshair and tooltip over it
+        """
+        # the saved graph belongs to the canvas it was drawn on, and the figure may have been given another since
+        if self.ax.figure.canvas is not self.canvas:
+            self.background = None
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_artists()
+        self.canvas.blit(self.ax.figure.bbox)
+
+    def draw_artists(self):
+        for artist in self.artists:
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
 
 
 class LineGraph:
     """
-    Class to create line or bar graphs of data collected when the user chooses a date range to graph
+    Class to create line or bar graphs of data collected when the user chooses a date range to graph. Figures are
+    created without pyplot, so they can be built off of the gui thread and are freed once nothing refers to them.
+    Rather than labeling every point, the graph shows the date, amount, preparer, and notes of the point nearest the
+    mouse.
     """
     pairs = None
+    max_bars = 150
+    max_notes_length = 60
+    crosshair = None
+
     def __init__(self):
         self.x = []
         self.y = []
+        # the index in self.pairs of each point in the arrays returned by prepare_data
+        self.record_indexes = []
+        # full-resolution series that are downsampled to the width of the axes whenever the view changes
+        self.series = []
+
+    def prepare_data(self):
+        """
+        Converts self.pairs, a list of (date, amount) pairs as stored in the database, to arrays of dates and amounts
+        ordered by date, leaving out records without a date or amount. Returns the dates, the amounts, and a mask that
+        is True for records not on a Sunday. The pairs may also hold who prepared the record and its notes, as
+        returned by database.GivingDatabase.get_deposits with details.
+        """
+        self.x = np.array([item[0] or '' for item in self.pairs], dtype=str)
+        self.y = np.array([item[1] or '' for item in self.pairs], dtype=str)
+
+        amounts = np.char.strip(np.char.replace(np.char.replace(self.y, '$', ''), ',', ''))
+        keep = (amounts != '') & (self.x != '')
+        dates = self.x[keep].astype('datetime64[D]')
+        amounts = amounts[keep].astype(float)
+        record_indexes = np.flatnonzero(keep)
 
-    def graph_values_by_date_line(self):
-        for item in self.pairs:
-            self.x.append(item[0])
-            self.y.append(item[1])
+        keep = amounts != 0
+        dates = dates[keep]
+        amounts = amounts[keep]
+        record_indexes = record_indexes[keep]
 
-        x_vals = []
-        y_vals = []
-        total = 0.0
-        for i in range(0, len(self.x)):
-            if self.y[i]:
-                clean_y = float(self.y[i].replace('$', '').replace(',', ''))
-                if clean_y and self.x[i]:
-                    x_vals.append(self.x[i])
-                    y_vals.append(clean_y)
-                    total += float(clean_y)
+        order = np.argsort(dates, kind='stable')
+        dates = dates[order]
+        amounts = amounts[order]
+        self.record_indexes = record_indexes[order]
 
-        plot.rc('xtick', labelsize=8)
-        plot.rc('ytick', labelsize=8)
+        # 1970-01-01 was a Thursday, so a date's weekday, counting from Monday as 0, is (days since then + 3) % 7
+        special = (dates.astype('int64') + 3) % 7 != 6
+        return dates, amounts, special
 
-        fig, ax = plot.subplots()
+    def build_figure(self, graph_type='line'):
+        """
+        Creates the graph's figure
+        :param str graph_type: optional: 'line' or 'bar'
+        """
+        dates, amounts, special = self.prepare_data()
+        total = amounts.sum()
 
-        ax.set_title('Giving from ' + self.x[0] + ' through ' + self.x[len(self.x) - 1] + ' | Total: $' + str('{:,.2f}'.format(total)), size=12, weight='bold')
+        fig = Figure(layout='tight')
+        ax = fig.subplots()
+        ax.tick_params(labelsize=8)
+
+        ax.set_title('Giving from ' + self.x[0] + ' through ' + self.x[len(self.x) - 1] + ' | Total: $' + str(
+            '{:,.2f}'.format(total)), size=12, weight='bold')
         ax.set_xlabel('Date', size=12, style='italic')
         ax.set_ylabel('Amount', size=12, style='italic')
-        ax.plot(x_vals, y_vals, linewidth=1.0, marker='o', markersize=2, label='Sunday Offerings')
 
-        #place a different marker for non-Sundays
-        for i in range(len(x_vals)):
-            if not datetime.datetime.strptime(x_vals[i], '%Y-%m-%d').weekday() == 6:
-                ax.plot(x_vals[i], y_vals[i], linewidth=1.0, marker='s', markersize=3, color='red', label='Special Offering')
+        if graph_type == 'bar' and len(amounts) <= self.max_bars:
+            ax.bar(dates[~special], amounts[~special], width=4, label='Sunday Offerings')
+            ax.bar(dates[special], amounts[special], width=4, color='red', label='Special Offering')
+        elif graph_type == 'bar':
+            # with this many bars each one is only a pixel or two wide, so they are drawn as one collection of lines
+            # rather than a rectangle apiece
+            sunday_lines = ax.vlines(dates[~special], 0, amounts[~special], linewidth=2, label='Sunday Offerings')
+            special_lines = ax.vlines(
+                dates[special], 0, amounts[special], linewidth=2, color='red', label='Special Offering')
+            self.add_series(sunday_lines, dates[~special], amounts[~special])
+            self.add_series(special_lines, dates[special], amounts[special])
+        else:
+            line = ax.plot(dates, amounts, linewidth=1.0, marker='o', markersize=2, label='Sunday Offerings')[0]
+            self.add_series(line, dates, amounts)
+            # place a different marker for non-Sundays
+            ax.scatter(dates[special], amounts[special], marker='s', s=9, color='red', label='Special Offering',
+                       zorder=3)
+
         ax.legend()
+        ax.tick_params(axis='x', labelrotation=90)
+        # records that are all zero, e.g. new ones, leave nothing to point at
+        if len(dates) > 0:
+            self.crosshair = Crosshair(ax, mdates.date2num(dates), amounts, self.get_tooltip_text)
+
+        if len(self.series) > 0:
+            self.update_series(ax)
+            ax.callbacks.connect('xlim_changed', self.update_series)
+            fig.canvas.mpl_connect('resize_event', lambda event: self.update_series(ax))
+        return fig
+
+    def get_tooltip_text(self, index):
+        """
+        Returns the tooltip text of a point: its date and amount, who prepared the record, and the start of its notes
+        :param int index: the point's index in the arrays returned by prepare_data
+        """
+        pair = self.pairs[self.record_indexes[index]]
+        text = str(pair[0]) + '\n' + '${:,.2f}'.format(float(str(pair[1]).replace('$', '').replace(',', '')))
+        if len(pair) > 2 and pair[2]:
+            text += '\nPrepared by ' + str(pair[2])
+        if len(pair) > 3 and pair[3] and str(pair[3]).strip():
+            notes = ' '.join(decode_notes(str(pair[3])).split())
+            if len(notes) > self.max_notes_length:
+                notes = notes[:self.max_notes_length - 3] + '...'
+            text += '\n' + notes
+        return text
 
-        for i, j in zip(x_vals, y_vals):
-            ax.annotate('$' + '{:,.2f}'.format(j), xy=(i, j), xytext=(5, 2), textcoords='offset points', size=8)
+    def add_series(self, artist, dates, amounts):
+        """
+        Registers a line or line collection to be downsampled to the width of the axes
+        :param matplotlib.artist.Artist artist: the Line2D or LineCollection
+        :param numpy.ndarray dates: the series' dates
+        :param numpy.ndarray amounts: the series' amounts
+        """
+        self.series.append({'artist': artist, 'x': mdates.date2num(dates), 'y': amounts})
 
-        plot.xticks(rotation=90)
+    def update_series(self, ax):
+        """
+        Redraws each series with only as many points as the axes are pixels wide, taken from the part of the series
+        that is in view. Zooming in therefore brings back the full resolution.
+        :param matplotlib.axes.Axes ax: the axes
+        """
+        threshold = max(int(ax.get_window_extent().width), 3)
+        x_min, x_max = ax.get_xlim()
+        for series in self.series:
+            # include one point on either side of the view so lines run to the edges
+            start = max(int(np.searchsorted(series['x'], x_min)) - 1, 0)
+            end = int(np.searchsorted(series['x'], x_max, side='right')) + 1
+            x = series['x'][start:end]
+            y = series['y'][start:end]
+            indexes = downsample(x, y, threshold)
 
-        figManager = plot.get_current_fig_manager()
-        figManager.window.showMaximized()
-        plot.show()
+            if isinstance(series['artist'], Line2D):
+                series['artist'].set_data(x[indexes], y[indexes])
+            else:
+                segments = np.zeros((len(indexes), 2, 2))
+                segments[:, :, 0] = x[indexes, np.newaxis]
+                segments[:, 1, 1] = y[indexes]
+                series['artist'].set_segments(segments)
 
-    def graph_values_by_date_bar(self):
-        for item in self.pairs:
-            self.x.append(item[0])
-            self.y.append(item[1])
 
-        x_vals = []
-        y_vals = []
-        total = 0.0
-        for i in range(0, len(self.x)):
-            if self.y[i]:
-                clean_y = float(self.y[i].replace('$', '').replace(',', ''))
-                if clean_y and self.x[i]:
-                    x_vals.append(self.x[i])
-                    y_vals.append(clean_y)
-                    total += float(clean_y)
+class PeriodGraph(LineGraph):
+    """
+    Class to create line or bar graphs of giving totaled by week, month, quarter, or year, optionally stacked to show
+    how much of each period's giving came from bills, coins, checks, and designated offerings
+    """
+    period_names = {'week': 'Week', 'month': 'Month', 'quarter': 'Quarter', 'year': 'Year'}
+    bar_widths = {'week': 5, 'month': 25, 'quarter': 80, 'year': 300}
+    stack_columns = ['bills_total', 'coins_total', 'checks_total', 'total_designated_offerings']
+    stack_labels = ['Bills', 'Coins', 'Checks', 'Designated Offerings']
 
-        plot.rc('xtick', labelsize=8)
-        plot.rc('ytick', labelsize=8)
+    def __init__(self, rows, period, column='total_deposit', name='Giving', label='Total Deposit'):
+        """
+        :param list rows: the period totals, as returned by database.GivingDatabase.get_period_totals
+        :param str period: 'week', 'month', 'quarter', or 'year'
+        :param str column: optional: the column to graph when the totals aren't stacked
+        :param str name: optional: what is being graphed, for the title
+        :param str label: optional: the legend label of the graphed column
+        """
+        super().__init__()
+        self.rows = rows
+        self.period = period
+        self.column = column
+        self.name = name
+        self.label = label
 
-        fig, ax = plot.subplots()
+    def build_figure(self, graph_type='line', stacked=False, tooltips=False):
+        """
+        Creates the graph's figure
+        :param str graph_type: optional: 'line' or 'bar'
+        :param bool stacked: optional: whether to stack the bills, coins, checks, and designated offerings
+        :param bool tooltips: optional: whether to show each period's total in a tooltip instead of a label, for
+            graphs shown on screen
+        """
+        dates = np.array([row['period'] for row in self.rows], dtype='datetime64[D]')
+        totals = np.array([row[self.column] for row in self.rows], dtype=float)
 
-        ax.set_title('Giving from ' + self.x[0] + ' through ' + self.x[len(self.x) - 1] + ' | Total: $' + str(
-            '{:,.2f}'.format(total)), size=12, weight='bold')
-        ax.set_xlabel('Date', size=12, style='italic')
+        fig = Figure(layout='tight')
+        ax = fig.subplots()
+        ax.tick_params(labelsize=8)
+
+        ax.set_title(self.name + ' by ' + self.period_names[self.period] + ' from ' + self.rows[0]['period']
+                     + ' through ' + self.rows[len(self.rows) - 1]['period'] + ' | Total: $'
+                     + '{:,.2f}'.format(totals.sum()), size=12, weight='bold')
+        ax.set_xlabel(self.period_names[self.period], size=12, style='italic')
         ax.set_ylabel('Amount', size=12, style='italic')
-        ax.bar(x_vals, y_vals, label='Sunday Offerings')
 
-        # place a different marker for non-Sundays
-        for i in range(len(x_vals)):
-            if not datetime.datetime.strptime(x_vals[i], '%Y-%m-%d').weekday() == 6:
-                ax.bar(x_vals[i], y_vals[i], color='red', label='Special Offering')
-        ax.legend()
+        width = self.bar_widths[self.period]
+        # as in LineGraph, too many bars are drawn as line collections rather than a rectangle apiece, and aren't
+        # labeled either
+        dense = len(dates) > self.max_bars
+        labeled = not dense and not tooltips
+        if stacked:
+            stacks = [np.array([row[column] for row in self.rows], dtype=float) for column in self.stack_columns]
+            if graph_type == 'bar':
+                bottom = np.zeros(len(dates))
+                for i in range(len(stacks)):
+                    if dense:
+                        ax.vlines(dates, bottom, bottom + stacks[i], linewidth=2, color='C' + str(i),
+                                  label=self.stack_labels[i])
+                    else:
+                        ax.bar(dates, stacks[i], width=width, bottom=bottom, label=self.stack_labels[i])
+                    bottom = bottom + stacks[i]
+            else:
+                ax.stackplot(dates, *stacks, labels=self.stack_labels)
+            ax.legend(loc='upper left')
+            # the crosshair follows the top of the stack
+            totals = sum(stacks)
+        elif graph_type == 'bar' and dense:
+            ax.vlines(dates, 0, totals, linewidth=2, label=self.label)
+        elif graph_type == 'bar':
+            bars = ax.bar(dates, totals, width=width, label=self.label)
+            if labeled:
+                ax.bar_label(bars, labels=['${:,.2f}'.format(total) for total in totals], padding=2, size=8,
+                             rotation=90)
+                # leave room above the tallest bar for its label
+                ax.margins(y=0.15)
+        else:
+            ax.plot(dates, totals, linewidth=1.0, marker='o', markersize=2, label=self.label)
+            if labeled:
+                for i in range(len(totals)):
+                    ax.annotate('${:,.2f}'.format(totals[i]), xy=(dates[i], totals[i]), xytext=(5, 2),
+                                textcoords='offset points', size=8)
+
+        ax.tick_params(axis='x', labelrotation=90)
+        if tooltips and len(dates) > 0:
+            self.crosshair = Crosshair(
+                ax, mdates.date2num(dates), totals,
+                lambda index: self.get_tooltip_text(index, totals[index], stacked))
+        return fig
+
+    def get_tooltip_text(self, index, total, stacked=False):
+        """
+        Returns the tooltip text of a period: when it starts, its total, and how many records it has, followed by
+        its bills, coins, checks, and designated offerings if they are stacked
+        :param int index: the period's index in self.rows
+        :param float total: the period's graphed total
+        :param bool stacked: optional: whether the bills, coins, checks, and designated offerings are stacked
+        """
+        row = self.rows[index]
+        text = self.period_names[self.period] + ' of ' + row['period'] + '\n' + '${:,.2f}'.format(total) \
+            + ' from ' + str(row['count']) + (' record' if row['count'] == 1 else ' records')
+        if stacked:
+            for i in range(len(self.stack_columns)):
+                text += '\n' + self.stack_labels[i] + ': ' + '${:,.2f}'.format(row[self.stack_columns[i]])
+        return text
 
-        for i, j in zip(x_vals, y_vals):
-            ax.annotate('$' + '{:,.2f}'.format(j), xy=(i, j), xytext=(5, 2), textcoords='offset points', size=8)
 
-        plot.xticks(rotation=90)
+class YearToDateGraph(LineGraph):
+    """
+    Class to create a line graph of the running total of giving through the current year, drawn over the running
+    total of the year before so the two can be compared at the same point in the year
+    """
+    def __init__(self, pairs, today):
+        """
+        :param list pairs: (date, amount) pairs from the first day of the prior year through today, as returned by
+            database.GivingDatabase.get_deposits
+        :param str today: the last day of the current year to include, as YYYY-MM-DD
+        """
+        super().__init__()
+        self.pairs = pairs
+        self.today = np.datetime64(today, 'D')
+
+    def build_figure(self):
+        """
+        Creates the graph's figure. Both years are drawn on the current year's dates.
+        """
+        dates, amounts = self.prepare_data()[:2]
+        year_start = self.today.astype('datetime64[Y]').astype('datetime64[D]')
+        prior_year_start = (self.today.astype('datetime64[Y]') - 1).astype('datetime64[D]')
+
+        current = (dates >= year_start) & (dates <= self.today)
+        prior = (dates >= prior_year_start) & (dates < year_start)
+        current_dates = dates[current]
+        current_totals = np.cumsum(amounts[current])
+        # shifting by days since January 1 rather than by a year keeps leap days from piling up on March 1
+        prior_dates = dates[prior] - prior_year_start + year_start
+        prior_totals = np.cumsum(amounts[prior])
+
+        # compare against the prior year up to the same day of the year
+        same_point = prior_dates <= self.today
+        prior_to_date = prior_totals[same_point][-1] if same_point.any() else 0.0
+        current_to_date = current_totals[-1] if len(current_totals) > 0 else 0.0
+
+        fig = Figure(layout='tight')
+        ax = fig.subplots()
+        ax.tick_params(labelsize=8)
+
+        # with two dollar signs in the title, matplotlib would take the text between them as math
+        ax.set_title('Year to Date through ' + str(self.today) + ' | \\$' + '{:,.2f}'.format(current_to_date)
+                     + ' vs. \\$' + '{:,.2f}'.format(prior_to_date) + ' Last Year', size=12, weight='bold')
+        ax.set_xlabel('Date', size=12, style='italic')
+        ax.set_ylabel('Running Total', size=12, style='italic')
 
-        figManager = plot.get_current_fig_manager()
-        figManager.window.showMaximized()
-        plot.show()
+        year = str(self.today.astype('datetime64[Y]'))
+        ax.step(prior_dates, prior_totals, where='post', linewidth=1.0, linestyle='--', color='gray',
+                label=str(int(year) - 1))
+        ax.step(current_dates, current_totals, where='post', linewidth=2.0, label=year)
+        ax.legend(loc='upper left')
+        ax.tick_params(axis='x', labelrotation=90)
+        return fig
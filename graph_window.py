@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+from matplotlib.backend_bases import FigureCanvasBase
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg, NavigationToolbar2QT
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QDialog, QVBoxLayout
+
+
+class GraphWindow(QDialog):
+    """
+    Class implementing QDialog to show a graph's figure inside the program, with matplotlib's toolbar for zooming,
+    panning, and saving. The figure's tight layout is worked out on the first draw and then kept until the window is
+    resized, since it otherwise takes nearly half of every redraw while panning or zooming.
+    """
+    def __init__(self, figure, title, parent=None):
+        """
+        :param matplotlib.figure.Figure figure: the figure to show
+        :param str title: the window title
+        :param QWidget parent: optional: the parent widget
+        """
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.setWindowFlag(Qt.WindowType.WindowMaximizeButtonHint)
+
+        layout = QVBoxLayout(self)
+        self.canvas = FigureCanvasQTAgg(figure)
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+        layout.addWidget(self.toolbar)
+        layout.addWidget(self.canvas)
+
+        self.layout_engine = figure.get_layout_engine()
+        self.callback_ids = [
+            self.canvas.mpl_connect('draw_event', self.freeze_layout),
+            self.canvas.mpl_connect('resize_event', self.thaw_layout)
+        ]
+
+    def freeze_layout(self, event):
+        if self.layout_engine and self.canvas.figure.get_layout_engine() is self.layout_engine:
+            self.canvas.figure.set_layout_engine('none')
+
+    def thaw_layout(self, event):
+        if self.layout_engine:
+            self.canvas.figure.set_layout_engine(self.layout_engine)
+
+    def closeEvent(self, evt):
+        # the figure may be kept in a FigureCache after this window is gone, and its event callbacks go with it, so
+        # remove this window's callbacks, give the figure a canvas of its own rather than leaving it attached to one
+        # that is about to be deleted, and let the next window lay it out again. The toolbar's callbacks are held
+        # weakly and go away with the toolbar.
+        figure = self.canvas.figure
+        for callback_id in self.callback_ids:
+            self.canvas.mpl_disconnect(callback_id)
+        self.thaw_layout(None)
+        FigureCanvasBase(figure)
+        super().closeEvent(evt)
+
+
+class FigureCache:
+    """
+    Class to keep the most recently built graph figures so that showing the same graph again doesn't rebuild it.
+    Figures are keyed by the graph's parameters along with a stamp of the database file, so any change to the records
+    makes the cached figures unreachable.
+    """
+    def __init__(self, max_figures=4):
+        """
+        :param int max_figures: optional: the number of figures to keep
+        """
+        self.max_figures = max_figures
+        self.figures = OrderedDict()
+
+    def get(self, key):
+        """
+        Returns the cached figure for a key, or None if it isn't cached
+        :param tuple key: the graph's parameters and the database stamp
+        """
+        if key not in self.figures:
+            return None
+        self.figures.move_to_end(key)
+        return self.figures[key]
+
+    def put(self, key, figure):
+        """
+        Adds a figure to the cache, dropping the least recently used figure if the cache is full
+        :param tuple key: the graph's parameters and the database stamp
+        :param matplotlib.figure.Figure figure: the figure
+        """
+        self.figures[key] = figure
+        self.figures.move_to_end(key)
+        while len(self.figures) > self.max_figures:
+            self.figures.popitem(last=False)
+
+    def clear(self):
+        self.figures.clear()
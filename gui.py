@@ -1,15 +1,17 @@
-import io
 import json
 import logging
 
 from PyQt6.QtPdf import QPdfDocument
 from dateutil.parser import parse, ParserError
-from PyQt6.QtCore import QRegularExpression, Qt, pyqtSignal, QSize, QByteArray, QBuffer
+from PyQt6.QtCore import Qt, pyqtSignal, QSize, QByteArray, QBuffer
 from PyQt6.QtGui import QIcon, QFont, QPixmap, QFontDatabase
 from PyQt6.QtWidgets import QMainWindow, QWidget, QGridLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QLineEdit, \
     QTextEdit, QVBoxLayout, QScrollArea, QMessageBox, QTextBrowser, QApplication
 
-from print_dialog import PrintDialog
+from database import decode_notes
+from metrics import metrics, timed
+from print_dialog import PrintDialog, render_lock
+from profiling import profiled, profiler
 
 
 class GUI(QMainWindow):
@@ -23,6 +25,9 @@ class GUI(QMainWindow):
     bold_font = None
     title_font = None
     pdf_data = None
+    fields = None
+    total_labels = None
+    loaded_values = None
 
     light_green = '#eaffe8'
     dark_green = '#00641e'
@@ -37,6 +42,17 @@ class GUI(QMainWindow):
         self.name = name
         self.num_checks = num_checks
 
+        # registry of the record's input widgets, kept in database column order so that binding, saving, and
+        # recalculating never have to walk the widget tree
+        self.fields = {}
+        self.total_labels = {}
+        self.bill_fields = []
+        self.coin_fields = []
+        self.special_fields = []
+        self.special_labels = []
+        self.check_fields = []
+        self.checks_scroll_area = None
+
         super().__init__()
         self.load_fonts_signal.connect(self.load_fonts)
         self.create_gui.connect(self.init_components)
@@ -57,7 +73,17 @@ class GUI(QMainWindow):
         Checks changes and prompts for user input before closing
         """
         event.ignore()
-        if self.changes:
+        if self.main.print_spooler.is_busy():
+            result = QMessageBox.question(
+                self,
+                'Printing',
+                'Documents are still being printed. Closing now will cancel them. Close anyway?',
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+
+            if result != QMessageBox.StandardButton.Yes:
+                return
+
+        if self.get_dirty_columns():
             result = QMessageBox.question(
                 self,
                 'Changes Detected',
@@ -65,7 +91,8 @@ class GUI(QMainWindow):
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel)
 
             if result == QMessageBox.StandardButton.Yes:
-                self.main.save_rec()
+                if not self.main.save_rec():
+                    return
                 self.main.do_backup()
                 event.accept()
             elif result == QMessageBox.StandardButton.No:
@@ -77,6 +104,10 @@ class GUI(QMainWindow):
             self.main.do_backup()
             event.accept()
 
+        if event.isAccepted():
+            self.main.database_watcher.close()
+            self.main.maintenance_scheduler.run_on_close()
+
     def init_components(self):
         """
         Creates the gui components and lays them out
@@ -138,6 +169,33 @@ class GUI(QMainWindow):
         self.build_special_frame()
         self.build_notes_frame()
         self.build_totals_frame()
+        self.register_fields()
+
+    def register_fields(self):
+        """
+        Method to (re)build the field registry, mapping each database column to the widget that displays it. The
+        registry is ordered the same way as the weekly_giving table.
+        """
+        self.fields = {
+            'date': self.date_line_edit,
+            'prepared_by': self.prep_line_edit
+        }
+
+        bill_columns = ['bills_100', 'bills_50', 'bills_20', 'bills_10', 'bills_5', 'bills_1']
+        for column, widget in zip(bill_columns, self.bill_fields):
+            self.fields[column] = widget
+
+        coin_columns = ['coins_100', 'coins_25', 'coins_10', 'coins_5', 'coins_1']
+        for column, widget in zip(coin_columns, self.coin_fields):
+            self.fields[column] = widget
+
+        for i in range(len(self.special_fields)):
+            self.fields['spec' + str(i + 1)] = self.special_fields[i]
+
+        for i in range(len(self.check_fields)):
+            self.fields['checks_' + str(i)] = self.check_fields[i]
+
+        self.fields['notes'] = self.notes_edit
 
     def build_menu_bar(self):
         """
@@ -152,6 +210,9 @@ class GUI(QMainWindow):
         print_action = file_menu.addAction('Print')
         print_action.triggered.connect(self.print_pdf)
 
+        print_queue_action = file_menu.addAction('Print Queue')
+        print_queue_action.triggered.connect(self.main.show_print_queue)
+
         file_menu.addSeparator()
 
         exit_action = file_menu.addAction('Exit')
@@ -165,6 +226,12 @@ class GUI(QMainWindow):
         delete_action = tools_menu.addAction('Delete Record')
         delete_action.triggered.connect(self.main.del_rec)
 
+        batch_print_action = tools_menu.addAction('Batch Print Reports')
+        batch_print_action.triggered.connect(self.main.batch_print)
+
+        export_graphs_action = tools_menu.addAction('Export Graphs')
+        export_graphs_action.triggered.connect(self.main.export_graphs)
+
         log_action = tools_menu.addAction('View Log File')
         log_action.triggered.connect(self.main.view_log)
 
@@ -184,6 +251,11 @@ class GUI(QMainWindow):
             include_action.setChecked(False)
         include_action.triggered.connect(self.include_special)
 
+        autosave_action = config_menu.addAction('Autosave Unsaved Changes for Recovery')
+        autosave_action.setCheckable(True)
+        autosave_action.setChecked(self.main.autosave_enabled)
+        autosave_action.triggered.connect(lambda: self.main.set_autosave(autosave_action))
+
         num_checks_action = config_menu.addAction('Change Maximum Number of Checks')
         num_checks_action.triggered.connect(self.main.change_num_checks)
 
@@ -198,6 +270,16 @@ class GUI(QMainWindow):
         about_action = help_menu.addAction('About')
         about_action.triggered.connect(self.show_about)
 
+        help_menu.addSeparator()
+
+        profile_action = help_menu.addAction('Profile Performance')
+        profile_action.setCheckable(True)
+        profile_action.setChecked(profiler.enabled)
+        profile_action.triggered.connect(lambda: self.main.set_profiling(profile_action))
+
+        diagnostics_action = help_menu.addAction('Diagnostics')
+        diagnostics_action.triggered.connect(self.main.show_diagnostics)
+
     def build_top_frame(self):
         """
         Method to create the gui's top (button) widget
@@ -424,6 +506,15 @@ class GUI(QMainWindow):
         self.bills_1_line_edit.textEdited.connect(self.on_change)
         bills_layout.addWidget(self.bills_1_line_edit, 6, 1)
 
+        self.bill_fields = [
+            self.bills_100_line_edit,
+            self.bills_50_line_edit,
+            self.bills_20_line_edit,
+            self.bills_10_line_edit,
+            self.bills_5_line_edit,
+            self.bills_1_line_edit
+        ]
+
         self.main_layout.addWidget(self.bills_widget, 3, 0)
 
     def build_coins_frame(self):
@@ -487,6 +578,14 @@ class GUI(QMainWindow):
         self.penny_line_edit.textEdited.connect(self.on_change)
         coins_layout.addWidget(self.penny_line_edit, 5, 1)
 
+        self.coin_fields = [
+            self.dollar_line_edit,
+            self.quarter_line_edit,
+            self.dime_line_edit,
+            self.nickel_line_edit,
+            self.penny_line_edit
+        ]
+
         self.main_layout.addWidget(self.coins_widget, 4, 0)
 
     def build_special_frame(self):
@@ -505,6 +604,8 @@ class GUI(QMainWindow):
         special_label.setMinimumHeight(30)
         special_layout.addWidget(special_label)
 
+        self.special_fields = []
+        self.special_labels = []
         for i in range(0, len(self.main.spec_designations)):
             special_line_widget = QWidget()
             special_line_layout = QHBoxLayout()
@@ -526,6 +627,7 @@ class GUI(QMainWindow):
             label.setFont(self.standard_font)
             special_line_layout.addWidget(label)
             special_line_layout.addStretch()
+            self.special_labels.append(label)
 
             line_edit = CustomCurrencyLineEdit()
             line_edit.setFont(self.standard_font)
@@ -533,6 +635,7 @@ class GUI(QMainWindow):
             line_edit.setText('0.00')
             line_edit.textEdited.connect(self.on_change)
             special_line_layout.addWidget(line_edit)
+            self.special_fields.append(line_edit)
 
             special_layout.addWidget(special_line_widget)
 
@@ -540,8 +643,13 @@ class GUI(QMainWindow):
 
     def build_checks_frame(self):
         """
-        Method to create the gui's checks fields
+        Method to create the gui's checks fields. When called again after the maximum number of checks has changed,
+        the previous checks area is removed and the field registry is rebuilt.
         """
+        if self.checks_scroll_area:
+            self.main_layout.removeWidget(self.checks_scroll_area)
+            self.checks_scroll_area.deleteLater()
+
         self.checks_widget = QWidget()
         self.checks_widget.setStyleSheet('background-color: ' + self.light_green)
 
@@ -554,6 +662,7 @@ class GUI(QMainWindow):
         checks_label.setMinimumHeight(30)
         checks_layout.addWidget(checks_label, 0, 0)
 
+        self.check_fields = []
         for i in range(0, self.main.max_checks):
             label = QLabel('Check ' + str(i + 1))
             label.setFont(self.standard_font)
@@ -563,12 +672,17 @@ class GUI(QMainWindow):
             line_edit.setFont(self.standard_font)
             line_edit.textEdited.connect(self.on_change)
             checks_layout.addWidget(line_edit, i + 1, 1)
+            self.check_fields.append(line_edit)
+
+        self.checks_scroll_area = QScrollArea()
+        self.checks_scroll_area.setStyleSheet('background-color: ' + self.light_green)
+        self.checks_scroll_area.setWidget(self.checks_widget)
 
-        scroll_container = QScrollArea()
-        scroll_container.setStyleSheet('background-color: ' + self.light_green)
-        scroll_container.setWidget(self.checks_widget)
+        self.main_layout.addWidget(self.checks_scroll_area, 3, 1, 3, 1)
 
-        self.main_layout.addWidget(scroll_container, 3, 1, 3, 1)
+        # the registry is first built at the end of init_components; only rebuild it here on later calls
+        if self.fields:
+            self.register_fields()
 
     def build_notes_frame(self):
         """
@@ -673,6 +787,15 @@ class GUI(QMainWindow):
         self.total_total_label.setAlignment(Qt.AlignmentFlag.AlignRight)
         totals_layout.addWidget(self.total_total_label, 8, 1)
 
+        self.total_labels = {
+            'quantity_of_checks': self.num_checks_total_label,
+            'coins_total': self.coins_total_label,
+            'bills_total': self.bills_total_label,
+            'checks_total': self.checks_total_label,
+            'total_designated_offerings': self.designated_total_label,
+            'total_deposit': self.total_total_label
+        }
+
         self.main_layout.addWidget(totals_widget, 4, 3)
 
     def change_name(self):
@@ -689,7 +812,7 @@ class GUI(QMainWindow):
             checkmark_icon = './resources/checkmark_black.svg'
 
             biggest_width = 0
-            for label in self.special_widget.findChildren(QLabel, QRegularExpression('special_label*')):
+            for label in self.special_labels:
                 if label.width() > biggest_width:
                     biggest_width = label.width()
 
@@ -783,30 +906,25 @@ class GUI(QMainWindow):
         :param bool change_state: optional: send False if changes to data have not been made
         """
         all_values = []
-        for line_edit in self.bills_widget.findChildren(QLineEdit):
-            all_values.append(line_edit.text())
-        for line_edit in self.coins_widget.findChildren(QLineEdit):
-            all_values.append(line_edit.text())
-        for line_edit in self.special_widget.findChildren(QLineEdit):
-            all_values.append(line_edit.text())
-        for line_edit in self.checks_widget.findChildren(QLineEdit):
+        for line_edit in self.bill_fields + self.coin_fields + self.special_fields + self.check_fields:
             all_values.append(line_edit.text())
 
         if change_state:
-            self.changes = True
-            self.save_button.setEnabled(True)
+            self.changes = len(self.get_dirty_columns()) > 0
+            self.save_button.setEnabled(self.changes)
+            self.main.autosave.schedule()
+            self.main.maintenance_scheduler.note_activity()
 
         from main import Recalc
         recalc = Recalc(all_values, self)
         self.main.thread_pool.start(recalc)
 
+    @profiled
     def fill_values(self, result_dictionary):
         """
         Method to take data stored in a dictionary and use it to populate the appropriate line edits in the gui
         :param dict result_dictionary: All data from the record to be displayed
         """
-        self.clear_all_values()
-
         try:
             self.id_combo_box.blockSignals(True)
             self.date_combo_box.blockSignals(True)
@@ -815,59 +933,158 @@ class GUI(QMainWindow):
             self.id_combo_box.blockSignals(False)
             self.date_combo_box.blockSignals(False)
 
-            self.date_line_edit.setText(result_dictionary['date'])
-            self.prep_line_edit.setText(result_dictionary['prepared_by'])
             self.id_num_label.setText(str(result_dictionary['id']))
 
-            self.bills_100_line_edit.setText(result_dictionary['bills_100'])
-            self.bills_50_line_edit.setText(result_dictionary['bills_50'])
-            self.bills_20_line_edit.setText(result_dictionary['bills_20'])
-            self.bills_10_line_edit.setText(result_dictionary['bills_10'])
-            self.bills_5_line_edit.setText(result_dictionary['bills_5'])
-            self.bills_1_line_edit.setText(result_dictionary['bills_1'])
-
-            self.dollar_line_edit.setText(result_dictionary['coins_100'])
-            self.quarter_line_edit.setText(result_dictionary['coins_25'])
-            self.dime_line_edit.setText(result_dictionary['coins_10'])
-            self.nickel_line_edit.setText(result_dictionary['coins_5'])
-            self.penny_line_edit.setText(result_dictionary['coins_1'])
-
-            #clear checks and special offering boxes
-            for widget in self.findChildren(QLineEdit, QRegularExpression('special_edit*')):
-                widget.setText('')
-            for i in range(0, self.main.max_checks):
-                self.findChild(QLineEdit, 'checks_' + str(i)).setText('')
-
-            specials = []
-            for key in result_dictionary:
-                if 'spec' in key:
-                    specials.append(result_dictionary[key])
-
-            index = 0
-            for widget in self.findChildren(QLineEdit, QRegularExpression('special_edit*')):
-                if len(specials[index]) > 0:
-                    value = float(specials[index].replace(',', ''))
-                    if value > 0:
-                        widget.setText(str('{:,.2f}'.format(value)))
-                        index += 1
-
-            for key in result_dictionary:
-                if 'check' in key and not 'quantity' in key and not 'tot' in key and len(result_dictionary[key]) > 0:
-                    value = float(result_dictionary[key].replace(',', ''))
-                    if value > 0:
-                        self.findChild(QLineEdit, key).setText(str('{:,.2f}'.format(value)))
-
-            notes = result_dictionary['notes']
-            notes = notes.replace('<apost>', '\'')
-            notes = notes.replace('<quot>', '\"')
-            self.notes_edit.setPlainText(notes)
+            # every registered field gets a value, blank if the record doesn't have one, so there is no need to
+            # clear the form first
+            display_values = {}
+            for column in self.fields:
+                if column not in result_dictionary or result_dictionary[column] is None:
+                    display_values[column] = ''
+                elif column == 'notes':
+                    display_values[column] = decode_notes(result_dictionary['notes'])
+                else:
+                    display_values[column] = self.format_field_value(column, result_dictionary[column])
+
+            self.bulk_bind(display_values)
 
             self.num_checks_total_label.setText(str(result_dictionary['quantity_of_checks']))
 
+            # snapshot what was loaded so that changes can be detected by value rather than by keystroke
+            self.loaded_values = {}
+            for column in display_values:
+                self.loaded_values[column] = self.normalize_field_value(column, display_values[column])
+            for column in self.total_labels:
+                if column in result_dictionary and result_dictionary[column] is not None:
+                    self.loaded_values[column] = str(result_dictionary[column])
+                else:
+                    self.loaded_values[column] = ''
+
+            # any unsaved changes to the previous record have now been saved or discarded
+            self.main.autosave.clear_journal()
             self.changes = False
         except Exception:
             logging.exception('')
 
+    def bulk_bind(self, display_values):
+        """
+        Method to set many fields at once. Repaints and the fields' signals are suspended while the values are set,
+        only fields whose text actually differs are touched, and the totals are recalculated once at the end.
+        :param dict display_values: text to show, keyed by database column
+        """
+        self.setUpdatesEnabled(False)
+        for widget in self.fields.values():
+            widget.blockSignals(True)
+
+        try:
+            for column, text in display_values.items():
+                if column not in self.fields:
+                    continue
+
+                widget = self.fields[column]
+                if widget is self.notes_edit:
+                    if widget.toPlainText() != text:
+                        widget.setPlainText(text)
+                elif widget.text() != text:
+                    widget.setText(text)
+        finally:
+            for widget in self.fields.values():
+                widget.blockSignals(False)
+            self.setUpdatesEnabled(True)
+
+        self.on_change(False)
+
+    def format_field_value(self, column, value):
+        """
+        Method to convert a value stored in the database into the text shown in its field. Special designation and
+        check amounts are shown as currency, or left blank if they are zero.
+        :param str column: the database column the value came from
+        :param str value: the stored value
+        """
+        value = str(value)
+        if column.startswith('spec') or column.startswith('checks_'):
+            if len(value) == 0:
+                return ''
+            try:
+                amount = float(value.replace(',', ''))
+            except ValueError:
+                return value
+            if amount > 0:
+                return str('{:,.2f}'.format(amount))
+            return ''
+        return value
+
+    def normalize_field_value(self, column, text):
+        """
+        Method to reduce a field's text to a comparable form, so that reformatting such as '5' becoming '5.00' is not
+        seen as a change
+        :param str column: the database column of the field
+        :param str text: the field's text
+        """
+        if column == 'notes':
+            return text
+        if column.startswith('spec') or column.startswith('checks_'):
+            return self.format_field_value(column, text.strip())
+        return text.strip()
+
+    def get_dirty_columns(self, include_totals=False):
+        """
+        Method to compare the current field values against those loaded from the database. Returns the columns that
+        differ, in table order. Returns an empty list if no record has been loaded.
+        :param bool include_totals: optional: also compare the totals labels
+        """
+        if self.loaded_values is None:
+            return []
+
+        dirty = []
+        for column, widget in self.fields.items():
+            if widget is self.notes_edit:
+                text = widget.toPlainText()
+            else:
+                text = widget.text()
+
+            if self.normalize_field_value(column, text) != self.loaded_values.get(column, ''):
+                dirty.append(column)
+
+        if include_totals:
+            for column, label in self.total_labels.items():
+                if label.text() != self.loaded_values.get(column, ''):
+                    dirty.append(column)
+
+        return dirty
+
+    def mark_clean(self):
+        """
+        Method to take a new snapshot of the current values after they have been saved
+        """
+        values = self.get_record_values()
+        self.loaded_values = {}
+        for column in values:
+            if column in self.fields:
+                self.loaded_values[column] = self.normalize_field_value(column, values[column])
+            else:
+                self.loaded_values[column] = values[column]
+
+        self.changes = False
+        self.save_button.setEnabled(False)
+        self.main.autosave.clear_journal()
+
+    def get_record_values(self):
+        """
+        Method to gather the current contents of every registered field and total label, keyed by database column
+        """
+        values = {}
+        for column, widget in self.fields.items():
+            if widget is self.notes_edit:
+                values[column] = widget.toPlainText()
+            else:
+                values[column] = widget.text()
+
+        for column, label in self.total_labels.items():
+            values[column] = label.text()
+
+        return values
+
     def set_totals(self, totals):
         """
         Method to change the totals labels to the amounts calculated in weekly_giving.Recalc
@@ -887,248 +1104,80 @@ class GUI(QMainWindow):
         QApplication.processEvents()
 
     def clear_all_values(self):
-        for widget in self.findChildren(QLineEdit):
-            widget.setText('')
-        self.notes_edit.setText('')
+        """
+        Method to empty every registered field
+        """
+        for widget in self.fields.values():
+            widget.clear()
 
     def rewrite_designations(self, designations):
         """
         Method to iterate the user's changed special designation labels and change them in the gui
         """
-        index = 0
-        for widget in self.findChildren(QLabel, QRegularExpression('special_label*')):
-            widget.setText(designations[index])
-            QApplication.processEvents()
-            index += 1
+        for widget, designation in zip(self.special_labels, designations):
+            widget.setText(designation)
+        QApplication.processEvents()
 
+    @timed('pdf_build_seconds')
+    @profiled
     def make_pdf(self):
         """
-        Method to format and print the record data currently being displayed. Uses reportlab to create a PDF, which
-        will then be printed.
+        Method to format and print the record data currently being displayed. Uses report.ReportBuilder to create a
+        PDF, which will then be printed. Reports are cached by content, and the current document is reused if the
+        record hasn't changed since it was made.
         """
+        from report import ReportBuilder
+
+        values = self.get_record_values()
+        values['id'] = self.id_num_label.text()
+        key = self.main.report_cache.get_key(
+            values, self.main.name, self.main.spec_designations, ReportBuilder.template_version)
+
+        if self.pdf_data and self.pdf_data['key'] == key:
+            metrics.increment('pdf_builds', {'source': 'current'})
+            return
+
+        pdf_bytes = self.main.report_cache.get(key)
+        if pdf_bytes is None:
+            metrics.increment('pdf_builds', {'source': 'new'})
+            pdf_bytes = ReportBuilder(self.main.name, self.main.spec_designations).build([values])
+            self.main.report_cache.put(key, pdf_bytes)
+        else:
+            metrics.increment('pdf_builds', {'source': 'cache'})
 
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfbase.ttfonts import TTFont
-        from reportlab.pdfbase import pdfmetrics
-
-        # letter size = 612.0 x 792.0
-        # create variables based on letter-sized canvas
-        marginH = 100
-        marginV = 80
-        firstLine = 792 - marginV
-        lastLine = marginV
-        lineStart = marginH
-        lineEnd = 612 - marginH
-        lineHeight = 16
-
-        try:
-            pdfmetrics.registerFont(TTFont('NimbusSans', 'resources/fonts/NimbusSanL-Reg.ttf'))
-            pdfmetrics.registerFont(TTFont('NimbusSansBold', 'resources/fonts/NimbusSanL-Bol.ttf'))
-            pdfmetrics.registerFont(TTFont('NimbusSansBoldItalic', 'resources/fonts/NimbusSanL-BolIta.ttf'))
-        except Exception as ex:
-            print(str(ex))
-
-        currentLine = firstLine
-
-        pdf_buffer = io.BytesIO()
-        canvas = canvas.Canvas(pdf_buffer, pagesize=letter)
-        canvas.setLineWidth(1.0)
-        canvas.setFont('NimbusSansBold', 16)
-        canvas.drawString(lineStart, currentLine, self.main.name + ' Weekly Giving Report')
-        currentLine -= 5
-        canvas.line(lineStart, currentLine, lineEnd, currentLine)
-
-        currentLine -= lineHeight
-        canvas.setFont('NimbusSansBold', 11)
-        canvas.drawString(lineStart, currentLine, 'Date:')
-        canvas.setFont('NimbusSans', 11)
-        canvas.drawString(lineStart + 35, currentLine, self.date_line_edit.text())
-        canvas.setFont('NimbusSansBold', 11)
-        canvas.drawString(lineStart + 120, currentLine, 'Prepared By:')
-        canvas.setFont('NimbusSans', 11)
-        canvas.drawString(lineStart + 195, currentLine, self.prep_line_edit.text())
-        canvas.drawRightString(lineEnd, currentLine, 'ID: ' + self.id_num_label.text())
-
-        currentLine -= lineHeight
-        canvas.setFont('NimbusSansBold', 11)
-        canvas.drawString(lineStart, currentLine, 'Signature:')
-        currentLine -= lineHeight
-        canvas.rect(lineStart, currentLine - 20, 300, 30)
-
-        topLineofEntries = currentLine - 50
-        currentLine = topLineofEntries
-        rememberCurrentLine = currentLine
-        canvas.drawString(lineStart, currentLine, '$100 Bills')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, '$50 Bills')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, '$20 Bills')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, '$10 Bills')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, '$5 Bills')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, '$1 Bills')
-
-        billsArray = [
-            self.bills_100_line_edit.text(),
-            self.bills_50_line_edit.text(),
-            self.bills_20_line_edit.text(),
-            self.bills_10_line_edit.text(),
-            self.bills_5_line_edit.text(),
-            self.bills_1_line_edit.text()
-        ]
-
-        column1 = 180
-        canvas.setFont('NimbusSans', 11)
-        currentLine = rememberCurrentLine
-        for num in billsArray:
-            canvas.drawRightString(column1, currentLine, num)
-            currentLine -= lineHeight
-
-        currentLine -= lineHeight
-        rememberCurrentLine = currentLine
-
-        canvas.setFont('NimbusSansBold', 11)
-        canvas.drawString(lineStart, currentLine, '$1 Coins')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, 'Quarters')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, 'Dimes')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, 'Nickels')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart, currentLine, 'Pennies')
-        currentLine -= lineHeight
-
-        coinsArray = [
-            self.dollar_line_edit.text(),
-            self.quarter_line_edit.text(),
-            self.dime_line_edit.text(),
-            self.nickel_line_edit.text(),
-            self.penny_line_edit.text()
-        ]
-
-        canvas.setFont('NimbusSans', 11)
-        currentLine = rememberCurrentLine
-        for num in coinsArray:
-            canvas.drawRightString(column1, currentLine, num)
-            currentLine -= lineHeight
-
-        column2 = 210
-        canvas.setFont('NimbusSansBold', 11)
-        currentLine = topLineofEntries
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec1'])
-        currentLine -= lineHeight
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec2'])
-        currentLine -= lineHeight
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec3'])
-        currentLine -= lineHeight
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec4'])
-        currentLine -= lineHeight
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec5'])
-        currentLine -= lineHeight
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec6'])
-        currentLine -= lineHeight
-        canvas.drawString(column2, currentLine, self.main.spec_designations['spec7'])
-        currentLine -= lineHeight
-
-        specialArray = []
-        for widget in self.findChildren(QLineEdit, QRegularExpression('special_edit*')):
-            specialArray.append(widget.text())
-        column3 = 400
-        canvas.setFont('NimbusSans', 11)
-        currentLine = topLineofEntries
-        for num in specialArray:
-            if len(num) > 0:
-                value = float(num.replace(',', ''))
-                if value > 0:
-                    canvas.drawRightString(column3, currentLine, '${:,.2f}'.format(value))
-                    currentLine -= lineHeight
-
-        column4 = 440
-        canvas.setFont('NimbusSansBold', 11)
-        currentLine = topLineofEntries + lineHeight
-        canvas.drawString(column4, currentLine, 'Checks:')
-        currentLine = topLineofEntries
-        for i in range(1, 31):
-            canvas.drawString(column4, currentLine, str(i))
-            currentLine -= lineHeight
-
-        checksArray = []
-        for widget in self.findChildren(QLineEdit, QRegularExpression('check*')):
-            checksArray.append(widget.text())
-
-        column5 = lineEnd  # prev 500
-        canvas.setFont('NimbusSans', 11)
-        currentLine = topLineofEntries
-        for num in checksArray:
-            if len(num) > 0:
-                value = float(num.replace(',', ''))
-                if value > 0:
-                    canvas.drawRightString(column5, currentLine, '${:,.2f}'.format(value))
-                    currentLine -= lineHeight
-
-        currentLine = 300
-        canvas.setFont('NimbusSansBold', 12)
-        canvas.drawString(lineStart + 20, currentLine, 'Total Designated Offerings:')
-        currentLine -= lineHeight * 2
-        canvas.drawString(lineStart + 20, currentLine, 'Total Bills:')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart + 20, currentLine, 'Total Coins:')
-        currentLine -= lineHeight
-        canvas.drawString(lineStart + 20, currentLine, 'Total Checks:')
-        currentLine -= lineHeight * 2
-        canvas.setFont('NimbusSansBoldItalic', 14)
-        canvas.drawString(lineStart + 20, currentLine, 'Total Deposit:')
-        currentLine -= lineHeight * 2
-        canvas.setFont('NimbusSansBold', 12)
-        canvas.drawString(lineStart + 20, currentLine, 'Number of Checks:')
-
-        currentLine = 300
-        column2 = 370
-        canvas.setFont('NimbusSans', 12)
-        canvas.drawRightString(column2, currentLine, self.designated_total_label.text())
-        currentLine -= lineHeight * 2
-        canvas.drawRightString(column2, currentLine, self.bills_total_label.text())
-        currentLine -= lineHeight
-        canvas.drawRightString(column2, currentLine, self.coins_total_label.text())
-        currentLine -= lineHeight
-        canvas.drawRightString(column2, currentLine, self.checks_total_label.text())
-        currentLine -= lineHeight * 2
-        canvas.setFont('NimbusSansBoldItalic', 14)
-        canvas.drawRightString(column2, currentLine, self.total_total_label.text())
-        currentLine -= lineHeight * 2
-        canvas.setFont('NimbusSans', 12)
-        canvas.drawRightString(column2, currentLine, self.num_checks_total_label.text())
-
-        currentLine += lineHeight * 2
-        canvas.setLineWidth(2.0)
-        canvas.rect(lineStart, currentLine - 20, 390 - lineStart, 150)
-
-        currentLine -= lineHeight * 5
-        canvas.drawString(lineStart, currentLine, 'Notes:')
-        currentLine -= lineHeight * 1.5
-        canvas.drawString(lineStart + 20, currentLine, self.notes_edit.toPlainText().strip())
-        currentLine += lineHeight * 1.5
-        canvas.setLineWidth(1.0)
-        canvas.rect(lineStart, currentLine - 60, lineEnd - lineStart, 55)
-
-        canvas.save()
-        self.pdf_data = {'byte_array': None, 'buffer': None, 'pdf_document': None}
-        self.pdf_data['byte_array'] = QByteArray(pdf_buffer.getvalue())
-        pdf_buffer.close()
-
+        self.release_pdf()
+        self.pdf_data = {'key': key, 'byte_array': None, 'buffer': None, 'pdf_document': None}
+        self.pdf_data['byte_array'] = QByteArray(pdf_bytes)
         self.pdf_data['buffer'] = QBuffer(self.pdf_data['byte_array'])
         self.pdf_data['buffer'].setData(self.pdf_data['byte_array'])
         self.pdf_data['buffer'].open(QBuffer.OpenModeFlag.ReadOnly)
         self.pdf_data['pdf_document'] = QPdfDocument(self)
         self.pdf_data['pdf_document'].load(self.pdf_data['buffer'])
 
+    def release_pdf(self):
+        """
+        Method to close and free the document made by make_pdf so that documents don't accumulate
+        """
+        if not self.pdf_data:
+            return
+
+        # wait for any preview page still being rendered from this document
+        with render_lock:
+            self.pdf_data['pdf_document'].close()
+        self.pdf_data['pdf_document'].deleteLater()
+        self.pdf_data['buffer'].close()
+        self.pdf_data = None
+
+    @profiled
     def print_pdf(self):
         self.make_pdf()
-        pd = PrintDialog(self.pdf_data['pdf_document'], self, landscape=False)
+        pd = PrintDialog(
+            self.pdf_data['pdf_document'],
+            self,
+            bytes(self.pdf_data['byte_array']),
+            landscape=False,
+            title='Weekly Giving Record ' + self.id_num_label.text()
+        )
         pd.exec()
 
     def refresh_combo_boxes(self):
@@ -1150,6 +1199,37 @@ class GUI(QMainWindow):
         self.id_combo_box.blockSignals(False)
         self.date_combo_box.blockSignals(False)
 
+    def update_combo_boxes(self, rows):
+        """
+        Method to bring the id and date comboboxes up to date with records added, removed, or redated elsewhere,
+        changing only the items that differ so that the current selections are kept
+        :param list rows: (id, date) of every record in id order
+        """
+        self.id_combo_box.blockSignals(True)
+        self.date_combo_box.blockSignals(True)
+
+        # both lists are in id order, so they can be compared item by item
+        index = 0
+        for id, date in rows:
+            while index < self.id_combo_box.count() and int(self.id_combo_box.itemText(index)) < id:
+                self.id_combo_box.removeItem(index)
+                self.date_combo_box.removeItem(index)
+
+            if index < self.id_combo_box.count() and int(self.id_combo_box.itemText(index)) == id:
+                if self.date_combo_box.itemText(index) != date:
+                    self.date_combo_box.setItemText(index, date)
+            else:
+                self.id_combo_box.insertItem(index, str(id))
+                self.date_combo_box.insertItem(index, date, (1, id))
+            index += 1
+
+        while self.id_combo_box.count() > index:
+            self.id_combo_box.removeItem(index)
+            self.date_combo_box.removeItem(index)
+
+        self.id_combo_box.blockSignals(False)
+        self.date_combo_box.blockSignals(False)
+
     def show_help(self):
         """
         Method to create and display the help window
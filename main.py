@@ -21,6 +21,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import json
 import logging
+import multiprocessing
 import sqlite3
 import sys
 import time
@@ -29,12 +30,23 @@ from os.path import exists
 import os
 import shutil
 
-from PyQt6.QtCore import QDate, Qt, QRegularExpression, QRunnable, QObject, QThreadPool, pyqtSignal
+from PyQt6.QtCore import Qt, QRunnable, QObject, QThreadPool, pyqtSignal
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import QApplication, QFileDialog, QDialog, QGridLayout, QCalendarWidget, QPushButton, QLabel, \
-    QMessageBox, QButtonGroup, QRadioButton, QWidget, QHBoxLayout, QLineEdit, QTextEdit, QVBoxLayout, QSpinBox
+    QMessageBox, QButtonGroup, QRadioButton, QWidget, QHBoxLayout, QLineEdit, QTextEdit, QVBoxLayout, QSpinBox, \
+    QProgressDialog, QComboBox, QCheckBox
 
+from autosave import Autosave
+from database import GivingDatabase, RecordConflictError, VERSION_COLUMN, calculate_totals, encode_notes, \
+    get_create_table_sql, get_program_data_dir, load_config, parse_flag, retry_when_locked
+from database_watcher import DatabaseWatcher
 from gui import GUI
+from maintenance_scheduler import MaintenanceScheduler
+from metrics import metrics, timed
+from print_spooler import PrintQueueDialog, PrintSpooler
+from printer_registry import PrinterRegistry
+from profiling import PROFILE_ENV, profiled, profiler
+from report_cache import ReportCache
 
 
 class Main(QObject):
@@ -48,12 +60,29 @@ class Main(QObject):
     spec_designations = None
     column_pairs = None
     current_id_index = None
+    loaded_version = None
     thread_pool = None
     file_locations = {}
     config_json = None
+    autosave = None
+    maintenance_scheduler = None
+    database_watcher = None
+    autosave_enabled = False
+    save_metrics_enabled = False
+    direct_print_enabled = False
+    database = None
+    report_cache = None
+    printer_registry = None
+    print_spooler = None
+    print_queue_dialog = None
+    figure_cache = None
+    graph_windows = {}
+    graph_popup = None
+    diagnostics_dialog = None
 
     def __init__(self):
         super().__init__()
+        self.start_time = time.perf_counter()
 
         self.file_locations['program_dir'] = os.path.dirname(__file__)
         os.chdir(self.file_locations['program_dir'])
@@ -68,10 +97,55 @@ class Main(QObject):
         """
         Instantiates gui.GUI and calls its create_gui signal. Loads the last record in the database.
         """
+        stage_start = time.perf_counter()
+        if os.environ.get(PROFILE_ENV, '0') != '0':
+            # the results are written when profiling is turned off from the Help menu or the program closes
+            profiler.start(self.file_locations['program_data_dir'] + '/profiles')
+            self.write_log('Profiling started by ' + PROFILE_ENV)
+
+        self.autosave = Autosave(self)
+        self.report_cache = ReportCache(self.file_locations['program_data_dir'] + '/report_cache')
+        self.printer_registry = PrinterRegistry(self)
+        self.printer_registry.refresh()
+        self.print_spooler = PrintSpooler(self)
+        self.print_spooler.job_failed.connect(self.print_job_failed)
+        self.maintenance_scheduler = MaintenanceScheduler(self)
         self.gui = GUI(self, self.name)
         self.gui.load_fonts_signal.emit()
         self.gui.create_gui.emit()
+        metrics.observe('startup_stage_seconds', time.perf_counter() - stage_start, {'stage': 'gui'})
+        QApplication.instance().aboutToQuit.connect(self.save_metrics)
+
+        # read any recovery journal before loading a record, since loading a record clears it
+        journal = self.autosave.read_journal()
+        stage_start = time.perf_counter()
         self.get_last_rec()
+        metrics.observe('startup_stage_seconds', time.perf_counter() - stage_start, {'stage': 'first record'})
+        metrics.observe('startup_seconds', time.perf_counter() - self.start_time)
+        self.database_watcher = DatabaseWatcher(self)
+        if journal:
+            self.restore_journal(journal)
+
+    def restore_journal(self, journal):
+        """
+        Offers to restore the unsaved changes found in a recovery journal left behind by a previous session
+        :param dict journal: the journal as read by Autosave.read_journal
+        """
+        response = QMessageBox.question(
+            self.gui,
+            'Recover Unsaved Changes',
+            'Unsaved changes to record ' + str(journal['id']) + ' from ' + journal['time'] + ' were found. This can '
+                'happen if the program did not close normally. Would you like to restore them?',
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+
+        if response == QMessageBox.StandardButton.Yes and str(journal['id']) in [str(id) for id in self.ids]:
+            self.write_log('Restoring unsaved changes to record ' + str(journal['id']))
+            self.get_by_id(journal['id'])
+            self.gui.bulk_bind(journal['values'])
+            self.gui.on_change()
+        else:
+            self.autosave.clear_journal()
 
     def get_ids(self):
         """
@@ -79,16 +153,7 @@ class Main(QObject):
         """
         try:
             self.write_log('Retreiving ID list')
-            conn = sqlite3.connect(self.file_locations['database_file'])
-            cur = conn.cursor()
-            ex = cur.execute('SELECT ID FROM ' + self.table_name)
-            result = ex.fetchall()
-            conn.close()
-
-            ids = []
-            for id in result:
-                ids.append(id[0])
-            return ids
+            return self.database.get_ids()
         except Exception:
             logging.exception('')
     
@@ -97,15 +162,7 @@ class Main(QObject):
         Stores all dates from the Database into a list then returns the list
         """
         self.write_log('Retreiving Date List')
-        conn = sqlite3.connect(self.file_locations['database_file'])
-        cur = conn.cursor()
-        result = cur.execute('SELECT Date, ID FROM ' + self.table_name).fetchall()
-        dates = []
-        conn.close()
-
-        for date in result:
-            dates.append(date)
-        return dates
+        return self.database.get_dates()
 
     def get_column_pairs(self, json):
         """
@@ -124,6 +181,8 @@ class Main(QObject):
         except Exception:
             logging.exception('')
     
+    @timed('record_load_seconds')
+    @profiled
     def get_by_id(self, id):
         """
         Finds a given id number in the list of ids and pulls that id's data from the database. Sends that data
@@ -136,20 +195,16 @@ class Main(QObject):
 
         goon = self.check_for_changes()
         if goon:
+            self.maintenance_scheduler.note_activity()
             self.write_log('Retrieving record by ID: ' + str(id))
 
             try:
-                con = sqlite3.connect(self.file_locations['database_file'])
-                cur = con.cursor()
-                sql = 'SELECT * FROM ' + self.table_name + ' WHERE id = ' + str(self.ids[self.current_id_index])
-                ex = cur.execute(sql)
-                column_names = [description[0] for description in ex.description]
-                result = ex.fetchall()[0]
-                con.close()
-
-                result_dictionary = {column_names[i]: result[i] for i in range(len(column_names))}
+                result_dictionary = self.database.get_record(self.ids[self.current_id_index])
+                if result_dictionary is None:
+                    raise IndexError('no record with ID ' + str(self.ids[self.current_id_index]))
 
                 self.gui.fill_values(result_dictionary)
+                self.loaded_version = result_dictionary.get(VERSION_COLUMN)
 
                 if self.current_id_index > 0:
                     self.gui.prev_rec_button.setEnabled(True)
@@ -167,6 +222,7 @@ class Main(QObject):
             except (sqlite3.OperationalError, sqlite3.DatabaseError, sqlite3.NotSupportedError, IndexError) as err:
                 self.write_log('*Critical error from WeeklyGiving.get_by_id: ' + str(err))
 
+    @profiled
     def get_first_rec(self):
         """
         Sets current_id_index to zero and calls get_by_id based on that index of self.ids
@@ -176,6 +232,7 @@ class Main(QObject):
             self.current_id_index = 0
             self.get_by_id(self.ids[self.current_id_index])
             
+    @profiled
     def get_prev_rec(self):
         """
         Sets current_id_index to one less than it is currently then calls get_by_id based on that index of self.ids
@@ -185,6 +242,7 @@ class Main(QObject):
             self.current_id_index -= 1
             self.get_by_id(self.ids[self.current_id_index])
         
+    @profiled
     def get_next_rec(self):
         """
         Sets current_id_index to one more than it is currently then calls get_by_id based on that index of self.ids
@@ -194,6 +252,7 @@ class Main(QObject):
             self.current_id_index += 1
             self.get_by_id(self.ids[self.current_id_index])
         
+    @profiled
     def get_last_rec(self):
         """
         Sets current_id_index to the last index in the range of self.ids
@@ -207,6 +266,7 @@ class Main(QObject):
             else:
                 self.create_new_rec()
         
+    @profiled
     def create_new_rec(self):
         """
         Creates a new ID number based on the highest ID number in self.ids. Applies today's date to that record
@@ -219,27 +279,11 @@ class Main(QObject):
             else:
                 newID = 1
 
-            from datetime import datetime
             date = datetime.today().strftime('%Y-%m-%d')
 
-            values = '"' + str(newID) + '",'
-            for i in range(1, self.max_checks + 28):
-                if i == 1:
-                    values += '"' + date + '",'
-                elif i == 2 or i == 21 + self.max_checks:
-                    values += '"",'
-                else:
-                    values += '"0",'
-
-            values = values[0:len(values) - 1]
-
             try:
-                conn = sqlite3.connect(self.file_locations['database_file'])
-                cur = conn.cursor()
-                sql = 'INSERT INTO ' + self.table_name + ' values (' + values + ')'
-                self.write_log('Insert command from WeeklyGiving.create_new_rec: ' + sql)
-                cur.execute(sql)
-                conn.commit()
+                self.write_log('Inserting new record from WeeklyGiving.create_new_rec: ' + str(newID) + ', ' + date)
+                self.database.insert_blank_record(newID, date)
 
                 self.gui.id_combo_box.addItem(str(newID))
                 self.gui.date_combo_box.addItem(date, (1, newID))
@@ -254,6 +298,7 @@ class Main(QObject):
             except (sqlite3.OperationalError, sqlite3.DatabaseError, sqlite3.NotSupportedError) as err:
                 self.write_log('*Critical error from WeeklyGiving.create_new_rec: ' + str(err))
 
+    @profiled
     def del_rec(self):
         """
         Asks user for confirmation to delete the current record then removes it from the database
@@ -267,11 +312,7 @@ class Main(QObject):
 
         if response == QMessageBox.StandardButton.Yes:
             try:
-                conn = sqlite3.connect(self.file_locations['database_file'])
-                cur = conn.cursor()
-                sql = 'DELETE FROM ' + self.table_name + ' WHERE ID = ' + self.gui.id_num_label.text()
-                cur.execute(sql)
-                conn.commit()
+                self.database.delete_record(self.gui.id_num_label.text())
 
                 self.ids = self.get_ids()
                 self.gui.refresh_combo_boxes()
@@ -289,62 +330,37 @@ class Main(QObject):
             except (sqlite3.OperationalError, sqlite3.DatabaseError, sqlite3.NotSupportedError) as err:
                 self.write_log('*Critical error from WeeklyGiving.get_by_id: ' + str(err))
         
+    @timed('record_save_seconds')
+    @profiled
     def save_rec(self):
         """
-        Gathers all of the data from the gui's entries and build a sql statment to update the record based on the
-        current id number.
-        """
-        sql = 'UPDATE ' + self.table_name + ' SET '
-        sql += 'id = "' + self.gui.id_num_label.text()
-        sql += '", prepared_by = "' + self.gui.prep_line_edit.text()
-        sql += '", date = "' + self.gui.date_line_edit.text()
-
-        sql += '", bills_100 = "' + self.gui.bills_100_line_edit.text()
-        sql += '", bills_50 = "' + self.gui.bills_50_line_edit.text()
-        sql += '", bills_20 = "' + self.gui.bills_20_line_edit.text()
-        sql += '", bills_10 = "' + self.gui.bills_10_line_edit.text()
-        sql += '", bills_5 = "' + self.gui.bills_5_line_edit.text()
-        sql += '", bills_1 = "' + self.gui.bills_1_line_edit.text()
-
-        sql += '", coins_100 = "' + self.gui.dollar_line_edit.text()
-        sql += '", coins_25 = "' + self.gui.quarter_line_edit.text()
-        sql += '", coins_10 = "' + self.gui.dime_line_edit.text()
-        sql += '", coins_5 = "' + self.gui.nickel_line_edit.text()
-        sql += '", coins_1 = "' + self.gui.penny_line_edit.text()
-
-        counter = 1
-        for widget in self.gui.findChildren(QLineEdit, QRegularExpression('special_edit*')):
-            sql += '", spec' + str(counter) + ' = "' + widget.text()
-            counter += 1
-
-        counter = 0
-        for widget in self.gui.findChildren(QLineEdit, QRegularExpression('check*')):
-            sql += '", checks_' + str(counter) + ' = "' + widget.text()
-            counter += 1
-        sql += '", quantity_of_checks = "' + self.gui.num_checks_total_label.text()
-
-        sql += '", coins_total = "' + self.gui.coins_total_label.text()
-        sql += '", bills_total = "' + self.gui.bills_total_label.text()
-        sql += '", checks_total = "' + self.gui.checks_total_label.text()
-        sql += '", total_designated_offerings = "' + self.gui.designated_total_label.text()
-        sql += '", total_deposit = "' + self.gui.total_total_label.text()
-
-        notes = self.gui.notes_edit.toPlainText()
-        notes = notes.replace('"', '<apost>')
-        notes = notes.replace('\'', '<quot>')
-        sql += '", notes = "' + notes
-        sql += '" WHERE id = ' + self.gui.id_num_label.text() + ';'
-
-        self.write_log('WeeklyGiving.save_rec sql: ' + sql)
+        Gathers the data from the gui's entries that have changed since the record was loaded and builds a sql
+        statement to update only those columns of the record based on the current id number. Returns False if the
+        changes could not be saved and are still on the screen.
+        """
+        self.maintenance_scheduler.note_activity()
+        dirty_columns = self.gui.get_dirty_columns(include_totals=True)
+        if len(dirty_columns) == 0:
+            self.gui.mark_clean()
+            return True
+
+        values = self.gui.get_record_values()
+
+        values['notes'] = encode_notes(values['notes'])
+
+        changed_values = {column: values[column] for column in dirty_columns}
+        self.write_log('WeeklyGiving.save_rec changes to ' + self.gui.id_num_label.text() + ': ' + str(changed_values))
 
         try:
-            conn = sqlite3.connect(self.file_locations['database_file'])
-            cur = conn.cursor()
-            cur.execute(sql)
-            conn.commit()
+            try:
+                self.loaded_version = self.database.update_record(
+                    self.gui.id_num_label.text(), changed_values, expected_version=self.loaded_version)
+            except RecordConflictError as conflict:
+                if not self.resolve_conflict(conflict, values):
+                    # nothing is left unsaved if the user chose the other person's version
+                    return len(self.gui.get_dirty_columns()) == 0
 
-            self.gui.changes = False
-            self.gui.save_button.setEnabled(False)
+            self.gui.mark_clean()
 
             confirm_label = QLabel('Record Saved')
             confirm_label.setParent(self.gui)
@@ -360,17 +376,71 @@ class Main(QObject):
             time.sleep(1.0)
             confirm_label.hide()
             confirm_label.deleteLater()
+            return True
 
         except (sqlite3.OperationalError, sqlite3.DatabaseError, sqlite3.NotSupportedError) as err:
             self.write_log('*Critical error from WeeklyGiving.get_by_id: ' + str(err))
+            return False
         
+    def resolve_conflict(self, conflict, values):
+        """
+        Asks the user what to do when someone else saved or deleted the record after it was loaded here. They can
+        replace the other person's version with everything on the screen, load the other person's version in place of
+        their own changes, or go back to editing. Returns True if the user's values were saved.
+        :param database.RecordConflictError conflict: the conflict
+        :param dict values: every field's value as it would be saved
+        """
+        self.write_log('WeeklyGiving.save_rec conflict: ' + str(conflict))
+
+        if conflict.current is None:
+            QMessageBox.warning(
+                self.gui,
+                'Record Deleted',
+                'Record ' + str(conflict.id) + ' was deleted by someone else while you were working on it, so your '
+                    'changes could not be saved. Copy anything you need from it before moving to another record.',
+                QMessageBox.StandardButton.Ok
+            )
+            return False
+
+        message_box = QMessageBox(self.gui)
+        message_box.setIcon(QMessageBox.Icon.Warning)
+        message_box.setWindowTitle('Record Changed by Someone Else')
+        message_box.setText(
+            'Someone else saved changes to record ' + str(conflict.id) + ' after you opened it. Saving now would '
+                'lose either their changes or yours.')
+        message_box.setInformativeText(
+            'Keep Mine saves everything on your screen over their version. Use Theirs discards your changes and shows '
+                'their version. Cancel returns to your changes without saving.')
+        keep_button = message_box.addButton('Keep Mine', QMessageBox.ButtonRole.AcceptRole)
+        use_button = message_box.addButton('Use Theirs', QMessageBox.ButtonRole.DestructiveRole)
+        message_box.addButton(QMessageBox.StandardButton.Cancel)
+        message_box.exec()
+
+        if message_box.clickedButton() is keep_button:
+            # their changes to other fields would leave the totals on the screen wrong, so every field is saved
+            try:
+                self.loaded_version = self.database.update_record(
+                    conflict.id, values, expected_version=conflict.current[VERSION_COLUMN])
+            except RecordConflictError as new_conflict:
+                # saved again by someone else in the meantime
+                return self.resolve_conflict(new_conflict, values)
+            self.write_log('WeeklyGiving.save_rec kept local changes to ' + str(conflict.id))
+            return True
+
+        if message_box.clickedButton() is use_button:
+            self.write_log('WeeklyGiving.save_rec discarded local changes to ' + str(conflict.id))
+            self.gui.fill_values(conflict.current)
+            self.loaded_version = conflict.current[VERSION_COLUMN]
+            self.gui.save_button.setEnabled(False)
+            self.gui.on_change(False)
+        return False
+
     def check_for_changes(self):
         """
-        Method to provide a dialog asking user to save if there have been changes to the current record. Returns True
-        or False depending on user's answer.
+        Method to provide a dialog asking user to save if the current record's values differ from those that were
+        loaded. Returns True or False depending on user's answer.
         """
-        if self.gui.changes:
-            print('asking to save')
+        if self.gui.get_dirty_columns():
             response = QMessageBox.question(
                 None,
                 'Changes Detected',
@@ -379,8 +449,7 @@ class Main(QObject):
             )
             
             if response == QMessageBox.StandardButton.Yes:
-                self.save_rec()
-                return True
+                return self.save_rec()
             elif response == QMessageBox.StandardButton.No:
                 return True
             else:
@@ -459,6 +528,27 @@ class Main(QObject):
         except OSError as err:
             self.write_log('*Critical error in WeeklyGiving.include_special: ' + str(err))
 
+    def set_autosave(self, sender):
+        """
+        Sets the autosave_enabled variable and saves changes to the config file.
+        :param QObject sender: The checkable menu action
+        """
+        self.autosave_enabled = sender.isChecked()
+        if not self.autosave_enabled:
+            self.autosave.clear_journal()
+
+        try:
+            with open(self.file_locations['config_file'], 'r') as file:
+                config_json = json.loads(file.read())
+
+            config_json['autosave'] = self.autosave_enabled
+
+            with open(self.file_locations['config_file'], 'w') as file:
+                file.write(json.dumps(config_json))
+
+        except OSError as err:
+            self.write_log('*Critical error in WeeklyGiving.set_autosave: ' + str(err))
+
     def change_name(self):
         """
         Provides the user with a dialog where they can change the church name shown in the program and on the
@@ -563,10 +653,7 @@ class Main(QObject):
                 with open(self.file_locations['config_file'], 'w') as file:
                     file.write(json.dumps(config_json))
 
-                conn = sqlite3.connect(self.file_locations['database_file'])
-                cur = conn.cursor()
-                result = cur.execute('SELECT * FROM ' + self.table_name + ' WHERE id=' + str(self.ids[0]))
-                column_names = [description[0] for description in result.description]
+                column_names = self.database.get_column_names()
 
                 highest_num = -1
                 for column in column_names:
@@ -576,20 +663,21 @@ class Main(QObject):
                             highest_num = int(column_split[1])
 
                 if new_max_checks > highest_num + 1:
-                    added_columns = []
-                    for i in range(highest_num, new_max_checks - 1):
-                        new_column = 'checks_' + str(i + 1)
-                        added_columns.append(new_column)
-                        sql = 'ALTER TABLE ' + self.table_name + ' ADD COLUMN ' + new_column + ' TEXT;'
-                        cur.execute(sql)
-                        conn.commit()
-
-                    for column in added_columns:
-                        sql = 'UPDATE ' + self.table_name + ' SET ' + column + ' = "0.00"'
-                        cur.execute(sql)
-                        conn.commit()
+                    added_columns = ['checks_' + str(i + 1) for i in range(highest_num, new_max_checks - 1)]
+
+                    def add_columns():
+                        conn = self.database.connect()
+                        try:
+                            # one transaction, so that a retry after a lock starts over from no columns added
+                            conn.execute('BEGIN IMMEDIATE')
+                            for column in added_columns:
+                                conn.execute('ALTER TABLE ' + self.table_name + ' ADD COLUMN ' + column + ' TEXT')
+                                conn.execute('UPDATE ' + self.table_name + ' SET ' + column + ' = ?', ('0.00',))
+                            conn.commit()
+                        finally:
+                            conn.close()
 
-                    conn.close()
+                    retry_when_locked(add_columns)
 
                 elif new_max_checks <= highest_num:
                     # make sure the user knows that if at any time there have been more checks recorded than the
@@ -604,31 +692,33 @@ class Main(QObject):
                     )
 
                     if response == QMessageBox.StandardButton.Yes:
-                        # drop any superfluous check columns
-                        for i in range(new_max_checks, highest_num + 1):
-                            sql = 'ALTER TABLE ' + self.table_name + ' DROP COLUMN "checks_' + str(i) + '";'
-                            cur.execute(sql)
-                            conn.commit()
-                        conn.close()
+                        def drop_columns():
+                            conn = self.database.connect()
+                            try:
+                                conn.execute('BEGIN IMMEDIATE')
+                                # drop any superfluous check columns
+                                for i in range(new_max_checks, highest_num + 1):
+                                    conn.execute(
+                                        'ALTER TABLE ' + self.table_name + ' DROP COLUMN "checks_' + str(i) + '"')
+                                conn.commit()
+                            finally:
+                                conn.close()
+
+                        retry_when_locked(drop_columns)
 
                 # save the current listing of check values to be inserted into the rebuilt checks_widget
-                check_values = []
-                for widget in self.gui.checks_widget.findChildren(QLineEdit):
-                    check_values.append(widget.text())
+                check_values = {}
+                for i in range(len(self.gui.check_fields)):
+                    check_values['checks_' + str(i)] = self.gui.check_fields[i].text()
 
-                # remove and rebuild the gui's checks_widget to reflect the new number of checks
-                self.gui.main_layout.removeWidget(self.gui.checks_widget)
-                self.gui.main_layout.update()
+                # rebuild the gui's checks_widget to reflect the new number of checks
                 self.gui.build_checks_frame()
+                self.gui.main_layout.update()
                 QApplication.processEvents()
 
-                index = 0
-                for widget in self.gui.checks_widget.findChildren(QLineEdit):
-                    if index < len(check_values) and widget:
-                        widget.setText(check_values[index])
-                    index += 1
+                self.gui.bulk_bind(check_values)
 
-            except OSError as err:
+            except (OSError, sqlite3.Error) as err:
                 self.write_log('*Critical error in WeeklyGiving.change_num_checks: ' + str(err))
             except Exception:
                 logging.exception('')
@@ -652,6 +742,7 @@ class Main(QObject):
             try:
                 shutil.copy(self.file_locations['database_file'], file_loc)
                 self.file_locations['database_file'] = file_loc
+                self.database = GivingDatabase(file_loc, self.table_name)
 
                 with open(self.file_locations['config_file'], 'r') as file:
                     config_json = json.loads(file.read())
@@ -664,34 +755,16 @@ class Main(QObject):
             except OSError as err:
                 self.write_log('*Critical error from WeeklyGiving.save_to_new_loc: ' + str(err))
             
+    @timed('backup_seconds')
+    @profiled
     def do_backup(self):
         """
         Writes a backup file to the user's database directory, appending the current date and time to the file name.
         Removes oldest file if there are already 5 or more backup files.
         """
-        pathArray = self.file_locations['database_file'].split('/')
-        databaseDir = ''
-        for i in range(0, len(pathArray) - 1):
-            databaseDir += pathArray[i] + '/'
-
         try:
-            fileArray = os.listdir(databaseDir)
-            backupFiles = []
-            for file in fileArray:
-                if 'backup' in file:
-                    backupFiles.append(file)
-
-            if(len(backupFiles) >= 5):
-                os.remove(databaseDir + backupFiles[0])
-
-            from datetime import datetime
-            now = datetime.now().strftime("%m-%d-%Y_%H-%M-%S")
-            newBackupFile = databaseDir + pathArray[len(pathArray) - 1] + '.backup.' + now
+            newBackupFile = self.database.backup()
             self.write_log('New Backup File: ' + newBackupFile)
-
-            import shutil
-            shutil.copy(self.file_locations['database_file'], newBackupFile)
-
         except OSError as err:
             self.write_log('Error from WeeklyGiving.do_backup: ' + str(err))
         
@@ -711,6 +784,11 @@ class Main(QObject):
                 else:
                     formatted_text += '\r\n\t' + text[i]
 
+        if formatted_text.startswith('*Critical'):
+            metrics.increment('logged_errors', {'severity': 'critical'})
+        elif formatted_text.startswith('*'):
+            metrics.increment('logged_errors', {'severity': 'error'})
+
         try:
             if '*Critical' in text:
                 QMessageBox().critical(
@@ -746,6 +824,103 @@ class Main(QObject):
         except Exception:
             logging.exception('')
 
+    def set_profiling(self, sender):
+        """
+        Turns profiling.profiler on or off. When it is turned off, tells the user where the results were written so
+        they can be attached to a bug report.
+        :param QObject sender: The checkable menu action
+        """
+        if sender.isChecked():
+            profiler.start(self.file_locations['program_data_dir'] + '/profiles')
+            self.write_log('Profiling started')
+            return
+
+        output_dir = profiler.stop()
+        if output_dir:
+            self.write_log('Profiling results written to ' + output_dir)
+            QMessageBox.information(
+                self.gui,
+                'Profiling Results',
+                'The profiling results were saved to\n\n' + output_dir
+                    + '\n\nPlease attach the files in this folder to your bug report.',
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            QMessageBox.information(
+                self.gui,
+                'Profiling Results',
+                'Nothing was profiled. Leave profiling on while doing whatever is slow, then turn it off.',
+                QMessageBox.StandardButton.Ok
+            )
+
+    def show_diagnostics(self):
+        """
+        Shows the Diagnostics dialog with the counters and latencies recorded by metrics.metrics since the program
+        started
+        """
+        from diagnostics import DiagnosticsDialog
+
+        if not self.diagnostics_dialog:
+            self.diagnostics_dialog = DiagnosticsDialog(self)
+        self.diagnostics_dialog.refresh()
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
+
+    def set_save_metrics(self, enabled):
+        """
+        Sets whether the metrics are saved to a file when the program closes and saves the choice to the config file
+        :param bool enabled: whether to save the metrics
+        """
+        self.save_metrics_enabled = enabled
+
+        try:
+            with open(self.file_locations['config_file'], 'r') as file:
+                config_json = json.loads(file.read())
+
+            config_json['saveMetrics'] = self.save_metrics_enabled
+
+            with open(self.file_locations['config_file'], 'w') as file:
+                file.write(json.dumps(config_json))
+
+        except OSError as err:
+            self.write_log('*Critical error in WeeklyGiving.set_save_metrics: ' + str(err))
+
+    def set_direct_print(self, enabled):
+        """
+        Sets whether PDFs are sent directly to the printer rather than printed from the rendered preview and saves the
+        choice to the config file
+        :param bool enabled: whether to send PDFs directly
+        """
+        self.direct_print_enabled = enabled
+
+        try:
+            with open(self.file_locations['config_file'], 'r') as file:
+                config_json = json.loads(file.read())
+
+            config_json['directPrint'] = self.direct_print_enabled
+
+            with open(self.file_locations['config_file'], 'w') as file:
+                file.write(json.dumps(config_json))
+
+        except OSError as err:
+            self.write_log('*Critical error in WeeklyGiving.set_direct_print: ' + str(err))
+
+    def save_metrics(self):
+        """
+        Writes the metrics, in the OpenMetrics text format, to a new file in the program data directory's metrics
+        folder if the user has chosen to save them when the program closes
+        """
+        if not self.save_metrics_enabled:
+            return
+
+        file_name = (self.file_locations['program_data_dir'] + '/metrics/'
+                     + datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + '.txt')
+        try:
+            metrics.write(file_name)
+            self.write_log('Metrics written to ' + file_name)
+        except OSError as err:
+            self.write_log('Error from WeeklyGiving.save_metrics: ' + str(err))
+
     def view_log(self):
         """
         Method to enable viewing of the log file from within the program
@@ -776,8 +951,9 @@ class Main(QObject):
 
     def graph_by_date(self):
         """
-        Provides the user with a dialog where they can choose a date range from which to graph deposits. Creates and
-        shows a line graph by calling graph_this.LineGraph.
+        Provides the user with a dialog where they can choose a date range from which to graph deposits, either for
+        each record or totaled by week, month, quarter, or year. Creates and shows the graph by calling
+        graph_this.LineGraph or graph_this.PeriodGraph.
         """
         dialog = QDialog()
         layout = QGridLayout()
@@ -819,6 +995,32 @@ class Main(QObject):
         layout.addWidget(button_widget, 2, 0)
         line_button.setChecked(True)
 
+        period_widget = QWidget()
+        period_layout = QHBoxLayout()
+        period_widget.setLayout(period_layout)
+
+        period_label = QLabel('Group By:')
+        period_label.setFont(self.gui.bold_font)
+        period_layout.addWidget(period_label)
+
+        period_combo_box = QComboBox()
+        period_combo_box.setFont(self.gui.standard_font)
+        period_combo_box.addItem('Each Record', None)
+        period_combo_box.addItem('Week', 'week')
+        period_combo_box.addItem('Month', 'month')
+        period_combo_box.addItem('Quarter', 'quarter')
+        period_combo_box.addItem('Year', 'year')
+        period_layout.addWidget(period_combo_box)
+
+        stack_check_box = QCheckBox('Show Bills, Coins, Checks, and Designated Offerings')
+        stack_check_box.setFont(self.gui.standard_font)
+        stack_check_box.setEnabled(False)
+        period_layout.addWidget(stack_check_box)
+        period_combo_box.currentIndexChanged.connect(
+            lambda: stack_check_box.setEnabled(period_combo_box.currentData() is not None))
+
+        layout.addWidget(period_widget, 2, 1)
+
         go_button = QPushButton('Go')
         go_button.setMaximumWidth(100)
         go_button.pressed.connect(lambda: dialog.done(1))
@@ -832,41 +1034,458 @@ class Main(QObject):
         answer = dialog.exec()
 
         if answer == 1:
+            start = start_date.selectedDate().toString('yyyy-MM-dd')
+            end = end_date.selectedDate().toString('yyyy-MM-dd')
+            period = period_combo_box.currentData()
+            if line_button.isChecked():
+                graph_type = 'line'
+            else:
+                graph_type = 'bar'
+            stacked = period is not None and stack_check_box.isChecked()
+
+            try:
+                data_stamp = self.database.get_data_stamp()
+            except OSError as ex:
+                self.write_log('*Error from Main.graph_by_date: ' + str(ex))
+                return
+
+            # the database's stamp is part of the key, so saving or deleting a record means the graph is rebuilt
+            key = (start, end, period, graph_type, stacked, data_stamp)
+            if key in self.graph_windows:
+                self.graph_windows[key].raise_()
+                self.graph_windows[key].activateWindow()
+                return
+
+            if not self.figure_cache:
+                # graph_window imports matplotlib, so it isn't imported until the first graph
+                from graph_window import FigureCache
+                self.figure_cache = FigureCache()
+
+            figure = self.figure_cache.get(key)
+            if figure is not None:
+                self.show_graph(key, figure)
+                return
+
             from gui import Popup
-            popup = Popup(self.gui, 'Creating Graph...')
-            popup.show()
-            QApplication.processEvents()
+            self.graph_popup = Popup(self.gui, 'Creating Graph...')
+            self.graph_popup.show()
 
-            from graph_this import LineGraph
-            lg = LineGraph()
-            QApplication.processEvents()
+            graph_builder = GraphBuilder(self, key)
+            graph_builder.signals.finished.connect(self.graph_finished)
+            self.thread_pool.start(graph_builder)
 
-            start = start_date.selectedDate()
-            end = end_date.selectedDate()
-            connection = sqlite3.connect(self.file_locations['database_file'])
-            cursor = connection.cursor()
-            sql = 'SELECT Date, Total_Deposit from ' + self.table_name
-            result = cursor.execute(sql).fetchall()
-
-            filtered_dates = []
-            for item in result:
-                date_split = item[0].split('-')
-                date = QDate(int(date_split[0]), int(date_split[1]), int(date_split[2]))
-                if date >= start and date <= end:
-                    filtered_dates.append(item)
-
-            if len(filtered_dates) > 0:
-                try:
-                    if line_button.isChecked():
-                        lg.pairs = filtered_dates
-                        lg.graph_values_by_date_line()
-                    else:
-                        lg.pairs = filtered_dates
-                        lg.graph_values_by_date_bar()
-                except Exception as ex:
-                    self.write_log(str(ex))
+    def graph_finished(self, key, figure, error):
+        """
+        Method called when a GraphBuilder runnable is done. Caches and shows the graph.
+        :param tuple key: the graph's parameters and the database stamp
+        :param matplotlib.figure.Figure figure: the graph's figure, or None if there were no records in the range or
+            the graph could not be created
+        :param str error: the error message if the graph could not be created, otherwise empty
+        """
+        if self.graph_popup:
+            self.graph_popup.deleteLater()
+            self.graph_popup = None
+
+        if len(error) > 0:
+            QMessageBox.critical(
+                self.gui,
+                'Graph Failed',
+                'The graph could not be created:\n\n' + error,
+                QMessageBox.StandardButton.Ok
+            )
+        elif figure is None:
+            QMessageBox.information(
+                self.gui,
+                'No Records',
+                'There are no records in that date range.',
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            self.figure_cache.put(key, figure)
+            self.show_graph(key, figure)
 
-            popup.deleteLater()
+    @profiled
+    def show_graph(self, key, figure):
+        """
+        Shows a graph's figure in a graph_window.GraphWindow
+        :param tuple key: the graph's parameters and the database stamp
+        :param matplotlib.figure.Figure figure: the graph's figure
+        """
+        from graph_window import GraphWindow
+
+        graph_window = GraphWindow(figure, 'Weekly Giving Graph', self.gui)
+        self.graph_windows[key] = graph_window
+        graph_window.destroyed.connect(lambda: self.graph_windows.pop(key, None))
+        graph_window.showMaximized()
+
+    def batch_print(self):
+        """
+        Provides the user with a dialog where they can choose a date range, then writes the report of every record in
+        that range to a single PDF file using a BatchPrint runnable, showing its progress.
+        """
+        dialog = QDialog()
+        dialog.setWindowTitle('Batch Print Reports')
+        layout = QGridLayout()
+        dialog.setLayout(layout)
+
+        start_label = QLabel('Choose Start Date:')
+        start_label.setFont(self.gui.bold_font)
+        layout.addWidget(start_label, 0, 0)
+
+        start_date = QCalendarWidget()
+        layout.addWidget(start_date, 1, 0)
+
+        end_label = QLabel('Choose End Date:')
+        end_label.setFont(self.gui.bold_font)
+        layout.addWidget(end_label, 0, 1)
+
+        end_date = QCalendarWidget()
+        layout.addWidget(end_date, 1, 1)
+
+        go_button = QPushButton('Go')
+        go_button.setMaximumWidth(100)
+        go_button.pressed.connect(lambda: dialog.done(1))
+        layout.addWidget(go_button, 2, 0, Qt.AlignmentFlag.AlignRight)
+
+        cancel_button = QPushButton('Cancel')
+        cancel_button.setMaximumWidth(100)
+        cancel_button.pressed.connect(lambda: dialog.done(0))
+        layout.addWidget(cancel_button, 2, 1)
+
+        if dialog.exec() != 1:
+            return
+
+        start = start_date.selectedDate().toString('yyyy-MM-dd')
+        end = end_date.selectedDate().toString('yyyy-MM-dd')
+
+        file_name = QFileDialog.getSaveFileName(
+            self.gui,
+            'Save Reports As',
+            os.path.expanduser('~') + '/Weekly Giving ' + start + ' to ' + end + '.pdf',
+            'PDF Files (*.pdf)'
+        )[0]
+        if len(file_name) == 0:
+            return
+
+        self.batch_progress = QProgressDialog('Creating Reports...', None, 0, 0, self.gui)
+        self.batch_progress.setWindowTitle('Batch Print Reports')
+        self.batch_progress.setMinimumDuration(0)
+        self.batch_progress.show()
+
+        batch_print = BatchPrint(self, start, end, file_name)
+        batch_print.signals.progress.connect(self.batch_print_progress)
+        batch_print.signals.finished.connect(self.batch_print_finished)
+        self.thread_pool.start(batch_print)
+
+    def batch_print_progress(self, done, total):
+        """
+        Method to update the batch print's progress dialog
+        :param int done: the number of pages done
+        :param int total: the total number of pages
+        """
+        self.batch_progress.setMaximum(total)
+        self.batch_progress.setValue(done)
+
+    def batch_print_finished(self, pages, file_name, error):
+        """
+        Method called when a BatchPrint runnable is done. Tells the user where the reports were written.
+        :param int pages: the number of pages written
+        :param str file_name: the PDF file
+        :param str error: the error message if the reports could not be written, otherwise empty
+        """
+        self.batch_progress.close()
+        self.batch_progress.deleteLater()
+
+        if len(error) > 0:
+            QMessageBox.critical(
+                self.gui,
+                'Batch Print Failed',
+                'The reports could not be written:\n\n' + error,
+                QMessageBox.StandardButton.Ok
+            )
+        elif pages == 0:
+            QMessageBox.information(
+                self.gui,
+                'No Records',
+                'There are no records in that date range.',
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            response = QMessageBox.question(
+                self.gui,
+                'Reports Saved',
+                str(pages) + ' reports were saved to ' + file_name + '. Would you like to print them now?',
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+
+            if response == QMessageBox.StandardButton.Yes:
+                self.print_file(file_name)
+
+    def export_graphs(self):
+        """
+        Provides the user with a dialog where they can choose the file formats, then saves the configured charts to a
+        directory using an ExportGraphs runnable, showing its progress
+        """
+        dialog = QDialog()
+        dialog.setWindowTitle('Export Graphs')
+        layout = QGridLayout()
+        dialog.setLayout(layout)
+
+        format_label = QLabel('Save the graphs as:')
+        format_label.setFont(self.gui.bold_font)
+        layout.addWidget(format_label, 0, 0, 1, 2)
+
+        format_check_boxes = {}
+        for file_format in ['png', 'svg', 'pdf']:
+            format_check_box = QCheckBox(file_format.upper())
+            format_check_box.setFont(self.gui.standard_font)
+            format_check_box.setChecked(file_format == 'png')
+            layout.addWidget(format_check_box, len(format_check_boxes) + 1, 0, 1, 2)
+            format_check_boxes[file_format] = format_check_box
+
+        go_button = QPushButton('Go')
+        go_button.setMaximumWidth(100)
+        go_button.pressed.connect(lambda: dialog.done(1))
+        layout.addWidget(go_button, 4, 0, Qt.AlignmentFlag.AlignRight)
+
+        cancel_button = QPushButton('Cancel')
+        cancel_button.setMaximumWidth(100)
+        cancel_button.pressed.connect(lambda: dialog.done(0))
+        layout.addWidget(cancel_button, 4, 1)
+
+        if dialog.exec() != 1:
+            return
+
+        formats = [file_format for file_format in format_check_boxes if format_check_boxes[file_format].isChecked()]
+        if len(formats) == 0:
+            return
+
+        directory = QFileDialog.getExistingDirectory(self.gui, 'Save Graphs To', os.path.expanduser('~'))
+        if len(directory) == 0:
+            return
+
+        self.export_progress = QProgressDialog('Creating Graphs...', None, 0, 0, self.gui)
+        self.export_progress.setWindowTitle('Export Graphs')
+        self.export_progress.setMinimumDuration(0)
+        self.export_progress.show()
+
+        export_graphs = ExportGraphs(self, directory, formats)
+        export_graphs.signals.progress.connect(self.export_graphs_progress)
+        export_graphs.signals.finished.connect(self.export_graphs_finished)
+        self.thread_pool.start(export_graphs)
+
+    def export_graphs_progress(self, done, total):
+        """
+        Method to update the graph export's progress dialog
+        :param int done: the number of graphs done
+        :param int total: the total number of graphs
+        """
+        self.export_progress.setMaximum(total)
+        self.export_progress.setValue(done)
+
+    def export_graphs_finished(self, files, directory, error):
+        """
+        Method called when an ExportGraphs runnable is done. Tells the user where the graphs were saved.
+        :param int files: the number of files written
+        :param str directory: the directory the graphs were saved to
+        :param str error: the error message if the graphs could not be saved, otherwise empty
+        """
+        self.export_progress.close()
+        self.export_progress.deleteLater()
+
+        if len(error) > 0:
+            QMessageBox.critical(
+                self.gui,
+                'Export Failed',
+                'The graphs could not be saved:\n\n' + error,
+                QMessageBox.StandardButton.Ok
+            )
+        elif files == 0:
+            QMessageBox.information(
+                self.gui,
+                'No Records',
+                'There are no records to graph.',
+                QMessageBox.StandardButton.Ok
+            )
+        else:
+            QMessageBox.information(
+                self.gui,
+                'Graphs Saved',
+                str(files) + ' files were saved to ' + directory + '.',
+                QMessageBox.StandardButton.Ok
+            )
+
+    @profiled
+    def print_file(self, file_name):
+        """
+        Opens a PrintDialog for a PDF file
+        :param str file_name: the PDF file
+        """
+        from PyQt6.QtPdf import QPdfDocument
+        from print_dialog import PrintDialog, render_lock
+
+        try:
+            with open(file_name, 'rb') as file:
+                pdf_bytes = file.read()
+        except OSError as ex:
+            self.write_log('*Error from Main.print_file: ' + str(ex))
+            return
+
+        pdf_document = QPdfDocument(self.gui)
+        pdf_document.load(file_name)
+        print_dialog = PrintDialog(pdf_document, self.gui, pdf_bytes, title=os.path.basename(file_name))
+        print_dialog.exec()
+        with render_lock:
+            pdf_document.close()
+        pdf_document.deleteLater()
+
+    def print_job_failed(self, id):
+        """
+        Method called when a print job fails to let the user know
+        :param int id: the job's number
+        """
+        job = self.print_spooler.get_job(id)
+        if job:
+            QMessageBox.warning(
+                self.gui,
+                'Printing Failed',
+                '"' + job.title + '" could not be printed:\n\n' + job.error
+                    + '\n\nYou can retry it from File > Print Queue.',
+                QMessageBox.StandardButton.Ok
+            )
+
+    def show_print_queue(self):
+        """
+        Shows the print queue, where the user can follow, cancel, or retry print jobs and see earlier ones
+        """
+        if not self.print_queue_dialog:
+            self.print_queue_dialog = PrintQueueDialog(self.print_spooler, self.gui)
+        self.print_queue_dialog.show()
+        self.print_queue_dialog.raise_()
+
+
+class BatchPrintSignals(QObject):
+    """
+    Signals emitted by a BatchPrint runnable, since QRunnable can't define its own
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int, str, str)
+
+
+class BatchPrint(QRunnable):
+    """
+    Implements QRunnable to write the reports for a date range with batch_report.BatchReport off of the gui thread
+    """
+    def __init__(self, main, start, end, file_name):
+        """
+        :param Main main: the Main instance
+        :param str start: the earliest date to include, as YYYY-MM-DD
+        :param str end: the latest date to include, as YYYY-MM-DD
+        :param str file_name: the PDF file to write
+        """
+        super().__init__()
+        self.main = main
+        self.start = start
+        self.end = end
+        self.file_name = file_name
+        self.signals = BatchPrintSignals()
+
+    @profiled
+    def run(self):
+        from batch_report import BatchReport
+
+        try:
+            batch_report = BatchReport(
+                self.main.database, self.main.name, self.main.spec_designations, self.main.write_log)
+            pages = batch_report.write(self.start, self.end, self.file_name, self.signals.progress.emit)
+            self.signals.finished.emit(pages, self.file_name, '')
+        except Exception as ex:
+            self.main.write_log('*Error from BatchPrint.run: ' + str(ex))
+            self.signals.finished.emit(0, self.file_name, str(ex))
+
+
+class ExportGraphsSignals(QObject):
+    """
+    Signals emitted by an ExportGraphs runnable, since QRunnable can't define its own
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(int, str, str)
+
+
+class ExportGraphs(QRunnable):
+    """
+    Implements QRunnable to save the configured charts with graph_export.GraphExport off of the gui thread
+    """
+    def __init__(self, main, directory, formats):
+        """
+        :param Main main: the Main instance
+        :param str directory: the directory to save the graphs to
+        :param list formats: any of 'png', 'svg', and 'pdf'
+        """
+        super().__init__()
+        self.main = main
+        self.directory = directory
+        self.formats = formats
+        self.signals = ExportGraphsSignals()
+
+    @profiled
+    def run(self):
+        from graph_export import GraphExport
+
+        try:
+            graph_export = GraphExport(
+                self.main.database, self.main.spec_designations, self.main.config_json.get('graphExports'))
+            files = graph_export.export(self.directory, self.formats, progress=self.signals.progress.emit)
+            self.signals.finished.emit(len(files), self.directory, '')
+        except Exception as ex:
+            self.main.write_log('*Error from ExportGraphs.run: ' + str(ex))
+            self.signals.finished.emit(0, self.directory, str(ex))
+
+
+class GraphBuilderSignals(QObject):
+    """
+    Signals emitted by a GraphBuilder runnable, since QRunnable can't define its own
+    """
+    finished = pyqtSignal(object, object, str)
+
+
+class GraphBuilder(QRunnable):
+    """
+    Implements QRunnable to query the database and build a graph's figure off of the gui thread
+    """
+    def __init__(self, main, key):
+        """
+        :param Main main: the Main instance
+        :param tuple key: the graph's start date, end date, period (None for each record), graph type, whether it is
+            stacked, and the database stamp
+        """
+        super().__init__()
+        self.main = main
+        self.key = key
+        self.signals = GraphBuilderSignals()
+
+    @profiled
+    def run(self):
+        from graph_this import LineGraph, PeriodGraph
+
+        start, end, period, graph_type, stacked = self.key[:5]
+        figure = None
+        try:
+            if period:
+                # the totals are summed by the database, using the index on the date column
+                rows = self.main.database.get_period_totals(period, start, end)
+                if len(rows) > 0:
+                    figure = PeriodGraph(rows, period).build_figure(graph_type, stacked, True)
+            else:
+                pairs = self.main.database.get_deposits(start, end, True)
+                if len(pairs) > 0:
+                    lg = LineGraph()
+                    lg.pairs = pairs
+                    figure = lg.build_figure(graph_type)
+            self.signals.finished.emit(self.key, figure, '')
+        except Exception as ex:
+            self.main.write_log('*Error from GraphBuilder.run: ' + str(ex))
+            self.signals.finished.emit(self.key, None, str(ex))
 
 
 class Startup(QRunnable):
@@ -878,17 +1497,24 @@ class Startup(QRunnable):
         super().__init__()
         self.main = main
         self.loading_box = LoadingBox(main)
+        self.stage_start = None
+
+    def end_stage(self, stage):
+        """
+        Records the time taken by a stage of startup in the startup_stage_seconds metric
+        :param str stage: the stage's name
+        """
+        now = time.perf_counter()
+        metrics.observe('startup_stage_seconds', now - self.stage_start, {'stage': stage})
+        self.stage_start = now
 
     def run(self):
         try:
+            self.stage_start = time.perf_counter()
             # Check to see if config file exists in user's APPDATA folder
             self.loading_box.change_text.emit('Getting Directories')
-            if 'linux' in sys.platform:
-                self.main.file_locations['app_data_dir'] = os.path.expanduser('~')
-                self.main.file_locations['program_data_dir'] = self.main.file_locations['app_data_dir'] + '/.WeeklyGiving'
-            else:
-                self.main.file_locations['app_data_dir'] = os.path.expanduser('~/AppData/Roaming')
-                self.main.file_locations['program_data_dir'] = self.main.file_locations['app_data_dir'] + '/WeeklyGiving'
+            self.main.file_locations['program_data_dir'] = get_program_data_dir()
+            self.main.file_locations['app_data_dir'] = os.path.dirname(self.main.file_locations['program_data_dir'])
 
             new_dir = False
 
@@ -905,6 +1531,7 @@ class Startup(QRunnable):
                 self.main.write_log('Creating %APPDATA%/WeeklyGiving folder and log.txt')
 
             self.main.write_log('APPDATA location: ' + self.main.file_locations['program_data_dir'])
+            self.end_stage('directories')
 
             self.loading_box.change_text.emit('Checking Files')
             self.main.file_locations['config_file'] = self.main.file_locations['program_data_dir'] + '/config.json'
@@ -916,22 +1543,29 @@ class Startup(QRunnable):
 
             # read the config file as json
             self.main.write_log('Opening config file from ' + self.main.file_locations['config_file'])
-            with open(self.main.file_locations['config_file'], 'r') as file:
-                self.main.config_json = json.loads(file.read())
+            self.main.config_json = load_config(self.main.file_locations['config_file'])
             self.main.file_locations['database_file'] = self.main.config_json['fileLoc']
 
             self.main.spec_designations = self.main.config_json['specialDesignations']
             self.main.max_checks = self.main.config_json['maxChecks']
             self.main.name = self.main.config_json['name']
             if 'includeSpecial' in self.main.config_json.keys():
-                self.main.include_special_in_total = self.main.config_json['includeSpecial']
+                self.main.include_special_in_total = parse_flag(self.main.config_json['includeSpecial'])
             else:
                 self.main.include_special_in_total = True
+            if 'autosave' in self.main.config_json.keys():
+                self.main.autosave_enabled = self.main.config_json['autosave']
+            if 'saveMetrics' in self.main.config_json.keys():
+                self.main.save_metrics_enabled = self.main.config_json['saveMetrics']
+            if 'directPrint' in self.main.config_json.keys():
+                self.main.direct_print_enabled = self.main.config_json['directPrint']
+            self.end_stage('config')
 
             self.loading_box.change_text.emit('Checking Database')
             self.loading_box.check_database_signal.emit()
             while self.loading_box.checking:
                 pass
+            self.end_stage('database')
 
             self.loading_box.change_text.emit('Starting GUI')
 
@@ -1035,97 +1669,22 @@ class LoadingBox(QDialog):
                         file.write(json.dumps(self.main.config_json))
 
                     print('creating sql')
-                    sql = '''
-                        CREATE TABLE "weekly_giving" (
-                        "id"	INTEGER,
-                        "date"	TEXT,
-                        "prepared_by"	TEXT,
-                        "bills_100"	TEXT,
-                        "bills_50"	TEXT,
-                        "bills_20"	TEXT,
-                        "bills_10"	TEXT,
-                        "bills_5"	TEXT,
-                        "bills_1"	TEXT,
-                        "coins_100"	TEXT,
-                        "coins_25"	TEXT,
-                        "coins_10"	TEXT,
-                        "coins_5"	TEXT,
-                        "coins_1"	TEXT,
-                        "spec1"	TEXT,
-                        "spec2"	TEXT,
-                        "spec3"	TEXT,
-                        "spec4"	TEXT,
-                        "spec5"	TEXT,
-                        "spec6"	TEXT,
-                        "spec7"	TEXT,
-                        "checks_0"	TEXT,
-                        "checks_1"	TEXT,
-                        "checks_2"	TEXT,
-                        "checks_3"	TEXT,
-                        "checks_4"	TEXT,
-                        "checks_5"	TEXT,
-                        "checks_6"	TEXT,
-                        "checks_7"	TEXT,
-                        "checks_8"	TEXT,
-                        "checks_9"	TEXT,
-                        "checks_10"	TEXT,
-                        "checks_11"	TEXT,
-                        "checks_12"	TEXT,
-                        "checks_13"	TEXT,
-                        "checks_14"	TEXT,
-                        "checks_15"	TEXT,
-                        "checks_16"	TEXT,
-                        "checks_17"	TEXT,
-                        "checks_18"	TEXT,
-                        "checks_19"	TEXT,
-                        "checks_20"	TEXT,
-                        "checks_21"	TEXT,
-                        "checks_22"	TEXT,
-                        "checks_23"	TEXT,
-                        "checks_24"	TEXT,
-                        "checks_25"	TEXT,
-                        "checks_26"	TEXT,
-                        "checks_27"	TEXT,
-                        "checks_28"	TEXT,
-                        "checks_29"	TEXT,
-                        "notes"	TEXT,
-                        "quantity_of_checks"	TEXT,
-                        "total_designated_offerings"	TEXT,
-                        "bills_total"	TEXT,
-                        "coins_total"	TEXT,
-                        "checks_total"	TEXT,
-                        "total_deposit"	TEXT,
-                        PRIMARY KEY("id" AUTOINCREMENT)
-                    )
-                    '''
+                    sql = get_create_table_sql(self.main.table_name)
 
                     print('executing sql')
-                    conn = sqlite3.connect(self.main.file_locations['database_file'])
-                    cursor = conn.cursor()
-                    cursor.execute(sql)
-                    conn.commit()
-                    conn.close()
-
-                    date = datetime.today().strftime('%Y-%m-%d')
-
-                    values = '"0",'
-                    for i in range(1, 58):
-                        if i == 1:
-                            values += '"' + date + '",'
-                        elif i == 2 or i == 51:
-                            values += '"",'
-                        else:
-                            values += '"0",'
+                    database = GivingDatabase(self.main.file_locations['database_file'], self.main.table_name)
 
-                    values = values[0:len(values) - 1]
+                    def create_table():
+                        conn = database.connect()
+                        try:
+                            conn.execute(sql)
+                            conn.commit()
+                        finally:
+                            conn.close()
 
                     try:
-                        conn = sqlite3.connect(self.main.file_locations['database_file'])
-                        cur = conn.cursor()
-                        sql = 'INSERT INTO ' + self.main.table_name + ' values (' + values + ')'
-                        cur.execute(sql)
-                        conn.commit()
-                        conn.close()
+                        retry_when_locked(create_table)
+                        database.insert_blank_record(0, datetime.today().strftime('%Y-%m-%d'))
                     except (sqlite3.OperationalError, sqlite3.DatabaseError, sqlite3.NotSupportedError) as err:
                         self.main.write_log('*Critical error from GUI.check_database: ' + str(err))
                 except TypeError:
@@ -1133,6 +1692,16 @@ class LoadingBox(QDialog):
             else:
                 quit()
 
+        self.main.database = GivingDatabase(self.main.file_locations['database_file'], self.main.table_name)
+        try:
+            self.main.database.create_date_index()
+        except sqlite3.Error as ex:
+            self.main.write_log('Unable to index the date column: ' + str(ex))
+        try:
+            self.main.database.add_version_column()
+        except sqlite3.Error as ex:
+            self.main.write_log('Unable to add the version column, so conflicting saves will not be detected: '
+                                + str(ex))
         self.main.column_pairs = self.main.get_column_pairs(self.main.spec_designations)
 
         self.main.ids = self.main.get_ids()
@@ -1152,51 +1721,19 @@ class Recalc(QRunnable):
         self.all_values = all_values
         self.gui = gui
 
+    @timed('recalc_seconds')
+    @profiled
     def run(self):
-        bill_values = [100, 50, 20, 10, 5, 1]
-        coin_values = [1.0, 0.25, 0.10, 0.05, 0.01]
-        bills_tot = 0.0
-        coins_tot = 0.0
-        special_tot = 0.0
-        checks_tot = 0.0
-        num_checks = 0
-
-        for i in range(0, 6):
-            if len(self.all_values[i]) > 0:
-                try:
-                    bills_tot += float(self.all_values[i]) * bill_values[i]
-                except ValueError:
-                    pass
-
-        for i in range(6, 11):
-            if len(self.all_values[i]) > 0:
-                try:
-                    coins_tot += float(self.all_values[i]) * coin_values[i - 6]
-                except ValueError:
-                    pass
-
-        for i in range(11, 18):
-            if len(self.all_values[i]) > 0:
-                try:
-                    special_tot += float(self.all_values[i].replace(',', ''))
-                except ValueError as ex:
-                    self.gui.main.write_log('*Error: ' + str(ex))
-                    pass
-
-        for i in range(18, len(self.all_values)):
-            if len(self.all_values[i]) > 0:
-                try:
-                    checks_tot += float(self.all_values[i].replace(',', ''))
-                    num_checks += 1
-                except ValueError as ex:
-                    self.gui.main.write_log('*Error: ' + str(ex))
-                    pass
+        totals, errors = calculate_totals(self.all_values)
+        for error in errors:
+            self.gui.main.write_log('*Error: ' + error)
 
-        totals = [bills_tot, coins_tot, special_tot, checks_tot, num_checks]
         self.gui.set_total_labels.emit(totals)
 
 
 if __name__ == '__main__':
+    # the batch report's process pool re-imports this module in frozen builds
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     Main()
     app.exec()
@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from metrics import metrics
+
+# how often each task is run, in the order they are run
+INTERVALS = {
+    'quick_check': timedelta(days=7),
+    'optimize': timedelta(days=1),
+    'analyze': timedelta(days=30),
+    'vacuum': timedelta(days=30)
+}
+
+# VACUUM's speed until one has been timed, in bytes per second
+DEFAULT_VACUUM_RATE = 20 * 1024 * 1024
+
+
+class DatabaseMaintenance:
+    """
+    Class to keep the records database healthy by running, each when it is due:
+
+    - quick_check: PRAGMA quick_check, to find corruption early while the backups are still good
+    - optimize: PRAGMA optimize, which refreshes the query planner's statistics where SQLite thinks they are stale
+    - analyze: ANALYZE, to gather the statistics for every index
+    - vacuum: VACUUM, to give back the space left by deleted records and rebuild a fragmented file, only when at least
+      min_free_fraction of the file is free or its pages are at least min_fragmentation out of order
+
+    Tasks are run within a time budget. A task that isn't expected to finish in what is left of the budget is put off
+    to the next run, and one that runs past it or is canceled is stopped by SQLite without changing anything. The time
+    each task was last run is kept in a JSON state file, separately for each database file.
+    """
+    min_free_fraction = 0.1
+    min_fragmentation = 0.25
+
+    def __init__(self, database, state_file):
+        """
+        :param database.GivingDatabase database: the records database
+        :param str state_file: the JSON file keeping when each task was last run
+        """
+        self.database = database
+        self.state_file = state_file
+        self.deadline = None
+        self.canceled = threading.Event()
+
+    def load_state(self):
+        """
+        Returns this database's state, a dictionary holding the ISO time each task was last run and the measured
+        'vacuum_rate' in bytes per second
+        """
+        try:
+            with open(self.state_file, 'r') as file:
+                state = json.loads(file.read())
+        except (OSError, ValueError):
+            state = {}
+        return state.get(os.path.abspath(self.database.database_file), {})
+
+    def save_state(self, database_state):
+        """
+        Saves this database's state, keeping those of any other databases
+        :param dict database_state: the state, as returned by load_state
+        """
+        try:
+            with open(self.state_file, 'r') as file:
+                state = json.loads(file.read())
+        except (OSError, ValueError):
+            state = {}
+        state[os.path.abspath(self.database.database_file)] = database_state
+
+        # the program data folder only exists once the program has been run, which a scheduled "cli.py maintain"
+        # doesn't need
+        directory = os.path.dirname(self.state_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_file = self.state_file + '.tmp'
+        with open(temp_file, 'w') as file:
+            file.write(json.dumps(state, indent=2))
+        os.replace(temp_file, self.state_file)
+
+    def get_due_tasks(self, now=None):
+        """
+        Returns the tasks whose interval has passed since they were last run, in the order they should be run
+        :param datetime.datetime now: optional: the current time, for testing
+        """
+        now = now or datetime.now()
+        state = self.load_state()
+        due = []
+        for task in INTERVALS:
+            last_run = state.get(task)
+            if not last_run or now - datetime.fromisoformat(last_run) >= INTERVALS[task]:
+                due.append(task)
+        return due
+
+    def cancel(self):
+        """
+        Stops the task that is running, e.g. because the user has started working again. Safe to call from any thread.
+        """
+        self.canceled.set()
+
+    def check_progress(self):
+        """
+        SQLite progress handler that stops the running statement once the budget is spent or the run is canceled
+        """
+        return 1 if self.canceled.is_set() or time.perf_counter() > self.deadline else 0
+
+    def run(self, budget=10.0, tasks=None, now=None):
+        """
+        Runs the due tasks, or the given tasks, within the time budget. Given tasks are run even if they are not due,
+        including a VACUUM that would reclaim little. Returns a report as a dictionary holding the
+        space usage 'before' and 'after', as returned by GivingDatabase.get_space_usage, and the 'results' as a list of
+        (task, outcome, seconds).
+        :param float budget: optional: the most seconds to spend
+        :param list tasks: optional: the tasks to run whether or not they are due
+        :param datetime.datetime now: optional: the current time, for testing
+        """
+        now = now or datetime.now()
+        self.canceled.clear()
+        self.deadline = time.perf_counter() + budget
+        state = self.load_state()
+        before = self.database.get_space_usage()
+        results = []
+
+        for task in tasks or self.get_due_tasks(now):
+            remaining = self.deadline - time.perf_counter()
+            if self.canceled.is_set():
+                results.append((task, 'canceled before starting', 0.0))
+                continue
+
+            if task == 'vacuum':
+                if not tasks and before['free_fraction'] < self.min_free_fraction and \
+                        (before['fragmentation'] or 0.0) < self.min_fragmentation:
+                    # nothing to gain, so wait another interval before looking again
+                    state[task] = now.isoformat(timespec='seconds')
+                    results.append((task, 'not needed', 0.0))
+                    continue
+                estimate = before['file_size'] / state.get('vacuum_rate', DEFAULT_VACUUM_RATE)
+                if estimate > remaining:
+                    results.append((task, 'put off, needs about ' + '{:.1f}'.format(estimate) + ' s', 0.0))
+                    continue
+
+            start = time.perf_counter()
+            try:
+                outcome = self.run_task(task)
+                state[task] = now.isoformat(timespec='seconds')
+                if task == 'vacuum':
+                    state['vacuum_rate'] = before['file_size'] / max(time.perf_counter() - start, 0.001)
+            except sqlite3.OperationalError as ex:
+                if 'interrupt' in str(ex):
+                    outcome = 'canceled' if self.canceled.is_set() else 'stopped at the time limit'
+                else:
+                    # e.g. the database is locked by another program; the task is tried again next time
+                    outcome = 'failed: ' + str(ex)
+            elapsed = time.perf_counter() - start
+            metrics.observe('maintenance_seconds', elapsed, {'task': task})
+            results.append((task, outcome, elapsed))
+
+        self.save_state(state)
+        return {'before': before, 'after': self.database.get_space_usage(), 'results': results}
+
+    def run_task(self, task):
+        """
+        Runs one task, stopping it if the budget is spent or the run is canceled. Returns its outcome as text.
+        :param str task: the task, one of the keys of INTERVALS
+        """
+        conn = self.database.connect()
+        conn.set_progress_handler(self.check_progress, 1000)
+        try:
+            if task == 'quick_check':
+                problems = [row[0] for row in conn.execute('PRAGMA quick_check').fetchall()]
+                if problems == ['ok']:
+                    return 'ok'
+                return 'problems found: ' + '; '.join(problems[:10])
+            elif task == 'optimize':
+                conn.execute('PRAGMA analysis_limit = 400')
+                conn.execute('PRAGMA optimize')
+            elif task == 'analyze':
+                conn.execute('ANALYZE')
+            elif task == 'vacuum':
+                conn.execute('VACUUM')
+            else:
+                raise ValueError('Unknown maintenance task: ' + task)
+            conn.commit()
+            return 'done'
+        finally:
+            conn.close()
+
+
+def format_report(report):
+    """
+    Returns a maintenance report as lines of text for the log
+    :param dict report: the report, as returned by DatabaseMaintenance.run
+    """
+    lines = []
+    for task, outcome, seconds in report['results']:
+        lines.append(task + ': ' + outcome + ' (' + '{:.2f}'.format(seconds) + ' s)')
+
+    for label in ['before', 'after']:
+        usage = report[label]
+        line = (label.capitalize() + ': ' + '{:,}'.format(usage['file_size']) + ' bytes, '
+                + '{:,}'.format(usage['free_bytes']) + ' reclaimable (' + '{:.0%}'.format(usage['free_fraction']) + ')')
+        if usage['fragmentation'] is not None:
+            line += ', ' + '{:.0%}'.format(usage['fragmentation']) + ' fragmented'
+        lines.append(line)
+    return lines
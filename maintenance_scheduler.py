@@ -0,0 +1,115 @@
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QMessageBox
+
+from maintenance import DatabaseMaintenance, format_report
+
+
+class MaintenanceScheduler(QObject):
+    """
+    Class to run maintenance.DatabaseMaintenance in a thread of its own once the user has been idle for idle_seconds,
+    and when the program closes. Any activity cancels a run that is in progress, so the user never waits on
+    maintenance while working; what was cut short is simply run next time.
+    """
+    finished = pyqtSignal(object)
+    check_interval_ms = 60000
+    idle_seconds = 300
+    idle_budget = 10.0
+    close_budget = 5.0
+
+    def __init__(self, main):
+        """
+        :param Main main: the Main instance
+        """
+        super().__init__()
+        self.main = main
+        self.maintenance = DatabaseMaintenance(
+            main.database, main.file_locations['program_data_dir'] + '/maintenance.json')
+        self.last_activity = time.monotonic()
+        self.running = threading.Event()
+        self.finished.connect(self.check_report)
+        # a pool of its own, so that closing waits only on maintenance and not on saves, graphs, or printing
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.timer = QTimer()
+        self.timer.setInterval(self.check_interval_ms)
+        self.timer.timeout.connect(self.check_idle)
+        self.timer.start()
+
+    def note_activity(self):
+        """
+        Method to be called whenever the user does something. Restarts the idle time and cancels a run in progress.
+        """
+        self.last_activity = time.monotonic()
+        if self.running.is_set():
+            self.maintenance.cancel()
+
+    def check_idle(self):
+        """
+        Starts a run if the user has been idle long enough, has no unsaved changes, and some task is due
+        """
+        if self.running.is_set() or time.monotonic() - self.last_activity < self.idle_seconds:
+            return
+        if self.main.gui.changes or len(self.maintenance.get_due_tasks()) == 0:
+            return
+
+        self.running.set()
+        self.thread_pool.start(MaintenanceWorker(self, self.idle_budget))
+
+    def run_on_close(self):
+        """
+        Runs any due tasks as the program closes, waiting at most close_budget seconds for them
+        """
+        if self.running.is_set():
+            # stop an idle run rather than keep the user waiting; it is picked up again next time
+            self.maintenance.cancel()
+        elif len(self.maintenance.get_due_tasks()) > 0:
+            self.running.set()
+            self.thread_pool.start(MaintenanceWorker(self, self.close_budget))
+        self.thread_pool.waitForDone(int(self.close_budget * 1000) + 1000)
+
+    def check_report(self, report):
+        """
+        Warns the user, and logs, if the integrity check found problems, since the backups made from now on will have
+        them too. Connected to finished, so it runs on the gui thread.
+        :param dict report: the report, as returned by DatabaseMaintenance.run
+        """
+        for task, outcome, seconds in report['results']:
+            if task == 'quick_check' and outcome.startswith('problems'):
+                self.main.write_log(
+                    '*Error from MaintenanceScheduler: the database integrity check found ' + outcome
+                    + '. Consider restoring a backup made before the problems began.')
+                QMessageBox.warning(
+                    self.main.gui,
+                    'Database Problems Found',
+                    'The weekly check of the database found problems:\n\n' + outcome[:500] + '\n\nIf others share '
+                    'this database, tell them, and consider restoring a backup made before the problems began.',
+                    QMessageBox.StandardButton.Ok
+                )
+
+
+class MaintenanceWorker(QRunnable):
+    """
+    Implements QRunnable to run the due maintenance tasks off of the gui thread and log what they did
+    """
+    def __init__(self, scheduler, budget):
+        """
+        :param MaintenanceScheduler scheduler: the MaintenanceScheduler instance
+        :param float budget: the most seconds to spend
+        """
+        super().__init__()
+        self.scheduler = scheduler
+        self.budget = budget
+
+    def run(self):
+        try:
+            report = self.scheduler.maintenance.run(self.budget)
+            self.scheduler.main.write_log('Database maintenance:\r\n' + '\r\n'.join(format_report(report)))
+            self.scheduler.finished.emit(report)
+        except Exception as ex:
+            self.scheduler.main.write_log('Error from MaintenanceWorker.run: ' + str(ex))
+        finally:
+            self.scheduler.running.clear()
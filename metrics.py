@@ -0,0 +1,248 @@
+import functools
+import os
+import platform
+import threading
+import time
+from datetime import datetime
+
+from profiling import get_max_args
+
+# upper bounds, in seconds, of the latency histograms' buckets
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf')]
+
+# prefixed to each metric's name in OpenMetrics files
+PREFIX = 'weekly_giving_'
+
+DESCRIPTIONS = {
+    'database_query_seconds': 'Time to run one SQL statement',
+    'record_load_seconds': 'Time to read a record and show it',
+    'record_save_seconds': 'Time to save a record\'s changes',
+    'recalc_seconds': 'Time to recalculate the totals',
+    'pdf_build_seconds': 'Time to make the current record\'s report',
+    'pdf_builds': 'Reports made for the current record, by where they came from',
+    'print_dialog_open_seconds': 'Time to open the print dialog',
+    'preview_render_seconds': 'Time to render one page of the print preview',
+    'print_job_seconds': 'Time to print one job',
+    'print_jobs': 'Print jobs, by how they ended',
+    'backup_seconds': 'Time to write a backup of the database',
+    'maintenance_seconds': 'Time taken by each database maintenance task',
+    'startup_stage_seconds': 'Time taken by each stage of starting the program',
+    'startup_seconds': 'Time from starting the program to showing the first record',
+    'logged_errors': 'Errors written to the log, by severity'
+}
+
+
+class Histogram:
+    """
+    Class holding the count, sum, longest value, and bucket counts of one latency metric
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.bucket_counts = [0] * len(BUCKETS)
+
+    def observe(self, value):
+        """
+        Adds a value to the histogram
+        :param float value: the value in seconds
+        """
+        self.count += 1
+        self.total += value
+        self.longest = max(self.longest, value)
+        for i in range(len(BUCKETS)):
+            if value <= BUCKETS[i]:
+                self.bucket_counts[i] += 1
+                break
+
+    def get_quantile(self, quantile):
+        """
+        Estimates a quantile by interpolating inside the bucket it falls in, the way Prometheus does. Values past the
+        last finite bucket are reported as the longest value.
+        :param float quantile: the quantile, between 0 and 1
+        """
+        if self.count == 0:
+            return 0.0
+
+        rank = quantile * self.count
+        below = 0
+        for i in range(len(BUCKETS)):
+            if below + self.bucket_counts[i] >= rank and self.bucket_counts[i] > 0:
+                if BUCKETS[i] == float('inf'):
+                    return self.longest
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                estimate = lower + (BUCKETS[i] - lower) * (rank - below) / self.bucket_counts[i]
+                return min(estimate, self.longest)
+            below += self.bucket_counts[i]
+        return self.longest
+
+
+class Metrics:
+    """
+    Class keeping counters and latency histograms of the program's operations in memory, so that the time things
+    take can be compared between machines and releases. Each metric is identified by its name and an optional
+    dictionary of labels, such as the kind of SQL statement. The metrics can be viewed from Help > Diagnostics and
+    written to a file in the OpenMetrics text format.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = datetime.now()
+
+    def increment(self, name, labels=None, amount=1):
+        """
+        Adds to a counter
+        :param str name: the counter's name
+        :param dict labels: optional: the counter's labels
+        :param int amount: optional: the amount to add
+        """
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, labels=None):
+        """
+        Adds a time to a latency histogram
+        :param str name: the histogram's name
+        :param float seconds: the time taken
+        :param dict labels: optional: the histogram's labels
+        """
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    def clear(self):
+        """
+        Removes every counter and histogram
+        """
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+            self.started = datetime.now()
+
+    def get_rows(self):
+        """
+        Returns a summary of each metric, sorted by name, as dictionaries holding its 'name', 'labels' as text, and
+        'count'. Histograms also hold their 'total', 'average', 'median', 'p95', and 'longest' times in seconds.
+        """
+        rows = []
+        with self.lock:
+            for (name, labels), value in self.counters.items():
+                rows.append({'name': name, 'labels': format_labels(labels), 'count': value})
+            for (name, labels), histogram in self.histograms.items():
+                rows.append({
+                    'name': name,
+                    'labels': format_labels(labels),
+                    'count': histogram.count,
+                    'total': histogram.total,
+                    'average': histogram.total / histogram.count,
+                    'median': histogram.get_quantile(0.5),
+                    'p95': histogram.get_quantile(0.95),
+                    'longest': histogram.longest
+                })
+        return sorted(rows, key=lambda row: (row['name'], row['labels']))
+
+    def to_openmetrics(self):
+        """
+        Returns the metrics in the OpenMetrics text format, starting with an info metric describing this machine
+        """
+        lines = [
+            '# TYPE ' + PREFIX + 'build info',
+            PREFIX + 'build_info' + format_labels((
+                ('machine', platform.machine()),
+                ('platform', platform.platform()),
+                ('processors', str(os.cpu_count())),
+                ('python', platform.python_version())
+            )) + ' 1'
+        ]
+
+        with self.lock:
+            for name in sorted(set(key[0] for key in self.counters)):
+                lines += get_metadata(name, 'counter')
+                for key in sorted(key for key in self.counters if key[0] == name):
+                    lines.append(PREFIX + name + '_total' + format_labels(key[1]) + ' ' + str(self.counters[key]))
+
+            for name in sorted(set(key[0] for key in self.histograms)):
+                lines += get_metadata(name, 'histogram')
+                for key in sorted(key for key in self.histograms if key[0] == name):
+                    histogram = self.histograms[key]
+                    cumulative = 0
+                    for bound, bucket_count in zip(BUCKETS, histogram.bucket_counts):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(PREFIX + name + '_bucket' + format_labels(key[1] + (('le', le),)) + ' '
+                                     + str(cumulative))
+                    lines.append(PREFIX + name + '_count' + format_labels(key[1]) + ' ' + str(histogram.count))
+                    lines.append(PREFIX + name + '_sum' + format_labels(key[1]) + ' ' + repr(histogram.total))
+
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file_name):
+        """
+        Writes the metrics to a file in the OpenMetrics text format
+        :param str file_name: the file to write
+        """
+        directory = os.path.dirname(file_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(file_name, 'w') as file:
+            file.write(self.to_openmetrics())
+
+
+def format_labels(labels):
+    """
+    Returns a metric's labels as OpenMetrics writes them, e.g. '{statement="select"}', or an empty string if there
+    are none
+    :param tuple labels: (name, value) pairs
+    """
+    if len(labels) == 0:
+        return ''
+    values = [name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+              for name, value in labels]
+    return '{' + ','.join(values) + '}'
+
+
+def get_metadata(name, metric_type):
+    """
+    Returns the OpenMetrics TYPE, UNIT, and HELP lines for a metric
+    :param str name: the metric's name
+    :param str metric_type: 'counter' or 'histogram'
+    """
+    lines = ['# TYPE ' + PREFIX + name + ' ' + metric_type]
+    if name.endswith('_seconds'):
+        lines.append('# UNIT ' + PREFIX + name + ' seconds')
+    if name in DESCRIPTIONS:
+        lines.append('# HELP ' + PREFIX + name + ' ' + DESCRIPTIONS[name])
+    return lines
+
+
+metrics = Metrics()
+
+
+def timed(name, labels=None):
+    """
+    Decorator recording each call's time in a latency histogram. Like profiling.profiled, it drops extra positional
+    arguments from a signal if the function doesn't take them.
+    :param str name: the histogram's name
+    :param dict labels: optional: the histogram's labels
+    """
+    def decorator(function):
+        max_args = get_max_args(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.observe(name, time.perf_counter() - start, labels)
+
+        return wrapper
+
+    return decorator
@@ -1,48 +1,70 @@
 import sys
+import threading
+from collections import OrderedDict
+
 if 'linux' not in sys.platform:
     import win32print
-    import wmi
-else:
-    import cups
-from PyQt6.QtCore import QSize, QRectF, Qt
-from PyQt6.QtGui import QPixmap, QIcon, QPainter, QPageLayout
+from PyQt6.QtCore import QSize, QRectF, Qt, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QPixmap, QIcon, QPainter, QImage
 from PyQt6.QtPdf import QPdfDocument
-from PyQt6.QtPrintSupport import QPrinter
 from PyQt6.QtWidgets import QWidget, QLabel, QPushButton, QHBoxLayout, QComboBox, QDialog, QVBoxLayout, \
-    QMessageBox, QRadioButton, QButtonGroup, QToolButton
+    QMessageBox, QRadioButton, QButtonGroup, QToolButton, QCheckBox
 
+from metrics import timed
+from printer_registry import get_printer_capabilities
+from profiling import profiled
 from widgets import AutoSelectSpinBox, AutoSelectLineEdit
 
+# QPdfDocument rendering is not thread-safe, so the preview's page renders are serialized
+render_lock = threading.Lock()
+
 
 class PrintDialog(QDialog):
     """
     Class implementing QDialog to show the user a print dialog, also showing a preview of the item to be printed.
     :param QPdfDocument pdf_doc: The QPdfDocument to be printed
     :param GUI gui: the current instance of a gui
+    :param bytes pdf_bytes: the pdf file's contents, which are sent to the print queue
     :param boolean landscape: optional: whether the pdf is to be printed in landscape orientation
+    :param str title: optional: the name of the document, shown in the print queue
     """
-    def __init__(self, pdf_doc, gui, landscape=False):
+    page_rendered = pyqtSignal(int, bool, QImage)
+    prefetch_pages = 2
+    max_cached_pages = 24
+
+    @timed('print_dialog_open_seconds')
+    @profiled
+    def __init__(self, pdf_doc, gui, pdf_bytes, landscape=False, title='Weekly Giving'):
         """
         Class implementing QDialog to show the user a print dialog, also showing a preview of the item to be printed.
         :param QPdfDocument pdf_doc: a QPdfDocument
         :param GUI gui: the current instance of a gui
+        :param bytes pdf_bytes: the pdf file's contents, which are sent to the print queue
         :param boolean landscape: optional: whether the pdf is to be printed in landscape orientation
+        :param str title: optional: the name of the document, shown in the print queue
         """
         super().__init__()
         self.gui = gui
+        self.registry = gui.main.printer_registry
         self.landscape = landscape
+        self.pdf_bytes = pdf_bytes
+        self.title = title
         self.printer_properties = {'name': '', 'printable_rect_inch': QRectF(), 'printable_rect_px': QRectF()}
 
         self.pdf = pdf_doc
         self.num_pages = self.pdf.pageCount()
-        self.pages = []
         self.current_page = 0
+        self.closing = False
+
+        # rendered preview pages, kept separately for each orientation and limited to the most recently used
+        self.page_cache = {False: OrderedDict(), True: OrderedDict()}
+        self.pending_pages = set()
+        self.page_rendered.connect(self.cache_page)
 
         self.layout = QHBoxLayout(self)
 
         self.setWindowTitle('Print')
         self.setGeometry(50, 50, 100, 100)
-        self.get_pages()
         self.init_components()
         self.get_printer_properties()
 
@@ -62,7 +84,7 @@ class PrintDialog(QDialog):
         preview_layout.addWidget(self.preview_label)
 
         self.pdf_label = QLabel()
-        self.draw_preview(self.pages[0])
+        self.show_page(0)
         preview_layout.addWidget(self.pdf_label)
 
         nav_button_widget = QWidget()
@@ -215,85 +237,142 @@ class PrintDialog(QDialog):
         details_label.setFont(self.gui.standard_font)
         details_label.setAlignment(Qt.AlignmentFlag.AlignRight)
         print_options_layout.addWidget(details_label, Qt.AlignmentFlag.AlignRight)
+
+        # sending the pdf itself lets CUPS print it at full quality without rasterizing it here. Printing the preview
+        # stays the default; the user's choice is remembered.
+        self.direct_checkbox = QCheckBox('Send PDF Directly to Printer')
+        self.direct_checkbox.setFont(self.gui.standard_font)
+        self.direct_checkbox.setChecked('linux' in sys.platform and self.gui.main.direct_print_enabled)
+        self.direct_checkbox.setVisible('linux' in sys.platform)
+        print_options_layout.addSpacing(10)
+        print_options_layout.addWidget(self.direct_checkbox)
         print_options_layout.addStretch()
 
     def get_printers(self):
         """
-        Obtain a list of printers currently installed on the system
+        Creates the printer combobox from the printers known to the program's PrinterRegistry, which is refreshed in
+        the background if its list is out of date
         """
-        if not 'linux' in sys.platform:
-            win_management = wmi.WMI()
-            printers = win_management.Win32_Printer()
-        else:
-            connection = cups.Connection()
-            printers = connection.getPrinters()
-
         printer_combobox = QComboBox()
-        default = ''
-
-        if not 'linux' in sys.platform:
-            for printer in printers:
-                if not printer.Hidden:
-                    printer_combobox.addItem(printer.Name)
-                if printer.Default:
-                    default = printer.Name
-        else:
-            count = 0
-            for printer in printers.keys():
-                printer_combobox.addItem(printer)
-                if count == 0:
-                    default = printer
-                count += 1
-
-        printer_combobox.setCurrentText(default)
+        for name in self.registry.get_printer_names():
+            printer_combobox.addItem(name)
+        printer_combobox.setCurrentText(self.registry.default)
+
+        self.registry.printers_changed.connect(self.update_printers)
+        self.registry.refresh_if_stale()
         return printer_combobox
 
+    def update_printers(self):
+        """
+        Method called when the PrinterRegistry finishes a refresh. Repopulates the printer combobox, keeping the
+        current selection if that printer is still there.
+        """
+        current = self.printer_combobox.currentText()
+        names = self.registry.get_printer_names()
+
+        self.printer_combobox.blockSignals(True)
+        self.printer_combobox.clear()
+        for name in names:
+            self.printer_combobox.addItem(name)
+        if current in names:
+            self.printer_combobox.setCurrentText(current)
+        else:
+            self.printer_combobox.setCurrentText(self.registry.default)
+        self.printer_combobox.blockSignals(False)
+
+        if self.printer_combobox.currentText() != current:
+            self.get_printer_properties()
+
     def get_printer_properties(self):
         prn = self.printer_combobox.currentText()
-        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        printer.setPrinterName(prn)
-
-        page_rect_inch = printer.pageRect(QPrinter.Unit.Inch)
-        dpi_x = printer.physicalDpiX()
-        dpi_y = printer.physicalDpiY()
-        unprintable_margin_x = (8.5 - page_rect_inch.width()) / 2
-        unprintable_margin_y = (11 - page_rect_inch.height()) / 2
+        if len(prn) > 0:
+            capabilities = self.registry.get_capabilities(prn)
+        else:
+            capabilities = get_printer_capabilities(prn)
 
         self.printer_properties['name'] = prn
-        self.printer_properties['printable_rect_inch'] = QRectF(
-            unprintable_margin_x,
-            unprintable_margin_y,
-            page_rect_inch.width(),
-            page_rect_inch.height()
-        )
-        self.printer_properties['printable_rect_px'] = QRectF(
-            round(unprintable_margin_x * dpi_x, 2),
-            round(unprintable_margin_y * dpi_y, 2),
-            round(page_rect_inch.width() * dpi_x, 2),
-            round(page_rect_inch.height() * dpi_y, 2)
-        )
-
-    def get_pages(self):
+        self.printer_properties['printable_rect_inch'] = capabilities['printable_rect_inch']
+        self.printer_properties['printable_rect_px'] = capabilities['printable_rect_px']
+
+    @timed('preview_render_seconds')
+    @profiled
+    def render_page(self, index, landscape):
         """
-        Gets the individual pages of the pdf file and converts each to a QPixmap
+        Renders one page of the pdf file at preview size. Returns None once the dialog is closing, since its document
+        may then be closed at any moment.
+        :param int index: the page number, starting at 0
+        :param boolean landscape: whether to size the page for landscape orientation
         """
-        self.pages = []
-        for i in range(self.pdf.pageCount()):
-            page_point_size = self.pdf.pagePointSize(0)
-
-            if self.landscape:
+        # the document is only closed (by GUI.release_pdf, under the same lock) after closing is set, so checking
+        # closing under the lock makes sure it stays open until the page is rendered
+        with render_lock:
+            if self.closing:
+                return None
+            page_point_size = self.pdf.pagePointSize(index)
+
+            if landscape:
                 ratio = 600 / min(page_point_size.width(), page_point_size.height())
             else:
                 ratio = 600 / max(page_point_size.width(), page_point_size.height())
 
-            image = self.pdf.render(
-                i,
+            return self.pdf.render(
+                index,
                 QSize(
                     int(page_point_size.width() * ratio),
                     int(page_point_size.height() * ratio)
                 )
             )
-            self.pages.append(image)
+
+    def get_page(self, index):
+        """
+        Returns the preview image of a page in the current orientation, rendering it now if it hasn't been already
+        :param int index: the page number, starting at 0
+        """
+        cache = self.page_cache[self.landscape]
+        if index not in cache:
+            image = self.render_page(index, self.landscape)
+            if image is None:
+                return QImage()
+            self.cache_page(index, self.landscape, image)
+        cache.move_to_end(index)
+        return cache[index]
+
+    def cache_page(self, index, landscape, image):
+        """
+        Adds a rendered page to the cache, dropping the least recently used pages if the cache is full
+        :param int index: the page number, starting at 0
+        :param boolean landscape: the orientation the page was rendered for
+        :param QImage image: the rendered page
+        """
+        self.pending_pages.discard((index, landscape))
+        cache = self.page_cache[landscape]
+        cache[index] = image
+        while len(cache) > self.max_cached_pages:
+            cache.popitem(last=False)
+
+    def prefetch(self, index):
+        """
+        Starts a PageRenderer for the pages around the given page that haven't been rendered yet
+        :param int index: the page being shown, starting at 0
+        """
+        indexes = []
+        for i in range(index - self.prefetch_pages, index + self.prefetch_pages + 1):
+            if 0 <= i < self.num_pages and i not in self.page_cache[self.landscape] \
+                    and (i, self.landscape) not in self.pending_pages:
+                indexes.append(i)
+                self.pending_pages.add((i, self.landscape))
+
+        if len(indexes) > 0:
+            QThreadPool.globalInstance().start(PageRenderer(self, indexes, self.landscape))
+
+    def show_page(self, index):
+        """
+        Shows a page in the preview and prefetches its neighbours
+        :param int index: the page number, starting at 0
+        """
+        self.current_page = index
+        self.draw_preview(self.get_page(index))
+        self.prefetch(index)
 
     def draw_preview(self, image):
         self.pdf_label.clear()
@@ -322,18 +401,16 @@ class PrintDialog(QDialog):
         Method to show the previous page in the PDF file upon user input
         """
         if not self.current_page == 0:
-            self.current_page -= 1
-            self.page_label.setText('Page ' + str(self.current_page + 1) + ' of ' + str(self.num_pages))
-            self.draw_preview(self.pages[self.current_page])
+            self.page_label.setText('Page ' + str(self.current_page) + ' of ' + str(self.num_pages))
+            self.show_page(self.current_page - 1)
 
     def next_page(self):
         """
         Method to show the next page in the PDF file upon user input
         """
         if not self.current_page == self.num_pages - 1:
-            self.current_page += 1
-            self.page_label.setText('Page ' + str(self.current_page + 1) + ' of ' + str(self.num_pages))
-            self.draw_preview(self.pages[self.current_page])
+            self.page_label.setText('Page ' + str(self.current_page + 2) + ' of ' + str(self.num_pages))
+            self.show_page(self.current_page + 1)
 
     def orientation_changed(self):
         if self.orientation_group.checkedId() == 0:
@@ -341,8 +418,7 @@ class PrintDialog(QDialog):
         else:
             self.landscape = True
 
-        self.get_pages()
-        self.draw_preview(self.pages[self.current_page])
+        self.show_page(self.current_page)
 
     def parse_page_range(self, page_range):
         pages_to_print = []
@@ -394,6 +470,7 @@ class PrintDialog(QDialog):
 
         return pages_to_print
 
+    @profiled
     def do_print(self):
         """if not 'linux' in sys.platform:
             if self.orientation_group.button(1).isChecked():
@@ -411,28 +488,10 @@ class PrintDialog(QDialog):
             properties['pDevMode'].Duplex = self.duplex_combobox.currentIndex() + 1
             win32print.SetPrinter(printer_handle, 2, properties, 0)"""
 
-        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-        printer.setPrinterName(self.printer_properties['name'])
-        printer.setDocName('Bulletin Builder')
-
-        if self.orientation_group.button(1).isChecked():
-            printer.setPageOrientation(QPageLayout.Orientation.Landscape)
-        else:
-            printer.setPageOrientation(QPageLayout.Orientation.Portrait)
-
-        if self.duplex_combobox.currentIndex() == 0:
-            printer.setDuplex(QPrinter.DuplexMode.DuplexNone)
-        elif self.duplex_combobox.currentIndex() == 1:
-            printer.setDuplex(QPrinter.DuplexMode.DuplexLongSide)
-        elif self.duplex_combobox.currentIndex() == 2:
-            printer.setDuplex(QPrinter.DuplexMode.DuplexShortSide)
-
+        # no page range means print every page
         page_range = self.range_line_edit.text()
-        pages_to_print = []
-        if len(page_range.strip()) == 0:
-            for i in range(self.num_pages):
-                pages_to_print.append(i)
-        else:
+        pages_to_print = None
+        if len(page_range.strip()) > 0:
             pages_to_print = self.parse_page_range(page_range)
 
         if pages_to_print == -1:
@@ -444,44 +503,20 @@ class PrintDialog(QDialog):
             )
             return
 
-        self.renders = []
-        for page in pages_to_print:
-            page_point_size = self.pdf.pagePointSize(page)
-            if self.landscape:
-                printable_rect_width = self.printer_properties['printable_rect_px'].height()
-                printable_rect_height = self.printer_properties['printable_rect_px'].width()
-            else:
-                printable_rect_width = self.printer_properties['printable_rect_px'].width()
-                printable_rect_height = self.printer_properties['printable_rect_px'].height()
-            width_ratio = printable_rect_width / page_point_size.width()
-            height_ratio = printable_rect_height / page_point_size.height()
-            render_ratio = min(width_ratio, height_ratio)
-
-            render_width = int(render_ratio * page_point_size.width())
-            render_height = int(render_ratio * page_point_size.height())
-
-            render = self.pdf.render(
-                page,
-                QSize(render_width, render_height)
-            )
-
-            self.renders.append(
-                [QRectF(0, 0, render_width, render_height),
-                render]
-            )
-
-        printer.setCopyCount(self.copies_spinbox.value())
-        painter = QPainter(printer)
-        painter.begin(printer)
-        for j in range(len(self.renders)):
-            if j > 0:
-                printer.newPage()
-
-            painter.drawImage(
-                self.renders[j][0],
-                self.renders[j][1]
-            )
-        painter.end()
+        options = {
+            'printer': self.printer_properties['name'],
+            'printable_rect_px': self.printer_properties['printable_rect_px'],
+            'copies': self.copies_spinbox.value(),
+            'landscape': self.orientation_group.button(1).isChecked(),
+            'duplex': self.duplex_combobox.currentIndex(),
+            'pages': pages_to_print,
+            'direct': self.direct_checkbox.isChecked()
+        }
+        if 'linux' in sys.platform and self.direct_checkbox.isChecked() != self.gui.main.direct_print_enabled:
+            self.gui.main.set_direct_print(self.direct_checkbox.isChecked())
+
+        # printing happens in the background; the print queue shows its progress
+        self.gui.main.print_spooler.submit(self.title, self.pdf_bytes, options)
 
         """if not 'linux' in sys.platform:
             properties['pDevMode'].Orientation = original_orientation
@@ -497,5 +532,44 @@ class PrintDialog(QDialog):
         """
         self.done(0)
 
+    def done(self, result):
+        # stop any prefetching still running
+        self.closing = True
+        try:
+            self.registry.printers_changed.disconnect(self.update_printers)
+        except TypeError:
+            pass
+        super().done(result)
+
     def closeEvent(self, evt):
         self.done(0)
+
+
+class PageRenderer(QRunnable):
+    """
+    Implements QRunnable to render preview pages in the background, emitting each through PrintDialog.page_rendered
+    """
+    def __init__(self, print_dialog, indexes, landscape):
+        """
+        :param PrintDialog print_dialog: the PrintDialog instance
+        :param list indexes: the page numbers to render, starting at 0
+        :param boolean landscape: the orientation to render the pages for
+        """
+        super().__init__()
+        self.print_dialog = print_dialog
+        self.indexes = indexes
+        self.landscape = landscape
+
+    @profiled
+    def run(self):
+        for index in self.indexes:
+            if self.print_dialog.closing:
+                return
+            image = self.print_dialog.render_page(index, self.landscape)
+            # the dialog may have closed, and even been deleted, while the page was rendering
+            if image is None or self.print_dialog.closing:
+                return
+            try:
+                self.print_dialog.page_rendered.emit(index, self.landscape, image)
+            except RuntimeError:
+                return
@@ -0,0 +1,445 @@
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from os.path import exists
+
+from PyQt6.QtCore import QBuffer, QByteArray, QObject, QRectF, QRunnable, QSize, QThreadPool, pyqtSignal
+from PyQt6.QtGui import QPainter, QPageLayout
+from PyQt6.QtPdf import QPdfDocument
+from PyQt6.QtPrintSupport import QPrinter
+from PyQt6.QtWidgets import QDialog, QHBoxLayout, QHeaderView, QPushButton, QTableWidget, QTableWidgetItem, \
+    QVBoxLayout
+
+from metrics import metrics, timed
+from profiling import profiled
+
+
+class PrintJob:
+    """
+    Class holding a document waiting to be printed, or one that has been printed, along with its print options
+    """
+    def __init__(self, id, title, pdf_bytes, options):
+        """
+        :param int id: the job's number
+        :param str title: the name of the document, shown in the print queue
+        :param bytes pdf_bytes: the pdf file to print
+        :param dict options: the print options chosen in PrintDialog: printer, printable_rect_px, copies, landscape,
+            duplex (0 = one-sided, 1 = long edge, 2 = short edge), pages (page numbers starting at 0, or None for all
+            pages), and direct (whether to send the pdf file itself to CUPS)
+        """
+        self.id = id
+        self.title = title
+        self.pdf_bytes = pdf_bytes
+        self.options = options
+        self.status = 'Queued'
+        self.error = ''
+        self.pages_done = 0
+        self.num_pages = 0
+        self.canceled = False
+        self.submitted = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.finished = ''
+
+    def get_history(self):
+        """
+        Returns the job's details, without the pdf file, for the print history
+        """
+        return {
+            'id': self.id,
+            'title': self.title,
+            'printer': self.options['printer'],
+            'copies': self.options['copies'],
+            'pages': self.num_pages,
+            'status': self.status,
+            'error': self.error,
+            'submitted': self.submitted,
+            'finished': self.finished
+        }
+
+
+class PrintSpooler(QObject):
+    """
+    Class to print documents in the background so that the user can keep working while a long job prints. Jobs are
+    printed one at a time, in the order they were submitted, by PrintWorker runnables in the spooler's own thread
+    pool. Finished jobs are recorded in a print history file in the program data directory.
+    """
+    job_changed = pyqtSignal(int)
+    job_failed = pyqtSignal(int)
+    max_history = 200
+
+    def __init__(self, main):
+        """
+        :param Main main: the Main instance
+        """
+        super().__init__()
+        self.main = main
+        self.history_file = self.main.file_locations['program_data_dir'] + '/print_history.json'
+        self.lock = threading.Lock()
+        self.jobs = []
+        self.next_id = 1
+
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.history = self.read_history()
+        if len(self.history) > 0:
+            self.next_id = max(item['id'] for item in self.history) + 1
+
+    def submit(self, title, pdf_bytes, options):
+        """
+        Adds a document to the print queue and returns its PrintJob
+        :param str title: the name of the document, shown in the print queue
+        :param bytes pdf_bytes: the pdf file to print
+        :param dict options: the print options, as described in PrintJob
+        """
+        with self.lock:
+            job = PrintJob(self.next_id, title, pdf_bytes, options)
+            self.next_id += 1
+            self.jobs.append(job)
+
+        self.thread_pool.start(PrintWorker(self, job))
+        self.job_changed.emit(job.id)
+        return job
+
+    def get_job(self, id):
+        with self.lock:
+            for job in self.jobs:
+                if job.id == id:
+                    return job
+        return None
+
+    def cancel(self, id):
+        """
+        Cancels a job. A queued job won't be printed; a job that is printing stops after the current page.
+        :param int id: the job's number
+        """
+        job = self.get_job(id)
+        if job and job.status in ['Queued', 'Printing']:
+            job.canceled = True
+            if job.status == 'Queued':
+                job.status = 'Canceled'
+            self.job_changed.emit(id)
+
+    def retry(self, id):
+        """
+        Puts a failed or canceled job back in the queue once its PrintWorker is done with it
+        :param int id: the job's number
+        """
+        job = self.get_job(id)
+        if job and job.status in ['Failed', 'Canceled'] and len(job.finished) > 0 and job.pdf_bytes is not None:
+            job.status = 'Queued'
+            job.error = ''
+            job.pages_done = 0
+            job.canceled = False
+            job.finished = ''
+            self.thread_pool.start(PrintWorker(self, job))
+            self.job_changed.emit(id)
+
+    def clear_finished(self):
+        """
+        Removes the jobs that have finished printing from the queue. They remain in the print history.
+        """
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job.status in ['Queued', 'Printing', 'Failed', 'Canceled']]
+        self.job_changed.emit(0)
+
+    def job_finished(self, job):
+        """
+        Method called by a PrintWorker when it is done with a job. Records the job in the print history.
+        :param PrintJob job: the job
+        """
+        job.finished = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if job.status == 'Done':
+            # the pdf is only kept so that failed or canceled jobs can be retried
+            job.pdf_bytes = None
+        elif job.status == 'Failed':
+            self.main.write_log('Print job ' + str(job.id) + ' (' + job.title + ') failed: ' + job.error)
+
+        with self.lock:
+            self.history = [item for item in self.history if item['id'] != job.id]
+            self.history.append(job.get_history())
+            self.history = self.history[-self.max_history:]
+            history = list(self.history)
+        self.write_history(history)
+        self.job_changed.emit(job.id)
+        if job.status == 'Failed':
+            self.job_failed.emit(job.id)
+
+    def read_history(self):
+        if not exists(self.history_file):
+            return []
+
+        try:
+            with open(self.history_file, 'r') as file:
+                return json.loads(file.read())
+        except (OSError, ValueError) as err:
+            self.main.write_log('Error from PrintSpooler.read_history: ' + str(err))
+            return []
+
+    def write_history(self, history):
+        temp_file = self.history_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as file:
+                file.write(json.dumps(history, indent=2))
+            os.replace(temp_file, self.history_file)
+        except OSError as err:
+            self.main.write_log('Error from PrintSpooler.write_history: ' + str(err))
+
+    def is_busy(self):
+        """
+        Returns True if there are jobs that haven't finished printing
+        """
+        with self.lock:
+            return any(job.status in ['Queued', 'Printing'] for job in self.jobs)
+
+
+class PrintWorker(QRunnable):
+    """
+    Implements QRunnable to print one PrintJob off of the gui thread
+    """
+    def __init__(self, spooler, job):
+        """
+        :param PrintSpooler spooler: the PrintSpooler instance
+        :param PrintJob job: the job to print
+        """
+        super().__init__()
+        self.spooler = spooler
+        self.job = job
+
+    @timed('print_job_seconds')
+    @profiled
+    def run(self):
+        if self.job.canceled:
+            self.spooler.job_finished(self.job)
+            return
+
+        self.job.status = 'Printing'
+        self.spooler.job_changed.emit(self.job.id)
+
+        try:
+            if self.job.options['direct']:
+                try:
+                    self.print_direct()
+                except Exception as ex:
+                    # fall back to printing the rendered pages
+                    self.spooler.main.write_log('Error from PrintWorker.print_direct: ' + str(ex))
+                    self.print_rendered()
+            else:
+                self.print_rendered()
+
+            if self.job.canceled:
+                self.job.status = 'Canceled'
+            else:
+                self.job.status = 'Done'
+        except Exception as ex:
+            self.job.status = 'Failed'
+            self.job.error = str(ex)
+
+        metrics.increment('print_jobs', {'status': self.job.status.lower()})
+        self.spooler.job_finished(self.job)
+
+    def print_direct(self):
+        """
+        Sends the pdf file itself to the printer through CUPS, passing the job's options as CUPS job options
+        """
+        import cups
+
+        options = self.job.options
+        cups_options = {'copies': str(options['copies'])}
+
+        if options['landscape']:
+            cups_options['orientation-requested'] = '4'
+        else:
+            cups_options['orientation-requested'] = '3'
+
+        sides = ['one-sided', 'two-sided-long-edge', 'two-sided-short-edge']
+        cups_options['sides'] = sides[options['duplex']]
+
+        if options['pages'] is not None:
+            cups_options['page-ranges'] = ','.join(str(page + 1) for page in options['pages'])
+            self.job.num_pages = len(options['pages'])
+
+        file_handle, file_name = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(file_handle, 'wb') as file:
+                file.write(self.job.pdf_bytes)
+            connection = cups.Connection()
+            connection.printFile(options['printer'], file_name, self.job.title, cups_options)
+        finally:
+            os.remove(file_name)
+
+        self.job.pages_done = self.job.num_pages
+        self.spooler.job_changed.emit(self.job.id)
+
+    def print_rendered(self):
+        """
+        Renders each page at printer resolution and paints it to a QPrinter. Each page is released before the next
+        one is rendered so that only one full-resolution page is held in memory at a time.
+        """
+        options = self.job.options
+
+        byte_array = QByteArray(self.job.pdf_bytes)
+        buffer = QBuffer(byte_array)
+        buffer.open(QBuffer.OpenModeFlag.ReadOnly)
+        pdf = QPdfDocument(None)
+        pdf.load(buffer)
+        if pdf.status() != QPdfDocument.Status.Ready:
+            buffer.close()
+            raise ValueError('The document could not be read')
+
+        pages = options['pages']
+        if pages is None:
+            pages = list(range(pdf.pageCount()))
+        self.job.num_pages = len(pages)
+
+        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
+        printer.setPrinterName(options['printer'])
+        printer.setDocName(self.job.title)
+
+        if options['landscape']:
+            printer.setPageOrientation(QPageLayout.Orientation.Landscape)
+        else:
+            printer.setPageOrientation(QPageLayout.Orientation.Portrait)
+
+        if options['duplex'] == 0:
+            printer.setDuplex(QPrinter.DuplexMode.DuplexNone)
+        elif options['duplex'] == 1:
+            printer.setDuplex(QPrinter.DuplexMode.DuplexLongSide)
+        elif options['duplex'] == 2:
+            printer.setDuplex(QPrinter.DuplexMode.DuplexShortSide)
+
+        printer.setCopyCount(options['copies'])
+
+        if options['landscape']:
+            printable_rect_width = options['printable_rect_px'].height()
+            printable_rect_height = options['printable_rect_px'].width()
+        else:
+            printable_rect_width = options['printable_rect_px'].width()
+            printable_rect_height = options['printable_rect_px'].height()
+
+        painter = QPainter()
+        if not painter.begin(printer):
+            pdf.close()
+            buffer.close()
+            raise OSError('Unable to start printing to ' + options['printer'])
+
+        for j in range(len(pages)):
+            if self.job.canceled:
+                printer.abort()
+                break
+
+            if j > 0:
+                printer.newPage()
+
+            page_point_size = pdf.pagePointSize(pages[j])
+            render_ratio = min(
+                printable_rect_width / page_point_size.width(),
+                printable_rect_height / page_point_size.height()
+            )
+            render_width = int(render_ratio * page_point_size.width())
+            render_height = int(render_ratio * page_point_size.height())
+
+            render = pdf.render(pages[j], QSize(render_width, render_height))
+            painter.drawImage(QRectF(0, 0, render_width, render_height), render)
+            del render
+
+            self.job.pages_done = j + 1
+            self.spooler.job_changed.emit(self.job.id)
+        painter.end()
+
+        pdf.close()
+        buffer.close()
+
+
+class PrintQueueDialog(QDialog):
+    """
+    Class implementing QDialog to show the print queue and history, letting the user cancel or retry jobs
+    """
+    columns = ['Job', 'Document', 'Printer', 'Pages', 'Status', 'Submitted']
+
+    def __init__(self, spooler, gui):
+        """
+        :param PrintSpooler spooler: the PrintSpooler instance
+        :param GUI gui: the current instance of a gui
+        """
+        super().__init__(gui)
+        self.spooler = spooler
+        self.gui = gui
+
+        self.setWindowTitle('Print Queue')
+        self.resize(800, 400)
+        layout = QVBoxLayout(self)
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setFont(self.gui.standard_font)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        layout.addLayout(button_layout)
+
+        cancel_button = QPushButton('Cancel Job')
+        cancel_button.clicked.connect(lambda: self.spooler.cancel(self.get_selected_id()))
+        button_layout.addWidget(cancel_button)
+
+        retry_button = QPushButton('Retry Job')
+        retry_button.clicked.connect(lambda: self.spooler.retry(self.get_selected_id()))
+        button_layout.addWidget(retry_button)
+
+        clear_button = QPushButton('Clear Finished')
+        clear_button.clicked.connect(self.spooler.clear_finished)
+        button_layout.addWidget(clear_button)
+        button_layout.addStretch()
+
+        close_button = QPushButton('Close')
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(close_button)
+
+        self.spooler.job_changed.connect(self.refresh)
+        self.refresh()
+
+    def get_selected_id(self):
+        row = self.table.currentRow()
+        if row < 0:
+            return 0
+        return int(self.table.item(row, 0).text())
+
+    def refresh(self):
+        """
+        Method to fill the table with this session's jobs, followed by earlier jobs from the print history
+        """
+        selected_id = self.get_selected_id()
+
+        rows = []
+        session_ids = set()
+        with self.spooler.lock:
+            for job in reversed(self.spooler.jobs):
+                session_ids.add(job.id)
+                if job.status == 'Printing' and job.num_pages > 0:
+                    status = 'Printing (' + str(job.pages_done) + ' of ' + str(job.num_pages) + ')'
+                elif job.status == 'Failed':
+                    status = 'Failed: ' + job.error
+                else:
+                    status = job.status
+                rows.append([job.id, job.title, job.options['printer'], job.num_pages or '', status, job.submitted])
+            for item in reversed(self.spooler.history):
+                if item['id'] not in session_ids:
+                    rows.append(
+                        [item['id'], item['title'], item['printer'], item['pages'], item['status'], item['submitted']])
+
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(len(rows))
+        for i in range(len(rows)):
+            for j in range(len(rows[i])):
+                self.table.setItem(i, j, QTableWidgetItem(str(rows[i][j])))
+            if rows[i][0] == selected_id:
+                self.table.selectRow(i)
+        self.table.resizeColumnToContents(0)
+        self.table.setUpdatesEnabled(True)
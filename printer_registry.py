@@ -0,0 +1,167 @@
+import sys
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QRectF, QRunnable, pyqtSignal
+from PyQt6.QtPrintSupport import QPrinter
+
+
+def get_printer_capabilities(name):
+    """
+    Returns the printable area of a printer, both in inches and in printer pixels
+    :param str name: the printer's name
+    """
+    printer = QPrinter(QPrinter.PrinterMode.HighResolution)
+    printer.setPrinterName(name)
+
+    page_rect_inch = printer.pageRect(QPrinter.Unit.Inch)
+    dpi_x = printer.physicalDpiX()
+    dpi_y = printer.physicalDpiY()
+    unprintable_margin_x = (8.5 - page_rect_inch.width()) / 2
+    unprintable_margin_y = (11 - page_rect_inch.height()) / 2
+
+    return {
+        'printable_rect_inch': QRectF(
+            unprintable_margin_x,
+            unprintable_margin_y,
+            page_rect_inch.width(),
+            page_rect_inch.height()
+        ),
+        'printable_rect_px': QRectF(
+            round(unprintable_margin_x * dpi_x, 2),
+            round(unprintable_margin_y * dpi_y, 2),
+            round(page_rect_inch.width() * dpi_x, 2),
+            round(page_rect_inch.height() * dpi_y, 2)
+        )
+    }
+
+
+def discover_printers():
+    """
+    Returns the names of the printers installed on the system and the name of the default printer
+    """
+    names = []
+    default = ''
+    if not 'linux' in sys.platform:
+        import pythoncom
+        import wmi
+
+        # WMI needs COM initialized on the thread that uses it
+        pythoncom.CoInitialize()
+        try:
+            for printer in wmi.WMI().Win32_Printer():
+                if not printer.Hidden:
+                    names.append(printer.Name)
+                if printer.Default:
+                    default = printer.Name
+        finally:
+            pythoncom.CoUninitialize()
+    else:
+        import cups
+
+        connection = cups.Connection()
+        names = list(connection.getPrinters().keys())
+        try:
+            default = connection.getDefault() or ''
+        except cups.IPPError:
+            default = ''
+        if len(default) == 0 and len(names) > 0:
+            default = names[0]
+
+    return names, default
+
+
+class PrinterRegistry(QObject):
+    """
+    Class to keep the list of installed printers and their capabilities so that the print dialog doesn't have to ask
+    the system each time it opens, which can take seconds with network printers. Printers are discovered by a
+    PrinterDiscovery runnable at startup and again whenever the list is older than ttl seconds.
+    """
+    printers_changed = pyqtSignal()
+    ttl = 300
+
+    def __init__(self, main):
+        """
+        :param Main main: the Main instance
+        """
+        super().__init__()
+        self.main = main
+        self.lock = threading.Lock()
+        self.printers = {}
+        self.default = ''
+        self.updated = 0
+        self.refreshing = False
+
+    def refresh(self):
+        """
+        Starts a PrinterDiscovery runnable unless one is already running
+        """
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        self.main.thread_pool.start(PrinterDiscovery(self))
+
+    def refresh_if_stale(self):
+        """
+        Starts a refresh if the printers haven't been discovered yet or the list is older than the ttl
+        """
+        if time.time() - self.updated > self.ttl:
+            self.refresh()
+
+    def get_printer_names(self):
+        with self.lock:
+            return list(self.printers.keys())
+
+    def get_capabilities(self, name):
+        """
+        Returns a printer's capabilities, finding them now if the printer hasn't been probed yet
+        :param str name: the printer's name
+        """
+        with self.lock:
+            capabilities = self.printers.get(name)
+        if capabilities is None:
+            capabilities = get_printer_capabilities(name)
+            with self.lock:
+                self.printers[name] = capabilities
+        return capabilities
+
+    def set_printers(self, printers, default):
+        """
+        Replaces the registry's printers with newly discovered ones
+        :param dict printers: the capabilities of each printer, keyed by printer name
+        :param str default: the name of the default printer
+        """
+        with self.lock:
+            self.printers = printers
+            self.default = default
+            self.updated = time.time()
+            self.refreshing = False
+        self.printers_changed.emit()
+
+
+class PrinterDiscovery(QRunnable):
+    """
+    Implements QRunnable to discover the installed printers and probe their capabilities off of the gui thread
+    """
+    def __init__(self, registry):
+        """
+        :param PrinterRegistry registry: the PrinterRegistry instance
+        """
+        super().__init__()
+        self.registry = registry
+
+    def run(self):
+        printers = {}
+        try:
+            names, default = discover_printers()
+            for name in names:
+                printers[name] = get_printer_capabilities(name)
+        except Exception as ex:
+            # keep the printers that were already known
+            self.registry.main.write_log('*Error from PrinterDiscovery.run: ' + str(ex))
+            with self.registry.lock:
+                self.registry.refreshing = False
+            return
+
+        self.registry.set_printers(printers, default)
@@ -0,0 +1,208 @@
+import atexit
+import cProfile
+import functools
+import inspect
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# set this environment variable to any value but 0 to profile from the time the program starts
+PROFILE_ENV = 'WEEKLY_GIVING_PROFILE'
+
+
+class Profiler:
+    """
+    Class to measure the program's slow paths while the user works, so that a report that "it's slow" can come with
+    data. Functions marked with the profiled decorator are timed while profiling is on, and each outermost call in a
+    thread is run under cProfile. A sampling thread also records the stacks of the threads that are inside a profiled
+    function. Stopping writes, to a new directory:
+
+    - one .prof file for each profiled function, readable with pstats or snakeviz
+    - samples.folded, stacks in the folded format read by flamegraph.pl and speedscope
+    - summary.txt, the number of calls and the total, average, and longest times of each profiled function
+    """
+    sample_interval = 0.005
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stats = {}
+        self.timings = {}
+        self.samples = Counter()
+        self.active_threads = set()
+        self.sampler = None
+        self.exit_registered = False
+
+    def start(self, profiles_dir):
+        """
+        Starts profiling. The results will be written to a new directory, named for the current date and time, in
+        profiles_dir.
+        :param str profiles_dir: the directory to keep profiling results in
+        """
+        with self.lock:
+            if self.enabled:
+                return
+            self.output_dir = os.path.join(profiles_dir, datetime.now().strftime('%Y-%m-%d_%H-%M-%S'))
+            self.stats = {}
+            self.timings = {}
+            self.samples = Counter()
+            self.enabled = True
+
+        self.sampler = threading.Thread(target=self.sample, name='ProfileSampler', daemon=True)
+        self.sampler.start()
+        if not self.exit_registered:
+            atexit.register(self.stop)
+            self.exit_registered = True
+
+    def stop(self):
+        """
+        Stops profiling and writes the results. Returns the directory they were written to, or None if profiling
+        wasn't on or nothing was profiled.
+        """
+        with self.lock:
+            if not self.enabled:
+                return None
+            self.enabled = False
+        self.sampler.join()
+
+        if len(self.timings) == 0:
+            return None
+        self.write()
+        return self.output_dir
+
+    def call(self, name, function, args, kwargs):
+        """
+        Calls a profiled function, timing it and, if it isn't called from inside another profiled function, running
+        it under cProfile
+        :param str name: the function's qualified name
+        :param function function: the function
+        :param tuple args: the positional arguments
+        :param dict kwargs: the keyword arguments
+        """
+        depth = getattr(self.local, 'depth', 0)
+        profile = None
+        if depth == 0:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # only one profiler can run at a time on some versions of Python, so this call is only timed
+                profile = None
+            with self.lock:
+                self.active_threads.add(threading.get_ident())
+
+        self.local.depth = depth + 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.local.depth = depth
+            if profile:
+                profile.disable()
+
+            with self.lock:
+                if depth == 0:
+                    self.active_threads.discard(threading.get_ident())
+                if self.enabled:
+                    self.add_timing(name, elapsed)
+                    if profile:
+                        if name in self.stats:
+                            self.stats[name].add(profile)
+                        else:
+                            self.stats[name] = pstats.Stats(profile)
+
+    def add_timing(self, name, elapsed):
+        """
+        Adds a call's time to its function's count, total, and longest time
+        :param str name: the function's qualified name
+        :param float elapsed: the call's time in seconds
+        """
+        count, total, longest = self.timings.get(name, (0, 0.0, 0.0))
+        self.timings[name] = (count + 1, total + elapsed, max(longest, elapsed))
+
+    def sample(self):
+        """
+        Records the stack of each thread inside a profiled function every sample_interval seconds until profiling
+        stops
+        """
+        while self.enabled:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            with self.lock:
+                active_threads = list(self.active_threads)
+
+            for thread_id in active_threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame:
+                    # leave out the profiler's own wrappers
+                    if frame.f_globals.get('__name__') != __name__:
+                        code = frame.f_code
+                        stack.append(os.path.splitext(os.path.basename(code.co_filename))[0] + '.' + code.co_name)
+                    frame = frame.f_back
+                stack.append(thread_names.get(thread_id, 'Thread-' + str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+            del frames
+            time.sleep(self.sample_interval)
+
+    def write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name in self.stats:
+            self.stats[name].dump_stats(os.path.join(self.output_dir, name + '.prof'))
+
+        with open(os.path.join(self.output_dir, 'samples.folded'), 'w') as file:
+            for stack in self.samples:
+                file.write(stack + ' ' + str(self.samples[stack]) + '\n')
+
+        names = sorted(self.timings, key=lambda name: self.timings[name][1], reverse=True)
+        with open(os.path.join(self.output_dir, 'summary.txt'), 'w') as file:
+            file.write('Function'.ljust(40) + 'Calls'.rjust(8) + 'Total ms'.rjust(12) + 'Average ms'.rjust(12)
+                       + 'Longest ms'.rjust(12) + '\n')
+            for name in names:
+                count, total, longest = self.timings[name]
+                file.write(name.ljust(40) + str(count).rjust(8) + '{:12.1f}'.format(total * 1000)
+                           + '{:12.1f}'.format(total / count * 1000) + '{:12.1f}'.format(longest * 1000) + '\n')
+
+
+profiler = Profiler()
+
+
+def get_max_args(function):
+    """
+    Returns the number of positional arguments a function takes, or None if it takes any number of them
+    :param function function: the function
+    """
+    parameters = inspect.signature(function).parameters.values()
+    if any(parameter.kind == parameter.VAR_POSITIONAL for parameter in parameters):
+        return None
+    return len([parameter for parameter in parameters
+                if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD)])
+
+
+def profiled(function):
+    """
+    Decorator marking a function to be measured while profiling is on. When it is off, the function is called
+    directly. Like PyQt does for its slots, extra positional arguments from a signal, such as a button's checked state,
+    are dropped if the function doesn't take them.
+    :param function function: the function to profile
+    """
+    name = function.__qualname__
+    max_args = get_max_args(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if max_args is not None:
+            args = args[:max_args]
+        if not profiler.enabled:
+            return function(*args, **kwargs)
+        return profiler.call(name, function, args, kwargs)
+
+    return wrapper
@@ -0,0 +1,233 @@
+import io
+import os
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from database import BILL_COLUMNS, COIN_COLUMNS, decode_notes
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'fonts')
+FONTS = {
+    'NimbusSans': 'NimbusSanL-Reg.ttf',
+    'NimbusSansBold': 'NimbusSanL-Bol.ttf',
+    'NimbusSansBoldItalic': 'NimbusSanL-BolIta.ttf'
+}
+fonts_registered = False
+
+# letter size = 612.0 x 792.0
+# create variables based on letter-sized canvas
+MARGIN_H = 100
+MARGIN_V = 80
+FIRST_LINE = 792 - MARGIN_V
+LINE_START = MARGIN_H
+LINE_END = 612 - MARGIN_H
+LINE_HEIGHT = 16
+TOP_LINE_OF_ENTRIES = FIRST_LINE - (LINE_HEIGHT * 3) - 55
+COINS_LINE = TOP_LINE_OF_ENTRIES - (LINE_HEIGHT * 7)
+TOTALS_LINE = 300
+NOTES_LINE = TOTALS_LINE - (LINE_HEIGHT * 11)
+
+
+def register_fonts():
+    """
+    Registers the report's fonts with reportlab. Registration is only done once per process.
+    """
+    global fonts_registered
+    if fonts_registered:
+        return
+
+    for font_name in FONTS:
+        pdfmetrics.registerFont(TTFont(font_name, os.path.join(FONT_DIR, FONTS[font_name])))
+    fonts_registered = True
+
+
+def get_report_values(record):
+    """
+    Converts a record as stored in the database into the display values used by ReportBuilder
+    :param dict record: a record as returned by database.GivingDatabase
+    """
+    values = {}
+    for column in record:
+        if record[column] is None:
+            values[column] = ''
+        elif column == 'notes':
+            values[column] = decode_notes(record[column])
+        else:
+            values[column] = str(record[column])
+    return values
+
+
+class ReportBuilder:
+    """
+    Class to create the printed weekly giving report. Everything on the page that is the same for every record (the
+    church name, labels, designation names, lines, and boxes) is drawn once per document as a reportlab form, and each
+    page then only stamps that form and draws the record's values.
+    """
+    template_version = 1
+    template_name = 'weekly_giving_template'
+
+    def __init__(self, name, spec_designations):
+        """
+        :param str name: the church name
+        :param dict spec_designations: the special designation names, keyed spec1 through spec7
+        """
+        self.name = name
+        self.spec_designations = spec_designations
+        register_fonts()
+
+    def build(self, records):
+        """
+        Creates a PDF with one report page for each record and returns its bytes
+        :param list records: dictionaries of display values keyed by database column, including id and the totals
+        """
+        pdf_buffer = io.BytesIO()
+        canvas = pdf_canvas.Canvas(pdf_buffer, pagesize=letter)
+
+        canvas.beginForm(self.template_name)
+        self.draw_template(canvas)
+        canvas.endForm()
+
+        for values in records:
+            canvas.doForm(self.template_name)
+            self.draw_values(canvas, values)
+            canvas.showPage()
+
+        canvas.save()
+        pdf_bytes = pdf_buffer.getvalue()
+        pdf_buffer.close()
+        return pdf_bytes
+
+    def draw_template(self, canvas):
+        """
+        Draws the parts of the report that don't change from record to record
+        :param reportlab.pdfgen.canvas.Canvas canvas: the canvas (or form) to draw on
+        """
+        canvas.setLineWidth(1.0)
+        canvas.setFont('NimbusSansBold', 16)
+        canvas.drawString(LINE_START, FIRST_LINE, self.name + ' Weekly Giving Report')
+        canvas.line(LINE_START, FIRST_LINE - 5, LINE_END, FIRST_LINE - 5)
+
+        current_line = FIRST_LINE - 5 - LINE_HEIGHT
+        canvas.setFont('NimbusSansBold', 11)
+        canvas.drawString(LINE_START, current_line, 'Date:')
+        canvas.drawString(LINE_START + 120, current_line, 'Prepared By:')
+
+        current_line -= LINE_HEIGHT
+        canvas.drawString(LINE_START, current_line, 'Signature:')
+        current_line -= LINE_HEIGHT
+        canvas.rect(LINE_START, current_line - 20, 300, 30)
+
+        current_line = TOP_LINE_OF_ENTRIES
+        for label in ['$100 Bills', '$50 Bills', '$20 Bills', '$10 Bills', '$5 Bills', '$1 Bills']:
+            canvas.drawString(LINE_START, current_line, label)
+            current_line -= LINE_HEIGHT
+
+        current_line = COINS_LINE
+        for label in ['$1 Coins', 'Quarters', 'Dimes', 'Nickels', 'Pennies']:
+            canvas.drawString(LINE_START, current_line, label)
+            current_line -= LINE_HEIGHT
+
+        current_line = TOP_LINE_OF_ENTRIES
+        for i in range(1, 8):
+            canvas.drawString(210, current_line, self.spec_designations['spec' + str(i)])
+            current_line -= LINE_HEIGHT
+
+        canvas.drawString(440, TOP_LINE_OF_ENTRIES + LINE_HEIGHT, 'Checks:')
+        current_line = TOP_LINE_OF_ENTRIES
+        for i in range(1, 31):
+            canvas.drawString(440, current_line, str(i))
+            current_line -= LINE_HEIGHT
+
+        current_line = TOTALS_LINE
+        canvas.setFont('NimbusSansBold', 12)
+        canvas.drawString(LINE_START + 20, current_line, 'Total Designated Offerings:')
+        current_line -= LINE_HEIGHT * 2
+        canvas.drawString(LINE_START + 20, current_line, 'Total Bills:')
+        current_line -= LINE_HEIGHT
+        canvas.drawString(LINE_START + 20, current_line, 'Total Coins:')
+        current_line -= LINE_HEIGHT
+        canvas.drawString(LINE_START + 20, current_line, 'Total Checks:')
+        current_line -= LINE_HEIGHT * 2
+        canvas.setFont('NimbusSansBoldItalic', 14)
+        canvas.drawString(LINE_START + 20, current_line, 'Total Deposit:')
+        current_line -= LINE_HEIGHT * 2
+        canvas.setFont('NimbusSansBold', 12)
+        canvas.drawString(LINE_START + 20, current_line, 'Number of Checks:')
+
+        current_line += LINE_HEIGHT * 2
+        canvas.setLineWidth(2.0)
+        canvas.rect(LINE_START, current_line - 20, 390 - LINE_START, 150)
+
+        canvas.setFont('NimbusSans', 12)
+        canvas.drawString(LINE_START, NOTES_LINE, 'Notes:')
+        canvas.setLineWidth(1.0)
+        canvas.rect(LINE_START, NOTES_LINE - 60, LINE_END - LINE_START, 55)
+
+    def draw_values(self, canvas, values):
+        """
+        Draws one record's values over the template
+        :param reportlab.pdfgen.canvas.Canvas canvas: the canvas to draw on
+        :param dict values: display values keyed by database column, including id and the totals
+        """
+        current_line = FIRST_LINE - 5 - LINE_HEIGHT
+        canvas.setFont('NimbusSans', 11)
+        canvas.drawString(LINE_START + 35, current_line, str(values.get('date') or ''))
+        canvas.drawString(LINE_START + 195, current_line, str(values.get('prepared_by') or ''))
+        canvas.drawRightString(LINE_END, current_line, 'ID: ' + str(values.get('id') or ''))
+
+        current_line = TOP_LINE_OF_ENTRIES
+        for column in BILL_COLUMNS:
+            canvas.drawRightString(180, current_line, str(values.get(column) or ''))
+            current_line -= LINE_HEIGHT
+
+        current_line = COINS_LINE
+        for column in COIN_COLUMNS:
+            canvas.drawRightString(180, current_line, str(values.get(column) or ''))
+            current_line -= LINE_HEIGHT
+
+        # special designation amounts stay on the same line as their designation's name
+        current_line = TOP_LINE_OF_ENTRIES
+        for i in range(1, 8):
+            amount = self.get_amount(values.get('spec' + str(i)))
+            if amount > 0:
+                canvas.drawRightString(400, current_line, '${:,.2f}'.format(amount))
+            current_line -= LINE_HEIGHT
+
+        check_columns = [column for column in values if column.startswith('checks_') and column[7:].isdigit()]
+        check_columns.sort(key=lambda column: int(column[7:]))
+        current_line = TOP_LINE_OF_ENTRIES
+        for column in check_columns:
+            amount = self.get_amount(values[column])
+            if amount > 0:
+                canvas.drawRightString(LINE_END, current_line, '${:,.2f}'.format(amount))
+                current_line -= LINE_HEIGHT
+
+        current_line = TOTALS_LINE
+        canvas.setFont('NimbusSans', 12)
+        canvas.drawRightString(370, current_line, str(values.get('total_designated_offerings') or ''))
+        current_line -= LINE_HEIGHT * 2
+        canvas.drawRightString(370, current_line, str(values.get('bills_total') or ''))
+        current_line -= LINE_HEIGHT
+        canvas.drawRightString(370, current_line, str(values.get('coins_total') or ''))
+        current_line -= LINE_HEIGHT
+        canvas.drawRightString(370, current_line, str(values.get('checks_total') or ''))
+        current_line -= LINE_HEIGHT * 2
+        canvas.setFont('NimbusSansBoldItalic', 14)
+        canvas.drawRightString(370, current_line, str(values.get('total_deposit') or ''))
+        current_line -= LINE_HEIGHT * 2
+        canvas.setFont('NimbusSans', 12)
+        canvas.drawRightString(370, current_line, str(values.get('quantity_of_checks') or ''))
+
+        canvas.drawString(LINE_START + 20, NOTES_LINE - LINE_HEIGHT * 1.5, str(values.get('notes') or '').strip())
+
+    def get_amount(self, text):
+        """
+        Returns the amount in a currency field, or zero if it is empty or not a number
+        :param str text: the field's text
+        """
+        try:
+            return float(str(text or '0').replace(',', ''))
+        except ValueError:
+            return 0.0
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+class ReportCache:
+    """
+    Class to keep recently generated report PDFs so that printing or previewing an unchanged record doesn't rebuild
+    it. PDFs are keyed by a hash of everything that appears on the report: the record's values, the church name, the
+    special designation names, and the report template's version. A small number are kept in memory and a larger
+    number on disk, with the least recently used dropped first from each.
+    """
+    def __init__(self, cache_dir, max_memory=20, max_disk=200):
+        """
+        :param str cache_dir: the directory where cached PDFs are written
+        :param int max_memory: optional: the number of PDFs to keep in memory
+        :param int max_disk: optional: the number of PDFs to keep on disk
+        """
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self.max_disk = max_disk
+        self.memory = OrderedDict()
+
+    def get_key(self, values, name, spec_designations, template_version):
+        """
+        Returns the cache key for a report
+        :param dict values: the report's display values
+        :param str name: the church name
+        :param dict spec_designations: the special designation names
+        :param int template_version: the report template's version
+        """
+        content = json.dumps(
+            {
+                'values': values,
+                'name': name,
+                'spec_designations': spec_designations,
+                'template_version': template_version
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def get_file_name(self, key):
+        return os.path.join(self.cache_dir, key + '.pdf')
+
+    def get(self, key):
+        """
+        Returns the cached PDF bytes for a key, or None if they aren't cached
+        :param str key: the cache key, as returned by get_key
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+
+        file_name = self.get_file_name(key)
+        try:
+            with open(file_name, 'rb') as file:
+                pdf_bytes = file.read()
+            # mark it as recently used for prune_disk
+            os.utime(file_name)
+        except OSError:
+            return None
+
+        self.add_to_memory(key, pdf_bytes)
+        return pdf_bytes
+
+    def put(self, key, pdf_bytes):
+        """
+        Adds a PDF to the cache
+        :param str key: the cache key, as returned by get_key
+        :param bytes pdf_bytes: the PDF
+        """
+        self.add_to_memory(key, pdf_bytes)
+
+        file_name = self.get_file_name(key)
+        temp_file = file_name + '.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_file, 'wb') as file:
+                file.write(pdf_bytes)
+            os.replace(temp_file, file_name)
+        except OSError:
+            # the memory cache still works without the disk cache
+            return
+
+        self.prune_disk()
+
+    def add_to_memory(self, key, pdf_bytes):
+        self.memory[key] = pdf_bytes
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+
+    def prune_disk(self):
+        """
+        Removes the least recently used PDFs from the disk cache until there are no more than max_disk
+        """
+        try:
+            cache_files = [
+                os.path.join(self.cache_dir, file) for file in os.listdir(self.cache_dir) if file.endswith('.pdf')
+            ]
+            if len(cache_files) <= self.max_disk:
+                return
+
+            cache_files.sort(key=os.path.getmtime)
+            for file_name in cache_files[:len(cache_files) - self.max_disk]:
+                os.remove(file_name)
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        Empties the memory and disk caches
+        """
+        self.memory.clear()
+        try:
+            for file in os.listdir(self.cache_dir):
+                if file.endswith('.pdf'):
+                    os.remove(os.path.join(self.cache_dir, file))
+        except OSError:
+            pass
@@ -0,0 +1,149 @@
+'''
+Creates databases of made-up but realistic weekly giving records for benchmarks and trying out the program, e.g.
+"python sample_data.py sample.db --years 20". The same options and seed always give the same records.
+'''
+
+import argparse
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from database import BILL_COLUMNS, COIN_COLUMNS, GivingDatabase, calculate_totals, encode_notes, \
+    get_create_table_sql
+
+PREPARERS = ['Pat Morgan', 'Chris Lee', 'Sam Ortiz', 'Jordan Blake', 'Alex Reed']
+NOTES = [
+    'Two checks held for the treasurer',
+    'Coin jar from the children\'s "Mission Moments" emptied',
+    'Counted by two ushers; one envelope with no name',
+    'Loose cash was in the second plate',
+    'Memorial gift included in checks'
+]
+CHECK_AMOUNTS = [10, 20, 25, 30, 40, 50, 60, 75, 100, 120, 150, 200, 250, 300, 500]
+
+
+def generate_record(rng, record_date, checks_per_week, special=False):
+    """
+    Returns the values of one made-up record keyed by column, including its totals
+    :param random.Random rng: the random number generator
+    :param datetime.date record_date: the record's date
+    :param int checks_per_week: the average number of checks on a Sunday
+    :param bool special: optional: whether this is a special offering rather than a Sunday, which has fewer bills and
+        checks and more designated giving
+    """
+    scale = 0.3 if special else 1.0
+    values = {
+        'date': record_date.isoformat(),
+        'prepared_by': rng.choice(PREPARERS),
+        'bills_100': str(int(rng.randint(0, 3) * scale)),
+        'bills_50': str(int(rng.randint(0, 4) * scale)),
+        'bills_20': str(int(rng.randint(5, 40) * scale)),
+        'bills_10': str(int(rng.randint(3, 25) * scale)),
+        'bills_5': str(int(rng.randint(5, 30) * scale)),
+        'bills_1': str(int(rng.randint(20, 90) * scale)),
+        'coins_100': str(rng.randint(0, 3)),
+        'coins_25': str(rng.randint(0, 30)),
+        'coins_10': str(rng.randint(0, 20)),
+        'coins_5': str(rng.randint(0, 15)),
+        'coins_1': str(rng.randint(0, 60)),
+        'notes': encode_notes(rng.choice(NOTES)) if rng.random() < 0.1 else ''
+    }
+
+    for i in range(1, 8):
+        if rng.random() < (0.5 if special else 0.15):
+            values['spec' + str(i)] = '{:.2f}'.format(rng.choice(CHECK_AMOUNTS[:10]))
+        else:
+            values['spec' + str(i)] = ''
+
+    num_checks = int(rng.gauss(checks_per_week * scale, checks_per_week * scale / 4 + 1))
+    num_checks = min(max(num_checks, 0), 30)
+    for i in range(30):
+        if i < num_checks:
+            amount = rng.choice(CHECK_AMOUNTS)
+            if rng.random() < 0.2:
+                amount += rng.randint(1, 99) / 100
+            values['checks_' + str(i)] = '{:,.2f}'.format(amount)
+        else:
+            values['checks_' + str(i)] = '0'
+
+    all_values = [values[column] for column in BILL_COLUMNS + COIN_COLUMNS]
+    all_values += [values['spec' + str(i)] for i in range(1, 8)]
+    all_values += [values['checks_' + str(i)] for i in range(num_checks)]
+    totals = calculate_totals(all_values)[0]
+
+    values['quantity_of_checks'] = str(totals[4])
+    values['bills_total'] = '{:,.2f}'.format(totals[0])
+    values['coins_total'] = '{:,.2f}'.format(totals[1])
+    values['total_designated_offerings'] = '{:,.2f}'.format(totals[2])
+    values['checks_total'] = '{:,.2f}'.format(totals[3])
+    values['total_deposit'] = '{:,.2f}'.format(totals[0] + totals[1] + totals[2] + totals[3])
+    return values
+
+
+def generate_database(file_name, years=10, specials_per_year=6, checks_per_week=15, seed=0, end=None):
+    """
+    Creates a database holding a record for every Sunday of the given number of years, plus special offerings on
+    other days. Returns the number of records.
+    :param str file_name: the database file to create; it must not exist
+    :param int years: optional: the number of years of records
+    :param int specials_per_year: optional: the number of special offerings on days other than Sunday each year
+    :param int checks_per_week: optional: the average number of checks on a Sunday
+    :param int seed: optional: the random seed; the same seed and options always give the same records
+    :param str end: optional: the last Sunday to include, as YYYY-MM-DD, the last Sunday of 2025 if not given
+    """
+    if os.path.exists(file_name):
+        raise FileExistsError('The database file already exists: ' + file_name)
+
+    rng = random.Random(seed)
+    last_sunday = date.fromisoformat(end) if end else date(2025, 12, 28)
+    first_sunday = last_sunday - timedelta(weeks=years * 52)
+
+    dates = []
+    sunday = first_sunday
+    while sunday <= last_sunday:
+        dates.append((sunday, False))
+        sunday += timedelta(weeks=1)
+    for year in range(first_sunday.year, last_sunday.year + 1):
+        for i in range(specials_per_year):
+            special_date = date(year, 1, 1) + timedelta(days=rng.randint(0, 364))
+            if special_date.weekday() == 6:
+                special_date -= timedelta(days=rng.randint(1, 6))
+            if first_sunday <= special_date <= last_sunday:
+                dates.append((special_date, True))
+    dates.sort()
+
+    conn = sqlite3.connect(file_name)
+    conn.execute(get_create_table_sql())
+    conn.commit()
+    conn.close()
+
+    database = GivingDatabase(file_name)
+    conn = database.connect()
+    try:
+        for i in range(len(dates)):
+            values = generate_record(rng, dates[i][0], checks_per_week, dates[i][1])
+            values['id'] = i + 1
+            database.insert_record(values, conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(dates)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create a database of sample weekly giving records')
+    parser.add_argument('file', help='database file to create')
+    parser.add_argument('--years', type=int, default=10, help='years of records (10)')
+    parser.add_argument('--specials', type=int, default=6, help='special offerings per year (6)')
+    parser.add_argument('--checks', type=int, default=15, help='average checks per Sunday (15)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (0)')
+    parser.add_argument('--end', help='last Sunday to include, as YYYY-MM-DD (2025-12-28)')
+    args = parser.parse_args(argv)
+
+    records = generate_database(args.file, args.years, args.specials, args.checks, args.seed, args.end)
+    print(str(records) + ' records written to ' + args.file)
+
+
+if __name__ == '__main__':
+    main()